@@ -28,6 +28,9 @@ from django.core.exceptions import ValidationError
 from apps.thirdparty.tagging.fields import TagField
 from apps.thirdparty.tagging.models import Tag
 from core.spaces.models import Space
+from helpers.cache import cache_model
+from helpers.counters import count_comments
+from helpers.viewcounts import count_views
 
 
 class Debate(models.Model):
@@ -50,6 +53,7 @@ class Debate(models.Model):
     start_date = models.DateField(_('Start date'))
     end_date = models.DateField(_('End date'))
     private = models.BooleanField(_('Private'), help_text=_('Set the debate as private so only the accepted users can participate in it.'))
+    views = models.IntegerField(_('Views'), default=0, editable=False)
 
     class Meta:
         permissions = (
@@ -124,6 +128,8 @@ class Note(models.Model):
     author = models.ForeignKey(User, null=True, blank=True, related_name="note_author")
     last_mod_author = models.ForeignKey(User, null=True, blank=True, related_name="update_author")
     last_mod = models.DateTimeField(_('Last modification time'), auto_now=True)
+    comment_count = models.IntegerField(_('Comments'), default=0,
+        editable=False)
 
     def __unicode__(self):
         return self.message
@@ -132,3 +138,8 @@ class Note(models.Model):
         permissions = (
             ('move', 'Can move note'),
         )
+
+
+cache_model(Debate)
+count_comments(Note)
+count_views(Debate)
@@ -48,7 +48,9 @@ from apps.ecidadania.debate.models import Debate, Note, Row, Column
 from apps.ecidadania.debate.forms import DebateForm, UpdateNoteForm, \
     NoteForm, RowForm, ColumnForm, UpdateNotePosition
 from core.spaces.models import Space
-from helpers.cache import get_or_insert_object_in_cache
+from core.spaces.mixins import SpaceMixin
+from helpers.cache import get_cached_object_or_404
+from helpers.viewcounts import add_view
 
 
 def add_new_debate(request, space_url):
@@ -62,7 +64,7 @@ def add_new_debate(request, space_url):
     :attributes: debate_form, row_formset, column_formset
     :context: form, rowform, colform, get_place, debateid
     """
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if (request.user.has_perm('admin_space', place) or
         request.user.has_perm('mod_space', place)):
@@ -90,7 +92,7 @@ def add_new_debate(request, space_url):
                 debate_form_uncommited.author = request.user
 
                 saved_debate = debate_form_uncommited.save()
-                debate_instance = get_object_or_404(Debate, pk=current_debate_id)
+                debate_instance = get_cached_object_or_404(Debate, pk=current_debate_id)
 
                 row = row_formset.save(commit=False)
                 for form in row:
@@ -129,8 +131,8 @@ def edit_debate(request, space_url, debate_id):
     """
     """
     pk = debate_id
-    place = get_object_or_404(Space, url=space_url)
-    instance = Debate.objects.get(pk=debate_id)
+    place = get_cached_object_or_404(Space, url=space_url)
+    instance = get_cached_object_or_404(Debate, pk=debate_id)
 
     if (request.user.has_perm('admin_space', place) or
         request.user.has_perm('admin_debate', instance) or
@@ -153,7 +155,7 @@ def edit_debate(request, space_url, debate_id):
                 debate_form_uncommited.author = request.user
 
                 saved_debate = debate_form_uncommited.save()
-                debate_instance = get_object_or_404(Debate,
+                debate_instance = get_cached_object_or_404(Debate,
                     pk=debate_id)
 
                 row = row_formset.save(commit=False)
@@ -203,10 +205,10 @@ def create_note(request, space_url):
     .. versionadded:: 0.1.5
     """
     note_form = NoteForm(request.POST or None)
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if request.method == "POST" and request.is_ajax():
-        debate = get_object_or_404(Debate, pk=request.POST['debateid'])
+        debate = get_cached_object_or_404(Debate, pk=request.POST['debateid'])
 
         # This is not the best approach, but I don't want to think in
         # another solution right now, we need this and we need it now
@@ -216,7 +218,7 @@ def create_note(request, space_url):
             if note_form.is_valid():
                 note_form_uncommited = note_form.save(commit=False)
                 note_form_uncommited.author = request.user
-                note_form_uncommited.debate = get_object_or_404(Debate,
+                note_form_uncommited.debate = get_cached_object_or_404(Debate,
                     pk=request.POST['debateid'])
                 note_form_uncommited.title = request.POST['title']
                 note_form_uncommited.message = request.POST['message']
@@ -251,11 +253,11 @@ def update_note(request, space_url):
 
     # Shit double validation here due to the fact that we can't get the note ID
     # until the JS code sends us the GET or POST signals
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if request.method == "GET" and request.is_ajax():
         note = get_object_or_404(Note, pk=request.GET['noteid'])
-        debate = get_object_or_404(Debate, pk=note.debate.id)
+        debate = get_cached_object_or_404(Debate, pk=note.debate.id)
 
         if (request.user.has_perm('admin_space', place) or
             request.user.has_perm('mod_space', place) or
@@ -285,7 +287,7 @@ def update_note(request, space_url):
 
     elif request.method == "POST" and request.is_ajax():
         note = get_object_or_404(Note, pk=request.POST['noteid'])
-        debate = get_object_or_404(Debate, pk=note.debate.id)
+        debate = get_cached_object_or_404(Debate, pk=note.debate.id)
 
         if (request.user.has_perm('admin_space', place) or
             request.user.has_perm('mod_space', place) or
@@ -318,11 +320,11 @@ def update_position(request, space_url):
     reloading all the note form with all the data, we use the partial form
     "UpdateNotePosition" which only handles the column and row of the note.
     """
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if request.method == "POST" and request.is_ajax():
         note = get_object_or_404(Note, pk=request.POST['noteid'])
-        debate = get_object_or_404(Debate, pk=note.debate.id)
+        debate = get_cached_object_or_404(Debate, pk=note.debate.id)
         position_form = UpdateNotePosition(request.POST or None, instance=note)
 
         if (request.user.has_perm('admin_space', place) or
@@ -354,7 +356,7 @@ def delete_note(request, space_url):
     Deletes a note object.
     """
     note = get_object_or_404(Note, pk=request.POST['noteid'])
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if (request.user.has_perm('admin_space', place) or
         request.user.has_perm('mod_space', place) or
@@ -375,7 +377,7 @@ def delete_note(request, space_url):
         raise PermissionDenied
 
 
-class ViewDebate(DetailView):
+class ViewDebate(SpaceMixin, DetailView):
     """
     View a debate.
 
@@ -384,26 +386,20 @@ class ViewDebate(DetailView):
     context_object_name = 'debate'
     template_name = 'debate/debate_view.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        debate = get_object_or_404(Debate, pk=kwargs['debate_id'])
-        space = get_object_or_404(Space, url=kwargs['space_url'])
+    def has_space_permission(self, user, space):
+        debate = get_cached_object_or_404(Debate, pk=self.kwargs['debate_id'])
 
         if debate.private:
-            if (request.user.has_perm('admin_space', space) or
-                request.user.has_perm('mod_space', space) or
-                request.user.has_perm('view_debate', debate)):
-                return super(ViewDebate, self).dispatch(request, *args, **kwargs)
-            else:
-                raise PermissionDenied
+            return (user.has_perm('admin_space', space) or
+                    user.has_perm('mod_space', space) or
+                    user.has_perm('view_debate', debate))
         else:
-            if request.user.has_perm('view_space', space):
-                return super(ViewDebate, self).dispatch(request, *args, **kwargs)
-            else:
-                raise PermissionDenied
+            return user.has_perm('view_space', space)
 
     def get_object(self):
         key = self.kwargs['debate_id']
-        debate = get_or_insert_object_in_cache(Debate, key, pk=key)
+        debate = get_cached_object_or_404(Debate, pk=key)
+        add_view(debate)
 
         # Check debate dates
         if datetime.date.today() >= debate.end_date:
@@ -422,11 +418,8 @@ class ViewDebate(DetailView):
         context = super(ViewDebate, self).get_context_data(**kwargs)
         columns = Column.objects.filter(debate=self.kwargs['debate_id'])
         rows = Row.objects.filter(debate=self.kwargs['debate_id'])
-        space_key = self.kwargs['space_url']
-        current_space = get_or_insert_object_in_cache(Space, space_key,
-                                                      url=space_key)
         debate_key = self.kwargs['debate_id']
-        current_debate = get_or_insert_object_in_cache(Debate, debate_key,
+        current_debate = get_cached_object_or_404(Debate,
                                                        pk=debate_key)
         notes = Note.objects.filter(debate=current_debate.pk)
         try:
@@ -434,7 +427,6 @@ class ViewDebate(DetailView):
         except:
             last_note = 0
 
-        context['get_place'] = current_space
         context['notes'] = notes
         context['columns'] = columns
         context['rows'] = rows
@@ -446,7 +438,7 @@ class ViewDebate(DetailView):
         return context
 
 
-class ListDebates(ListView):
+class ListDebates(SpaceMixin, ListView):
     """
     Return a list of debates for the current space.
 
@@ -454,62 +446,29 @@ class ListDebates(ListView):
     """
     paginate_by = 10
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListDebates, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        key = self.kwargs['space_url']
-        current_space = get_or_insert_object_in_cache(Space, key, url=key)
-        debates = Debate.objects.filter(space=current_space)
+        debates = Debate.objects.filter(space=self.space)
         return debates
 
-    def get_context_data(self, **kwargs):
-        context = super(ListDebates, self).get_context_data(**kwargs)
-        key = self.kwargs['space_url']
-        space = get_or_insert_object_in_cache(Space, key, url=key)
-        context['get_place'] = space
-        return context
-
 
-class DeleteDebate(DeleteView):
+class DeleteDebate(SpaceMixin, DeleteView):
 
     """
     Delete an existent debate. Debate deletion is only reserved to spaces
     administrators or site admins.
     """
     context_object_name = "get_place"
+    space_permissions = ('admin_space', 'mod_space')
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        debate = get_object_or_404(Debate, pk=kwargs['debate_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space) or
-            request.user.has_perm('admin_debate', debate) or
-            request.user == debate.author):
-            return super(DeleteDebate, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    def has_space_permission(self, user, space):
+        debate = get_cached_object_or_404(Debate, pk=self.kwargs['debate_id'])
+        return (super(DeleteDebate, self).has_space_permission(user, space) or
+                user.has_perm('admin_debate', debate) or
+                user == debate.author)
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return '/spaces/%s' % (space)
 
     def get_object(self):
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return get_object_or_404(Debate, pk=self.kwargs['debate_id'])
-
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for ViewDebate view.
-        """
-        context = super(DeleteDebate, self).get_context_data(**kwargs)
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = space
-        return context
+        return get_cached_object_or_404(Debate, pk=self.kwargs['debate_id'])
@@ -22,6 +22,8 @@ from django.contrib.auth.models import User
 from apps.thirdparty.tagging.fields import TagField
 from apps.thirdparty.tagging.models import Tag
 from core.spaces.models import Space
+from helpers.counters import count_comments
+from helpers.viewcounts import count_views
 
 
 class Post(models.Model):
@@ -43,7 +45,9 @@ class Post(models.Model):
                                    blank=True, null=True,
             help_text=_('If you want to post to the index leave this blank'))
     post_tags = TagField(help_text=_('Insert here relevant words related with the post'))
-    views = models.IntegerField(_('Views'), blank=True, null=True)
+    views = models.IntegerField(_('Views'), default=0, editable=False)
+    comment_count = models.IntegerField(_('Comments'), default=0,
+        editable=False)
 
     class Meta:
         ordering = ['title']
@@ -54,11 +58,6 @@ class Post(models.Model):
     def __unicode__(self):
         return self.title
 
-    def comment_count(self):
-        ct = ContentType.objects.get_for_model(Post)
-        obj_pk = self.id
-        return Comment.objects.filter(content_type=ct, object_pk=obj_pk).count()
-
     def set_tags(self, tags):
         Tag.objects.update_tags(self, tags)
 
@@ -74,3 +73,11 @@ class Post(models.Model):
         else:
             return ('view-site-post', (), {
                 'post_id': str(self.id)})
+
+
+count_comments(Post)
+count_views(Post)
+
+# Keeps the rankings of the spaces up to date in every process, not only in
+# the ones that load the views
+import core.spaces.rankings
@@ -32,11 +32,13 @@ from guardian.shortcuts import assign_perm
 
 from core.spaces import url_names as urln
 from core.spaces.models import Space
+from core.spaces.mixins import SpaceMixin
 from apps.ecidadania.news.models import Post
 from apps.ecidadania.news.forms import NewsForm
+from helpers.viewcounts import add_view
 
 
-class AddPost(FormView):
+class AddPost(SpaceMixin, FormView):
 
     """
     Create a new post. Only registered users belonging to a concrete group
@@ -51,36 +53,21 @@ class AddPost(FormView):
     """
     form_class = NewsForm
     template_name = 'news/post_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(AddPost, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln.SPACE_INDEX, kwargs={'space_url': space})
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.author = self.request.user
         form_uncommited.space = self.space
         form_uncommited.save()
         return super(AddPost, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(AddPost, self).get_context_data(**kwargs)
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = self.space
-        return context
 
-
-class ViewPost(DetailView):
+class ViewPost(SpaceMixin, DetailView):
 
     """
     View a specific post.
@@ -90,34 +77,13 @@ class ViewPost(DetailView):
     context_object_name = 'news'
     template_name = 'news/post_detail.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewPost, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
         post = Post.objects.get(pk=self.kwargs['post_id'])
-        try:
-            post.views = post.views + 1
-        except:
-            post.views = 1
-        post.save()
+        add_view(post)
         return post
 
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for the ViewPost view.
-        """
-        context = super(ViewPost, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
-
 
-class EditPost(UpdateView):
+class EditPost(SpaceMixin, UpdateView):
 
     """
     Edit an existent post.
@@ -128,18 +94,9 @@ class EditPost(UpdateView):
     """
     model = Post
     template_name = 'news/post_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(EditPost, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.author = self.request.user
         form_uncommited.space = self.space
@@ -154,28 +111,15 @@ class EditPost(UpdateView):
         cur_post = get_object_or_404(Post, pk=self.kwargs['post_id'])
         return cur_post
 
-    def get_context_data(self, **kwargs):
-        context = super(EditPost, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
 
-
-class DeletePost(DeleteView):
+class DeletePost(SpaceMixin, DeleteView):
 
     """
     Delete an existent post. Post deletion is only reserved to spaces
     administrators or site admins.
     """
     context_object_name = "get_place"
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(DeletePost, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
@@ -183,12 +127,3 @@ class DeletePost(DeleteView):
 
     def get_object(self):
         return get_object_or_404(Post, pk=self.kwargs['post_id'])
-
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for the ViewPost view.
-        """
-        context = super(DeletePost, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
@@ -34,6 +34,8 @@ from django.conf import settings
 from apps.thirdparty.tagging.fields import TagField
 from apps.thirdparty.tagging.models import Tag
 from core.spaces.models import Space
+from helpers.counters import count_comments, count_related
+from helpers.viewcounts import count_views
 from apps.ecidadania.debate.models import Debate
 
 CLOSE_REASONS = (
@@ -181,6 +183,13 @@ class Proposal(BaseProposalAbstractModel):
     refurbished = models.NullBooleanField(default=False, blank=True)
     budget = models.IntegerField(blank=True, null=True)
 
+    # Counters, kept up to date by helpers.counters
+    support_count = models.IntegerField(_('Support votes'), default=0,
+        editable=False)
+    comment_count = models.IntegerField(_('Comments'), default=0,
+        editable=False)
+    views = models.IntegerField(_('Views'), default=0, editable=False)
+
     pub_date = models.DateTimeField(auto_now_add=True)
     mod_date = models.DateTimeField(auto_now_add=True)
 
@@ -234,3 +243,12 @@ class ProposalField(models.Model):
     class Meta:
         verbose_name = _('ProposalField')
         verbose_name_plural = _('ProposalFields')
+
+
+count_related(Proposal, 'support_votes', 'support_count')
+count_comments(Proposal)
+count_views(Proposal)
+
+# Keeps the rankings of the spaces up to date in every process, not only in
+# the ones that load the views
+import core.spaces.rankings
@@ -20,23 +20,28 @@ Common functions and classes for proposals and proposal sets.
 
 from django.views.generic.detail import DetailView
 from django.views.decorators.http import require_POST
-from django.db.models import Count
 from django.template import RequestContext
 from django.utils.translation import ugettext_lazy as _
 from django.utils.decorators import method_decorator
-from django.http import HttpResponse, HttpResponseServerError
+from django.http import HttpResponse, HttpResponseBadRequest, \
+    HttpResponseServerError
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from guardian.shortcuts import assign_perm
 from guardian.decorators import permission_required_or_403
 from django.core.exceptions import PermissionDenied
 
 from apps.ecidadania.proposals import url_names as urln_prop
 from core.spaces import url_names as urln_space
-from core.spaces.models import Space
+from core.spaces.middleware import get_request_space
+from core.spaces.models import SpaceMembership
+from core.spaces.mixins import SpaceMixin
 from apps.ecidadania.proposals.models import Proposal
+from helpers.viewcounts import add_view
+from helpers.votes import add_vote
 
 
-class ViewProposal(DetailView):
+class ViewProposal(SpaceMixin, DetailView):
 
     """
     Detail view of a proposal. Inherits from django :class:`DetailView` generic
@@ -52,35 +57,26 @@ class ViewProposal(DetailView):
     context_object_name = 'proposal'
     template_name = 'proposals/proposal_detail.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewProposal, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
-        prop_id = self.kwargs['prop_id']
-        proposal = get_object_or_404(Proposal, pk=prop_id)
+        # Everything the page shows comes from this fetch (the counters
+        # included), so the number of queries doesn't depend on the size of
+        # the space or on the number of votes.
+        proposal = get_object_or_404(Proposal.objects.select_related('author'),
+                                     pk=self.kwargs['prop_id'],
+                                     space=self.space)
+        add_view(proposal)
         return proposal
 
     def get_context_data(self, **kwargs):
         context = super(ViewProposal, self).get_context_data(**kwargs)
-        current_space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        # We are going to get the proposal position in the list
-        self.get_position = 0
-        proposal = get_object_or_404(Proposal, pk=self.kwargs['prop_id'])
+        proposal = self.object
         if proposal.merged:
             context['merged_proposal'] = proposal.merged_proposals.all()
 
-        support_votes_count = Proposal.objects.filter(space=current_space)\
-                             .annotate(Count('support_votes'))
-        for i, x in enumerate(support_votes_count):
-            if x.id == int(self.kwargs['prop_id']):
-                self.get_position = i
-        context['support_votes_count'] = support_votes_count[int(self.get_position)].support_votes__count
-        context['get_place'] = current_space
+        user = self.request.user
+        context['has_supported'] = user.is_authenticated() and \
+            proposal.support_votes.filter(pk=user.pk).exists()
+        context['support_votes_count'] = proposal.support_count
         return context
 
 
@@ -94,14 +90,19 @@ def support_proposal(request, space_url):
 
     :permissions required: view_space
     """
-    prop = get_object_or_404(Proposal, pk=request.POST['propid'])
-    space = get_object_or_404(Space, url=space_url)
+    space = get_request_space(request, space_url)
+    prop = get_object_or_404(Proposal, pk=request.POST['propid'], space=space)
 
-    if request.user.has_perm('view_space', space):
+    if SpaceMembership.objects.is_member(request.user, space):
         try:
-            prop.support_votes.add(request.user)
+            # The vote is inserted in a savepoint, it needs a transaction
+            with transaction.commit_on_success():
+                voted = add_vote(prop, 'support_votes', request.user)
+            if not voted:
+                return HttpResponseBadRequest(
+                    _('You already support this proposal.'))
             return HttpResponse(_('Vote added'))
-        except:
+        except Exception:
             return HttpResponseServerError(_("Couldn't emit the vote."))
     else:
         raise PermissionDenied
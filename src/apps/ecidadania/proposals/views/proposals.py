@@ -24,7 +24,6 @@ from django.views.generic.list import ListView
 from django.views.generic.edit import UpdateView, DeleteView
 from django.views.generic import FormView
 from django.views.decorators.http import require_POST
-from django.db.models import Count
 from django.db.models import F
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
@@ -38,6 +37,7 @@ from django.core.exceptions import PermissionDenied
 from apps.ecidadania.proposals import url_names as urln_prop
 from core.spaces import url_names as urln_space
 from core.spaces.models import Space
+from core.spaces.mixins import SpaceMixin
 from apps.ecidadania.proposals.models import Proposal, ProposalSet, \
     ProposalField
 from apps.ecidadania.proposals.forms import ProposalForm, VoteProposal, \
@@ -45,7 +45,7 @@ from apps.ecidadania.proposals.forms import ProposalForm, VoteProposal, \
     ProposalMergeForm, ProposalFieldDeleteForm
 
 
-class AddProposal(FormView):
+class AddProposal(SpaceMixin, FormView):
 
     """
     Create a new single (not tied to a set) proposal. The permission checks are
@@ -58,36 +58,25 @@ class AddProposal(FormView):
     form_class = ProposalForm
     template_name = 'proposals/proposal_form.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(AddProposal, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln_space.SPACE_INDEX, kwargs={'space_url': space})
 
     def form_valid(self, form):
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
-        form_uncommited.space = space
+        form_uncommited.space = self.space
         form_uncommited.author = self.request.user
         form_uncommited.save()
         return super(AddProposal, self).form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super(AddProposal, self).get_context_data(**kwargs)
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         # self.field = ProposalField.objects.filter(proposalset=self.kwargs['p_set'])
-        context['get_place'] = self.space
         # context['form_field'] = [f_name.field_name for f_name in self.field]
         return context
 
 
-class EditProposal(UpdateView):
+class EditProposal(SpaceMixin, UpdateView):
 
     """
     The proposal can be edited not only by the space and global admins, but also by its
@@ -100,22 +89,16 @@ class EditProposal(UpdateView):
     """
     model = Proposal
     template_name = 'proposals/proposal_form.html'
+    space_permissions = ('admin_space', 'mod_space')
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        proposal = get_object_or_404(Proposal, pk=kwargs['prop_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space) or
-            proposal.author == request.user):
-            return super(EditProposal, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    def has_space_permission(self, user, space):
+        proposal = get_object_or_404(Proposal, pk=self.kwargs['prop_id'])
+        return (super(EditProposal, self).has_space_permission(user, space) or
+                proposal.author == user)
 
     def form_valid(self, form):
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
-        form_uncommited.space = space
+        form_uncommited.space = self.space
         form_uncommited.author = self.request.user
         form_uncommited.save()
         return super(EditProposal, self).form_valid(form)
@@ -136,11 +119,10 @@ class EditProposal(UpdateView):
         self.p_set = Proposal.objects.get(pk=self.kwargs['prop_id'])
         self.field = ProposalField.objects.filter(proposalset=self.p_set.proposalset)
         context['form_field'] = [f_name.field_name for f_name in self.field]
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
         return context
 
 
-class DeleteProposal(DeleteView):
+class DeleteProposal(SpaceMixin, DeleteView):
 
     """
     Delete a proposal.
@@ -148,17 +130,12 @@ class DeleteProposal(DeleteView):
     :rtype: Confirmation
     :context: get_place
     """
+    space_permissions = ('admin_space', 'mod_space')
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        proposal = get_object_or_404(Proposal, pk=kwargs['prop_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space) or
-            request.user == proposal.author):
-            return super(DeleteProposal, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    def has_space_permission(self, user, space):
+        proposal = get_object_or_404(Proposal, pk=self.kwargs['prop_id'])
+        return (super(DeleteProposal, self).has_space_permission(user, space) or
+                proposal.author == user)
 
     def get_object(self):
         prop_id = self.kwargs['prop_id']
@@ -169,13 +146,8 @@ class DeleteProposal(DeleteView):
         space = self.kwargs['space_url']
         return reverse(urln_space.SPACE_INDEX, kwargs={'space_url': space})
 
-    def get_context_data(self, **kwargs):
-        context = super(DeleteProposal, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
-
 
-class ListProposals(ListView):
+class ListProposals(SpaceMixin, ListView):
 
     """
     List all proposals stored whithin a space. Inherits from django :class:`ListView`
@@ -187,24 +159,10 @@ class ListProposals(ListView):
     paginate_by = 50
     context_object_name = 'proposal'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListProposals, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        objects = Proposal.objects.annotate(Count('support_votes')).filter(space=place.id).order_by('pub_date')
+        objects = Proposal.objects.filter(space=self.space.id).order_by('pub_date')
         return objects
 
-    def get_context_data(self, **kwargs):
-        context = super(ListProposals, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
-
 
 def merge_proposal(request, space_url, set_id):
 
@@ -41,6 +41,7 @@ from django.core.exceptions import PermissionDenied
 from apps.ecidadania.proposals import url_names as urln_prop
 from core.spaces import url_names as urln_space
 from core.spaces.models import Space
+from core.spaces.mixins import SpaceMixin
 from apps.ecidadania.proposals.models import Proposal, ProposalSet, \
     ProposalField
 from apps.ecidadania.proposals.forms import ProposalForm, VoteProposal, \
@@ -49,7 +50,7 @@ from apps.ecidadania.proposals.forms import ProposalForm, VoteProposal, \
 from apps.ecidadania.debate.models import Debate
 
 
-class AddProposalInSet(FormView):
+class AddProposalInSet(SpaceMixin, FormView):
 
     """
     Create a new single (not tied to a set) proposal.
@@ -61,20 +62,11 @@ class AddProposalInSet(FormView):
     form_class = ProposalFormInSet
     template_name = 'proposals/proposal_form_in_set.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(AddProposalInSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln_space.SPACE_INDEX, kwargs={'space_url': space})
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         pset = get_object_or_404(ProposalSet, pk=self.kwargs['set_id'])
         form_uncommited = form.save(commit=False)
         form_uncommited.space = self.space
@@ -85,9 +77,7 @@ class AddProposalInSet(FormView):
 
     def get_context_data(self, **kwargs):
         context = super(AddProposalInSet, self).get_context_data(**kwargs)
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         self.field = ProposalField.objects.filter(proposalset=self.kwargs['set_id'])
-        context['get_place'] = self.space
         context['form_field'] = [f_name.field_name for f_name in self.field]
         return context
 
@@ -230,7 +220,7 @@ def mergedproposal_to_set(request, space_url):
 # Proposal Sets
 #
 
-class ListProposalSet(ListView):
+class ListProposalSet(SpaceMixin, ListView):
 
     """
     List all the proposal set in a space.
@@ -243,27 +233,12 @@ class ListProposalSet(ListView):
     paginate_by = 20
     context_object_name = 'setlist'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListProposalSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        cur_space = self.kwargs['space_url']
-        place = get_object_or_404(Space, url=cur_space)
-        objects = ProposalSet.objects.filter(space=place)
+        objects = ProposalSet.objects.filter(space=self.space)
         return objects
 
-    def get_context_data(self, **kwargs):
-        context = super(ListProposalSet, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
-
 
-class ViewProposalSet(ListView):
+class ViewProposalSet(SpaceMixin, ListView):
 
     """
     List all the proposals inside a proposals set.
@@ -277,28 +252,13 @@ class ViewProposalSet(ListView):
     context_object_name = 'proposalset'
     template_name = 'proposals/proposalset_detail.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewProposalSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
         objects = Proposal.objects.all().filter(
             proposalset=self.kwargs['set_id']).order_by('pub_date')
         return objects
 
-    def get_context_data(self, **kwargs):
-        context = super(ViewProposalSet, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
-
 
-class AddProposalSet(FormView):
+class AddProposalSet(SpaceMixin, FormView):
 
     """
     Create a new prpoposal set, it can be related to a debate or be in free mode,
@@ -312,15 +272,7 @@ class AddProposalSet(FormView):
     """
     form_class = ProposalSetForm
     template_name = 'proposals/proposalset_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(AddProposalSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
@@ -332,21 +284,14 @@ class AddProposalSet(FormView):
         return kwargs
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.space = self.space
         form_uncommited.author = self.request.user
         form_uncommited.save()
         return super(AddProposalSet, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(AddProposalSet, self).get_context_data(**kwargs)
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = self.space
-        return context
-
 
-class EditProposalSet(UpdateView):
+class EditProposalSet(SpaceMixin, UpdateView):
 
     """
     Modify an already created proposal set.
@@ -358,15 +303,7 @@ class EditProposalSet(UpdateView):
     """
     model = ProposalSet
     template_name = 'proposals/proposalset_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(EditProposalSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
@@ -378,13 +315,8 @@ class EditProposalSet(UpdateView):
         propset_id = self.kwargs['set_id']
         return get_object_or_404(ProposalSet, pk=propset_id)
 
-    def get_context_data(self, **kwargs):
-        context = super(EditProposalSet, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
-
 
-class DeleteProposalSet(DeleteView):
+class DeleteProposalSet(SpaceMixin, DeleteView):
 
     """
     Delete a proposal set.
@@ -394,14 +326,7 @@ class DeleteProposalSet(DeleteView):
     :rtype: Confirmation
     :context: get_place
     """
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(DeleteProposalSet, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_object(self):
         return get_object_or_404(ProposalSet, pk=self.kwargs['set_id'])
@@ -409,8 +334,3 @@ class DeleteProposalSet(DeleteView):
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln_space.SPACE_INDEX, kwargs={'space_url': space})
-
-    def get_context_data(self, **kwargs):
-        context = super(DeleteProposalSet, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return context
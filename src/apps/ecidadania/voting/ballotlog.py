@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Append-only log of the votes of the votings and polls.
+
+Every vote added to or removed from ``Proposal.votes`` and ``Choice.votes``
+is appended, when it happens, to a segment file in BALLOT_LOG_ROOT: one
+segment per voting (``voting-<id>.log``, a vote on a proposal is written to
+every voting it belongs to) and one per poll (``poll-<id>.log``). The log is
+off while BALLOT_LOG_ROOT is not set.
+
+A segment starts with the 8 bytes of :data:`MAGIC` followed by fixed size
+records of :data:`RECORD_SIZE` bytes (little endian): time in microseconds
+since the epoch (int64), proposal or choice id (uint32), user id (int32)
+and +1 for a vote or -1 for a removed one (int8). The records of a change
+are written with a single ``write()`` on a file opened with ``O_APPEND``, so
+several processes can write to the same segment. Since the records have a
+fixed size the segments can be memory mapped, and a record torn by a crash
+at the end of a segment is ignored by the readers.
+
+:func:`recount` streams a segment (with NumPy over a memory map when it is
+installed) and returns the votes of every proposal or choice, using memory
+for the tally only. :func:`verify` compares it with the database. See the
+``recount_votes`` management command.
+
+.. versionadded:: 0.1.9
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.signals import m2m_changed
+
+from apps.ecidadania.proposals.models import Proposal
+from apps.ecidadania.voting.models import Voting, Choice
+from apps.ecidadania.voting.ponderation import get_voting_proposals, numpy
+
+LOG_ROOT = getattr(settings, 'BALLOT_LOG_ROOT', None)
+
+MAGIC = 'ECDBAL1\n'
+RECORD = struct.Struct('<qIib')
+RECORD_SIZE = RECORD.size
+
+# Records read at once by the readers
+CHUNK = 1 << 20
+
+VOTE = 1
+REMOVE = -1
+
+VOTING = 'voting'
+POLL = 'poll'
+
+
+def get_segment_path(kind, pk):
+    """
+    Returns the path of the segment of the voting or poll `pk`.
+    """
+    return os.path.join(LOG_ROOT, '%s-%d.log' % (kind, pk))
+
+
+def append(kind, pk, records):
+    """
+    Appends `records`, a list of (object_id, user_id, action) tuples, to the
+    segment of the voting or poll `pk`.
+    """
+    if not records:
+        return
+    now = int(time.time() * 1000000)
+    data = ''.join(RECORD.pack(now, object_id, user_id, action)
+                   for object_id, user_id, action in records)
+
+    path = get_segment_path(kind, pk)
+    if not os.path.exists(path):
+        _create_segment(path)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _create_segment(path):
+    """
+    Creates the segment in `path` with its header. The header is written to
+    a temporary file that is then linked to `path`, so other processes never
+    see a segment without it.
+    """
+    if not os.path.isdir(LOG_ROOT):
+        try:
+            os.makedirs(LOG_ROOT)
+        except OSError:
+            # Created by another process in the meantime
+            pass
+    fd, temp_path = tempfile.mkstemp(dir=LOG_ROOT)
+    try:
+        os.write(fd, MAGIC)
+    finally:
+        os.close(fd)
+    try:
+        os.link(temp_path, path)
+    except OSError:
+        # Another process created it first
+        pass
+    finally:
+        os.unlink(temp_path)
+
+
+def _open(path):
+    """
+    Returns a read only memory map of the segment in `path`, or None if it's
+    empty.
+    """
+    with open(path, 'rb') as segment:
+        if os.fstat(segment.fileno()).st_size <= len(MAGIC):
+            return None
+        data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(MAGIC)] != MAGIC:
+        data.close()
+        raise ValueError('%s is not a ballot log segment' % path)
+    return data
+
+
+def _count_records(data):
+    # Drop a record torn at the end
+    return (len(data) - len(MAGIC)) // RECORD_SIZE
+
+
+def iter_records(path):
+    """
+    Yields the (time, object_id, user_id, action) records of the segment in
+    `path`, in the order they were written.
+    """
+    data = _open(path)
+    if data is None:
+        return
+    try:
+        for i in xrange(_count_records(data)):
+            yield RECORD.unpack_from(data, len(MAGIC) + i * RECORD_SIZE)
+    finally:
+        data.close()
+
+
+def recount(path):
+    """
+    Returns a dictionary with the votes of every proposal or choice in the
+    segment in `path`.
+    """
+    votes = defaultdict(int)
+    if not os.path.exists(path):
+        return votes
+
+    if numpy is None:
+        for when, object_id, user_id, action in iter_records(path):
+            votes[object_id] += action
+        return votes
+
+    data = _open(path)
+    if data is None:
+        return votes
+    dtype = numpy.dtype([('time', '<i8'), ('object', '<u4'), ('user', '<i4'),
+                         ('action', 'i1')])
+    try:
+        for start in xrange(0, _count_records(data), CHUNK):
+            # Only this chunk of the map is read into memory
+            chunk = numpy.frombuffer(data, dtype=dtype, count=min(
+                CHUNK, _count_records(data) - start),
+                offset=len(MAGIC) + start * RECORD_SIZE)
+            objects, positions = numpy.unique(chunk['object'],
+                                              return_inverse=True)
+            sums = numpy.bincount(positions, weights=chunk['action'])
+            for object_id, total in zip(objects.tolist(), sums.tolist()):
+                votes[object_id] += int(total)
+            del chunk
+    finally:
+        data.close()
+    return votes
+
+
+def count_database(kind, pk):
+    """
+    Returns a dictionary with the votes of every proposal of the voting, or
+    every choice of the poll, `pk` in the database.
+    """
+    if kind == VOTING:
+        proposals = get_voting_proposals(Voting(pk=pk))
+        rows = Proposal.votes.through.objects \
+            .filter(proposal__in=proposals.values('pk')) \
+            .values_list('proposal').annotate(Count('user'))
+    else:
+        rows = Choice.votes.through.objects.filter(choice__poll=pk) \
+            .values_list('choice').annotate(Count('user'))
+    return dict(rows)
+
+
+def verify(kind, pk):
+    """
+    Recounts the segment of the voting or poll `pk` and compares it with the
+    database. Returns a dictionary with the (log, database) votes of the
+    proposals or choices that don't match.
+    """
+    logged = recount(get_segment_path(kind, pk))
+    stored = count_database(kind, pk)
+    return dict((object_id, (logged.get(object_id, 0),
+                             stored.get(object_id, 0)))
+                for object_id in set(logged) | set(stored)
+                if logged.get(object_id, 0) != stored.get(object_id, 0))
+
+
+# Signal handlers
+
+def _changed_pairs(relation, sender, instance, action, reverse, pk_set):
+    """
+    Returns the (object_id, user_id) pairs changed by an m2m_changed signal
+    of `relation` (``Proposal.votes`` or ``Choice.votes``), or None if the
+    action doesn't change anything yet.
+    """
+    field = relation.field
+    if action == 'post_add':
+        pks = pk_set
+    elif action == 'pre_remove':
+        # Only the votes that are really there are removed
+        own, other = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if reverse:
+            own, other = other, own
+        pks = sender.objects.filter(**{own: instance.pk,
+                                       '%s__in' % other: pk_set}) \
+            .values_list(other, flat=True)
+    elif action == 'pre_clear':
+        if reverse:
+            pks = field.model.objects.filter(**{field.name: instance}) \
+                .values_list('pk', flat=True)
+        else:
+            pks = getattr(instance, field.name).values_list('pk', flat=True)
+    else:
+        return None
+
+    if reverse:
+        return [(pk, instance.pk) for pk in pks]
+    return [(instance.pk, pk) for pk in pks]
+
+
+def _get_action(action):
+    return VOTE if action == 'post_add' else REMOVE
+
+
+def _proposal_votes_changed(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if LOG_ROOT is None:
+        return
+    pairs = _changed_pairs(Proposal.votes, sender, instance, action, reverse,
+                           pk_set)
+    if not pairs:
+        return
+
+    proposal_ids = set(proposal_id for proposal_id, user_id in pairs)
+    votings = defaultdict(set)
+    for proposal_id, voting_id in Voting.proposals.through.objects \
+            .filter(proposal__in=proposal_ids) \
+            .values_list('proposal', 'voting'):
+        votings[proposal_id].add(voting_id)
+    for proposal_id, voting_id in Proposal.objects \
+            .filter(pk__in=proposal_ids, proposalset__voting__isnull=False) \
+            .values_list('pk', 'proposalset__voting'):
+        votings[proposal_id].add(voting_id)
+
+    records = defaultdict(list)
+    for proposal_id, user_id in pairs:
+        for voting_id in votings[proposal_id]:
+            records[voting_id].append((proposal_id, user_id,
+                                       _get_action(action)))
+    for voting_id, voting_records in records.items():
+        append(VOTING, voting_id, voting_records)
+
+
+def _choice_votes_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if LOG_ROOT is None:
+        return
+    pairs = _changed_pairs(Choice.votes, sender, instance, action, reverse,
+                           pk_set)
+    if not pairs:
+        return
+
+    if reverse:
+        polls = dict(Choice.objects.filter(
+            pk__in=set(choice_id for choice_id, user_id in pairs))
+            .values_list('pk', 'poll'))
+    else:
+        polls = {instance.pk: instance.poll_id}
+
+    records = defaultdict(list)
+    for choice_id, user_id in pairs:
+        records[polls[choice_id]].append((choice_id, user_id,
+                                          _get_action(action)))
+    for poll_id, poll_records in records.items():
+        append(POLL, poll_id, poll_records)
+
+
+m2m_changed.connect(_proposal_votes_changed, sender=Proposal.votes.through,
+                    dispatch_uid='ballot_log_proposal_votes')
+m2m_changed.connect(_choice_votes_changed, sender=Choice.votes.through,
+                    dispatch_uid='ballot_log_choice_votes')
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Participatory budgeting: choose the proposals of a voting that get funded
+with the budget of the voting, using the `budget` of every proposal as its
+cost and its result (see :mod:`apps.ecidadania.voting.ponderation`) as its
+score. There are three methods:
+
+``votes``
+    Fund the proposals with the best score first, skipping the ones that
+    don't fit in what is left of the budget.
+``ratio``
+    The same, but ordered by score per unit of cost, so cheap proposals with
+    many votes go first.
+``knapsack``
+    Choose the combination of proposals with the highest total score that
+    fits in the budget (0/1 knapsack). Costs and budget are divided by the
+    greatest common divisor of the costs, and if the budget is still bigger
+    than the BUDGET_KNAPSACK_CELLS setting allows for the number of
+    proposals, costs are rounded up to a coarser unit. The result is then
+    approximate (but always within the budget): the money left by the
+    rounding is given to the remaining proposals by score per cost, and the
+    whole is compared with the ``ratio`` result, keeping the best one. The
+    table of decisions takes at most BUDGET_KNAPSACK_CELLS bits with NumPy,
+    or bytes (and a lot more time) without it.
+
+Proposals without a budget, or without any score, are never funded. Every
+proposal of the allocation carries the reason why it was funded or not.
+
+.. versionadded:: 0.1.9
+"""
+
+from fractions import gcd
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import ugettext as _
+
+from apps.ecidadania.voting.ponderation import count_results, \
+    get_voting_proposals, get_results_key, numpy
+
+KNAPSACK_CELLS = getattr(settings, 'BUDGET_KNAPSACK_CELLS', 5 * 10 ** 7)
+ALLOCATION_TIMEOUT = getattr(settings, 'VOTING_RESULTS_TIMEOUT', 60 * 5)
+
+VOTES = 'votes'
+RATIO = 'ratio'
+KNAPSACK = 'knapsack'
+METHODS = (VOTES, RATIO, KNAPSACK)
+
+
+class Item(object):
+
+    """
+    A proposal competing for the budget.
+    """
+
+    def __init__(self, pk, title, cost, score):
+        self.pk = pk
+        self.title = title
+        self.cost = cost
+        self.score = score
+        self.funded = False
+        self.reason = ''
+
+    @property
+    def eligible(self):
+        return self.cost is not None and self.cost >= 0 and self.score > 0
+
+
+class Allocation(object):
+
+    """
+    Result of an allocation. `items` has all the proposals, in the order in
+    which they were considered, `funded` only the ones that got the money.
+    """
+
+    def __init__(self, method, budget, items, exact=True):
+        self.method = method
+        self.budget = budget
+        self.items = items
+        self.exact = exact
+        self.funded = [item for item in items if item.funded]
+        self.spent = sum(item.cost for item in self.funded)
+        self.score = sum(item.score for item in self.funded)
+
+    @property
+    def remaining(self):
+        return self.budget - self.spent
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def _explain_ineligible(item):
+    if item.cost is None or item.cost < 0:
+        item.reason = _('Not funded: the proposal has no budget.')
+    else:
+        item.reason = _('Not funded: the proposal has no votes.')
+
+
+def _votes_key(item):
+    return (-item.score, item.cost, item.pk)
+
+
+def _ratio_key(item):
+    ratio = float(item.score) / item.cost if item.cost else float('inf')
+    return (-ratio, item.cost, item.pk)
+
+
+def _greedy(method, items, budget):
+    """
+    Funds the eligible `items` in the order of `method` while they fit.
+    """
+    key = _votes_key if method == VOTES else _ratio_key
+    items = sorted(items, key=lambda item: (not item.eligible, key(item)))
+    remaining = budget
+
+    for item in items:
+        if not item.eligible:
+            _explain_ineligible(item)
+        elif item.cost <= remaining:
+            remaining -= item.cost
+            item.funded = True
+            item.reason = _('Funded: it fits in the budget, %(remaining)s '
+                            'left after it.') % {'remaining': remaining}
+        else:
+            item.reason = _('Not funded: it costs %(cost)s and only '
+                            '%(remaining)s were left.') % {
+                                'cost': item.cost, 'remaining': remaining}
+
+    return Allocation(method, budget, items)
+
+
+def _knapsack_table(costs, scores, capacity):
+    """
+    Solves the 0/1 knapsack of the integer `costs` (all of them between 0
+    and `capacity`) and returns the indexes of the chosen items.
+    """
+    if numpy is not None:
+        best = numpy.zeros(capacity + 1)
+        keep = []
+        for cost, score in zip(costs, scores):
+            take = numpy.zeros(capacity + 1, dtype=bool)
+            if cost == 0:
+                take[:] = True
+                best += score
+            elif cost <= capacity:
+                candidate = best[:-cost] + score
+                take[cost:] = candidate > best[cost:]
+                best[cost:] = numpy.where(take[cost:], candidate, best[cost:])
+            # One bit per capacity
+            keep.append(numpy.packbits(take))
+        taken = lambda i, c: keep[i][c >> 3] >> (7 - (c & 7)) & 1
+    else:
+        best = [0.0] * (capacity + 1)
+        keep = []
+        for cost, score in zip(costs, scores):
+            take = bytearray(capacity + 1)
+            for c in xrange(capacity, cost - 1, -1):
+                candidate = best[c - cost] + score
+                if candidate > best[c]:
+                    best[c] = candidate
+                    take[c] = 1
+            keep.append(take)
+        taken = lambda i, c: keep[i][c]
+
+    chosen = []
+    c = capacity
+    for i in xrange(len(costs) - 1, -1, -1):
+        if taken(i, c):
+            chosen.append(i)
+            c -= costs[i]
+    return chosen
+
+
+def _knapsack(items, budget):
+    """
+    Funds the combination of eligible `items` with the best total score.
+    """
+    candidates = [item for item in items
+                  if item.eligible and item.cost <= budget]
+    for item in items:
+        if not item.eligible:
+            _explain_ineligible(item)
+        elif item.cost > budget:
+            item.reason = _('Not funded: it costs more than the whole '
+                            'budget.')
+
+    unit = reduce(gcd, [item.cost for item in candidates], 0) or 1
+    capacity = budget // unit
+    max_capacity = max(1, KNAPSACK_CELLS // max(1, len(candidates)) - 1)
+    exact = capacity <= max_capacity
+    if not exact:
+        # Round the costs up so the solution always fits in the budget
+        unit = -(-budget // max_capacity)
+        capacity = budget // unit
+
+    costs = [-(-item.cost // unit) for item in candidates]
+    chosen = _knapsack_table(costs, [item.score for item in candidates],
+                             capacity)
+
+    remaining = budget
+    for i in chosen:
+        candidates[i].funded = True
+        candidates[i].reason = _('Funded: part of the combination of '
+                                 'proposals with the highest score '
+                                 'within the budget.')
+        remaining -= candidates[i].cost
+
+    for item in sorted(candidates, key=_ratio_key):
+        if not item.funded and item.cost <= remaining:
+            # Rounding the costs up can leave money for some more
+            remaining -= item.cost
+            item.funded = True
+            item.reason = _('Funded: it fits in the money left by the '
+                            'combination of proposals, %(remaining)s left '
+                            'after it.') % {'remaining': remaining}
+        elif not item.funded:
+            item.reason = _('Not funded: the combination of proposals with '
+                            'the highest score within the budget leaves it '
+                            'out.')
+
+    items = sorted(items, key=lambda item: (not item.funded, -item.score,
+                                            item.pk))
+    allocation = Allocation(KNAPSACK, budget, items, exact)
+
+    if not exact:
+        greedy = _greedy(RATIO, [Item(i.pk, i.title, i.cost, i.score)
+                                 for i in items], budget)
+        if greedy.score > allocation.score:
+            greedy.method = KNAPSACK
+            greedy.exact = False
+            return greedy
+
+    return allocation
+
+
+def solve(items, budget, method=KNAPSACK):
+    """
+    Allocates `budget` among the `items` (a list of :class:`Item`) with the
+    given `method`.
+
+    :rtype: Allocation
+    """
+    if method not in METHODS:
+        raise ValueError('Unknown allocation method: %s' % method)
+    if method == KNAPSACK:
+        return _knapsack(items, budget)
+    return _greedy(method, items, budget)
+
+
+def allocate(voting, method=KNAPSACK, budget=None, weighted=True):
+    """
+    Allocates the budget of `voting` (or `budget` if it's given) among its
+    proposals. If `weighted` is False the votes are used as the score of the
+    proposals instead of the result of the ponderation.
+
+    :rtype: Allocation
+    """
+    if budget is None:
+        budget = voting.budget or 0
+    results = count_results(voting)
+    costs = dict(get_voting_proposals(voting).values_list('pk', 'budget'))
+    items = [Item(p.pk, p.title, costs.get(p.pk),
+                  p.score if weighted else p.votes) for p in results]
+    return solve(items, budget, method)
+
+
+def get_allocation(voting):
+    """
+    Returns the knapsack allocation of the budget of `voting`, from the cache
+    if it was made in the last VOTING_RESULTS_TIMEOUT seconds.
+
+    :rtype: Allocation
+    """
+    key = get_results_key(voting, 'allocation')
+    allocation = cache.get(key)
+    if allocation is None:
+        allocation = allocate(voting)
+        cache.set(key, allocation, ALLOCATION_TIMEOUT)
+    return allocation
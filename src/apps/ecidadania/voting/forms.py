@@ -54,6 +54,9 @@ class VotingForm(ModelForm):
 class VoteForm(ModelForm):
 
     """
+    The vote counts in every voting with the proposal, the user can't pick
+    the voting.
     """
     class Meta:
         model = ConfirmVote
+        exclude = ('voting',)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Allocate the budget of a voting process among its proposals.
+"""
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ecidadania.voting.models import Voting
+from apps.ecidadania.voting import budget
+
+
+class Command(BaseCommand):
+
+    """
+    Chooses the proposals of a voting that get funded with its budget (or
+    the one given with --budget) and prints every proposal with the reason
+    why it was funded or not.
+    """
+    args = '<voting_id>'
+    help = "Allocate the budget of a voting process among its proposals."
+    option_list = BaseCommand.option_list + (
+        make_option('--method', default=budget.KNAPSACK,
+                    choices=budget.METHODS,
+                    help='Allocation method: %s (default: %s).' % (
+                        ', '.join(budget.METHODS), budget.KNAPSACK)),
+        make_option('--budget', type='int',
+                    help='Budget to allocate instead of the voting one.'),
+        make_option('--unweighted', action='store_false', dest='weighted',
+                    default=True,
+                    help='Use the votes instead of the ponderation.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or not args[0].isdigit():
+            raise CommandError('Give the id of one voting.')
+        try:
+            voting = Voting.objects.get(pk=args[0])
+        except Voting.DoesNotExist:
+            raise CommandError('Voting not found: %s' % args[0])
+
+        allocation = budget.allocate(voting, options['method'],
+                                     options['budget'], options['weighted'])
+        self.stdout.write(u'%s (%s%s): %s of %s assigned, score %.2f\n' % (
+            voting.title, allocation.method,
+            '' if allocation.exact else ', approximate', allocation.spent,
+            allocation.budget, allocation.score))
+        for item in allocation:
+            self.stdout.write(u'  [%s] %s (%s): %s\n' % (
+                'x' if item.funded else ' ', item.title, item.cost,
+                item.reason))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Recount the votes of votings and polls from the ballot log.
+"""
+
+import os
+import re
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ecidadania.voting import ballotlog
+
+
+class Command(BaseCommand):
+
+    """
+    Streams the ballot log segments of the given votings and polls (or all
+    of them) and prints the votes of every proposal or choice. With --verify
+    the recount is compared with the votes in the database, and the command
+    fails if any of them doesn't match.
+    """
+    help = "Recount the votes of votings and polls from the ballot log."
+    option_list = BaseCommand.option_list + (
+        make_option('--voting', action='append', type='int', default=[],
+                    help='Recount this voting (can be repeated).'),
+        make_option('--poll', action='append', type='int', default=[],
+                    help='Recount this poll (can be repeated).'),
+        make_option('--verify', action='store_true', default=False,
+                    help='Compare the recount with the database.'),
+    )
+
+    def get_segments(self, options):
+        segments = [(ballotlog.VOTING, pk) for pk in options['voting']] + \
+            [(ballotlog.POLL, pk) for pk in options['poll']]
+        if segments:
+            return segments
+
+        for name in sorted(os.listdir(ballotlog.LOG_ROOT)):
+            match = re.match(r'^(%s|%s)-(\d+)\.log$' % (
+                ballotlog.VOTING, ballotlog.POLL), name)
+            if match:
+                segments.append((match.group(1), int(match.group(2))))
+        return segments
+
+    def handle(self, *args, **options):
+        if ballotlog.LOG_ROOT is None:
+            raise CommandError('The ballot log is off, set BALLOT_LOG_ROOT.')
+
+        failed = []
+        for kind, pk in self.get_segments(options):
+            if options['verify']:
+                mismatches = ballotlog.verify(kind, pk)
+                if mismatches:
+                    failed.append('%s %d' % (kind, pk))
+                self.stdout.write('%s %d: %s\n' % (
+                    kind, pk, 'mismatch' if mismatches else 'ok'))
+                for object_id, (logged, stored) in sorted(mismatches.items()):
+                    self.stdout.write('  %d: %d in the log, %d in the '
+                                      'database\n' % (object_id, logged,
+                                                      stored))
+            else:
+                votes = ballotlog.recount(
+                    ballotlog.get_segment_path(kind, pk))
+                self.stdout.write('%s %d: %d votes\n' % (
+                    kind, pk, sum(votes.values())))
+                for object_id, count in sorted(votes.items()):
+                    self.stdout.write('  %d: %d\n' % (object_id, count))
+
+        if failed:
+            raise CommandError('The log doesn\'t match the database: %s' %
+                               ', '.join(failed))
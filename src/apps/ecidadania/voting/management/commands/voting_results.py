@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Print the results of voting processes.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ecidadania.voting.models import Voting
+from apps.ecidadania.voting.ponderation import count_results
+
+
+class Command(BaseCommand):
+
+    """
+    Counts the results of the given votings (or all of them) from the
+    database, applying their ponderation, and prints the score, votes and
+    support votes of every proposal, best first.
+    """
+    args = '[voting_id ...]'
+    help = "Count and print the weighted results of voting processes."
+
+    def handle(self, *args, **options):
+        votings = Voting.objects.order_by('pk')
+        if args:
+            if not all(arg.isdigit() for arg in args):
+                raise CommandError('Voting ids must be numbers.')
+            votings = votings.filter(pk__in=args)
+            missing = set(args) - set(str(pk) for pk in
+                                      votings.values_list('pk', flat=True))
+            if missing:
+                raise CommandError('Voting not found: %s' %
+                                   ', '.join(sorted(missing)))
+
+        for voting in votings:
+            results = count_results(voting)
+            self.stdout.write(u'%s (%s): %d votes, %d support votes\n' % (
+                voting.title, results.ponderation, results.total_votes,
+                results.total_support))
+            for position, proposal in enumerate(results, 1):
+                self.stdout.write(u'  %d. %s: %.2f (%d votes, %d support)\n'
+                                  % (position, proposal.title, proposal.score,
+                                     proposal.votes, proposal.support))
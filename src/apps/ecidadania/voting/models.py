@@ -23,6 +23,7 @@ from django.core.exceptions import ValidationError
 from apps.thirdparty.tagging.fields import TagField
 from apps.thirdparty.tagging.models import Tag
 from core.spaces.models import Space
+from helpers.cache import cache_model
 from apps.ecidadania.proposals.models import *
 
 
@@ -106,6 +107,23 @@ class Choice(models.Model):
                 'poll_id': str(self.id)})
 
 
+class PollSnapshot(models.Model):
+
+    """
+    Final results of a poll, stored once its end date has passed. `results`
+    holds a JSON list with the id, text and votes of every choice.
+
+    .. versionadded:: 0.1.9
+    """
+    poll = models.OneToOneField(Poll, related_name='snapshot')
+    date = models.DateTimeField(_('Date'), auto_now_add=True)
+    results = models.TextField(_('Results'))
+    total = models.IntegerField(_('Total votes'))
+
+    def __unicode__(self):
+        return self.poll.question
+
+
 class Voting(models.Model):
     title = models.CharField(_('Title'), max_length=200, unique=True)
     description = models.TextField(_('Description'), blank=True, null=True)
@@ -116,13 +134,19 @@ class Voting(models.Model):
     author = models.ForeignKey(User, blank=True, null=True)
     start_date = models.DateField(_('Start date'), blank=True, null=True)
     end_date = models.DateField(_('End date'), blank=True, null=True)
-    ponderation = models.CharField(_('Ponderation'), max_length=3, null=True,
+    ponderation = models.CharField(_('Ponderation'), max_length=5, null=True,
         blank=True, choices=PONDERATIONS)
+    fixed_ponderation = models.PositiveSmallIntegerField(
+        _('Fixed ponderation'), blank=True, null=True, help_text=_('Percentage \
+        of the votes shared among the proposals by their support votes when \
+        the ponderation is fixed'))
     proposalsets = models.ManyToManyField(ProposalSet, blank=True, null=True)
 
     proposals = models.ManyToManyField(Proposal, blank=True, null=True, limit_choices_to={'proposalset__isnull': True})
     max_votes = models.IntegerField(_('Maximum votes per person'), blank=True,
         null=True)
+    budget = models.IntegerField(_('Budget'), blank=True, null=True,
+        help_text=_('Money available for the proposals that win the voting'))
 
     class Meta:
         permissions = (
@@ -154,9 +178,106 @@ class ConfirmVote(models.Model):
     """
     user = models.ForeignKey(User, blank=True, null=True)
     proposal = models.ForeignKey(Proposal, blank=True, null=True)
+    voting = models.ForeignKey(Voting, blank=True, null=True)
     token = models.CharField(max_length=32, blank=True, null=True)
     requested_on = models.DateTimeField(auto_now_add=True)
 
     def get_approve_url(self):
         site = Site.objects.all()[0]
         return "http://%s%svote/approve/%s" % (site.domain, self.proposal.get_absolute_url(), self.token)
+
+
+class BallotCounterManager(models.Manager):
+
+    """
+    Keeps the number of votes every user cast in every voting. The counters
+    are checked and increased in the same UPDATE, so two requests of the same
+    user running at the same time (in any process) can't both take the last
+    vote.
+    """
+
+    def claim(self, voting, user):
+        """
+        Takes one of the votes of `user` in `voting`. Returns False if the
+        user already cast `voting.max_votes` votes. Votes in votings without
+        a maximum are counted too, in case one is set later.
+        """
+        counters = self.filter(voting=voting, user=user)
+        if voting.max_votes is not None:
+            counters = counters.filter(votes__lt=voting.max_votes)
+
+        if counters.update(votes=models.F('votes') + 1):
+            return True
+        # Either the user never voted or there are no votes left.
+        # get_or_create copes with another request creating it first.
+        self.get_or_create(voting=voting, user=user)
+        return bool(counters.update(votes=models.F('votes') + 1))
+
+    def release(self, voting, user):
+        """
+        Gives back a vote taken with :meth:`claim`.
+        """
+        self.filter(voting=voting, user=user, votes__gt=0) \
+            .update(votes=models.F('votes') - 1)
+
+    def rebuild(self, voting=None):
+        """
+        Counts again the votes of every user in all the votings (or only
+        `voting`) from the votes of their proposals.
+        """
+        votings = Voting.objects.all()
+        if voting is not None:
+            votings = votings.filter(pk=voting.pk)
+
+        for voting in votings:
+            proposals = Proposal.objects.filter(
+                models.Q(voting=voting) | models.Q(proposalset__voting=voting))
+            rows = Proposal.votes.through.objects \
+                .filter(proposal__in=proposals.values('pk')) \
+                .values_list('user').annotate(models.Count('proposal'))
+            self.filter(voting=voting).delete()
+            self.bulk_create([BallotCounter(voting=voting, user_id=user_id,
+                                            votes=votes)
+                              for user_id, votes in rows])
+
+    def votes_left(self, voting, user):
+        """
+        Returns the number of votes `user` can still cast in `voting`, or
+        None if there's no maximum.
+        """
+        if voting.max_votes is None:
+            return None
+        used = self.filter(voting=voting, user=user) \
+            .values_list('votes', flat=True)
+        return max(0, voting.max_votes - (used[0] if used else 0))
+
+
+class BallotCounter(models.Model):
+
+    """
+    Number of votes cast by a user in a voting, used to enforce
+    `Voting.max_votes` without counting the votes.
+
+    .. versionadded:: 0.1.9
+    """
+    voting = models.ForeignKey(Voting, related_name='ballot_counters')
+    user = models.ForeignKey(User, related_name='ballot_counters')
+    votes = models.PositiveIntegerField(_('Votes'), default=0)
+
+    objects = BallotCounterManager()
+
+    class Meta:
+        unique_together = ('voting', 'user')
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.voting, self.user)
+
+
+cache_model(Poll)
+cache_model(Voting)
+
+# Writes the votes to the ballot log, it needs the models above
+import apps.ecidadania.voting.ballotlog
+
+# Keeps the poll results up to date, it needs the models above
+import apps.ecidadania.voting.tallies
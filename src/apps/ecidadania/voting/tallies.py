@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Poll results. The votes of every choice of a poll and the total are counted
+with a single aggregated query, and kept in the cache while the poll is open:
+every new vote adds to the cached count of its choice, so the results page
+doesn't count anything as long as the cache holds them. Removed votes, and
+new or deleted choices, drop the cached tally so it's counted again.
+
+The keys of a tally carry a version that is changed to drop it, and the
+counts are stored with ``cache.add``: a count that is already in the cache
+has been kept up to date by the votes since, so it's never replaced by an
+older one from a request that was counting at the same time.
+
+Once the end date of the poll has passed the results are stored in a
+:class:`PollSnapshot`, and that's what is shown from then on.
+
+.. versionadded:: 0.1.9
+"""
+
+import datetime
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from apps.ecidadania.voting.models import Choice, PollSnapshot
+
+TALLY_TIMEOUT = getattr(settings, 'POLL_TALLY_TIMEOUT', 60 * 10)
+# The version must outlive the tallies stored under it
+VERSION_TIMEOUT = TALLY_TIMEOUT * 6
+
+
+class Tally(object):
+
+    """
+    Results of a poll. `choices` is a list of :class:`ChoiceResult`, in the
+    order of the choices, and `total` the number of votes of all of them.
+    """
+
+    def __init__(self, choices, final=False):
+        self.choices = choices
+        self.total = sum(choice.votes for choice in choices)
+        self.final = final
+
+    def __iter__(self):
+        return iter(self.choices)
+
+
+class ChoiceResult(object):
+
+    """
+    Votes of a single choice.
+    """
+
+    def __init__(self, pk, choice_text, votes):
+        self.pk = pk
+        self.choice_text = choice_text
+        self.votes = votes
+
+
+def _get_version_key(poll_id):
+    return 'poll_tally_%s_version' % poll_id
+
+
+def _get_version(poll_id):
+    """
+    Returns the current version of the tally keys of the poll. If it's not
+    in the cache a new one is started from the current time, so counts stored
+    under an evicted version can't be reused.
+    """
+    version_key = _get_version_key(poll_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time()), VERSION_TIMEOUT)
+        version = cache.get(version_key, int(time.time()))
+    return version
+
+
+def _get_choices_key(poll_id, version):
+    return 'poll_tally_%s_%s' % (poll_id, version)
+
+
+def _get_votes_key(poll_id, version, choice_id):
+    return 'poll_tally_%s_%s_%s' % (poll_id, version, choice_id)
+
+
+def count_votes(poll):
+    """
+    Counts the votes of every choice of `poll` with one query.
+
+    :rtype: :class:`Tally`
+    """
+    rows = Choice.objects.filter(poll=poll).annotate(vote_count=Count('votes')) \
+        .order_by('pk').values_list('pk', 'choice_text', 'vote_count')
+    return Tally([ChoiceResult(*row) for row in rows])
+
+
+def _get_live_tally(poll):
+    """
+    Returns the tally of an open poll from the cache, counting and storing it
+    if any part is missing.
+    """
+    version = _get_version(poll.pk)
+    choices_key = _get_choices_key(poll.pk, version)
+    choices = cache.get(choices_key)
+    if choices is not None:
+        keys = [_get_votes_key(poll.pk, version, pk) for pk, text in choices]
+        votes = cache.get_many(keys)
+        if len(votes) == len(keys):
+            return Tally([ChoiceResult(pk, text, votes[key]) for (pk, text), key
+                          in zip(choices, keys)])
+
+    tally = count_votes(poll)
+    keys = [_get_votes_key(poll.pk, version, choice.pk) for choice in tally]
+    # Never replace a count stored by another request, the votes cast since
+    # then have been added to it
+    for choice, key in zip(tally, keys):
+        cache.add(key, choice.votes, TALLY_TIMEOUT)
+    cache.add(choices_key, [(choice.pk, choice.choice_text) for choice in tally],
+              TALLY_TIMEOUT)
+
+    votes = cache.get_many(keys)
+    for choice, key in zip(tally, keys):
+        choice.votes = votes.get(key, choice.votes)
+    return Tally(tally.choices)
+
+
+def take_snapshot(poll):
+    """
+    Stores the current results of `poll` as its final results and returns
+    them. If the poll already has a snapshot it is returned instead.
+    """
+    try:
+        snapshot = PollSnapshot.objects.get(poll=poll)
+    except PollSnapshot.DoesNotExist:
+        tally = count_votes(poll)
+        # Another request may be taking it at the same time, the first one
+        # wins and the rest get its snapshot
+        snapshot, created = PollSnapshot.objects.get_or_create(poll=poll,
+            defaults={'total': tally.total,
+                      'results': json.dumps([(c.pk, c.choice_text, c.votes)
+                                             for c in tally])})
+
+    return Tally([ChoiceResult(*row) for row in json.loads(snapshot.results)],
+                 final=True)
+
+
+def get_tally(poll):
+    """
+    Returns the results of `poll`, the final ones if it has ended.
+
+    :rtype: :class:`Tally`
+    """
+    if poll.end_date < datetime.date.today():
+        return take_snapshot(poll)
+    return _get_live_tally(poll)
+
+
+def invalidate_tally(poll_id):
+    """
+    Drops the cached tally of the poll, it will be counted again the next
+    time it's read.
+    """
+    try:
+        cache.incr(_get_version_key(poll_id))
+    except ValueError:
+        # Not in the cache, a new version will be started when read
+        pass
+
+
+# Signal handlers
+
+def _votes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # The votes of a user were changed, the choices are in pk_set
+        if action in ('post_add', 'post_remove'):
+            for poll_id, choice_id in Choice.objects.filter(pk__in=pk_set) \
+                    .values_list('poll', 'pk'):
+                if action == 'post_add':
+                    _add_vote(poll_id, choice_id)
+                else:
+                    invalidate_tally(poll_id)
+        elif action == 'pre_clear':
+            for poll_id in set(Choice.objects.filter(votes=instance)
+                               .values_list('poll', flat=True)):
+                invalidate_tally(poll_id)
+    elif action == 'post_add':
+        _add_vote(instance.poll_id, instance.pk, len(pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        invalidate_tally(instance.poll_id)
+
+
+def _add_vote(poll_id, choice_id, votes=1):
+    try:
+        cache.incr(_get_votes_key(poll_id, _get_version(poll_id), choice_id),
+                   votes)
+    except ValueError:
+        # Not in the cache, it will be counted when read. A request may be
+        # storing a count taken before this vote, so drop it
+        invalidate_tally(poll_id)
+
+
+def _choice_changed(sender, instance, **kwargs):
+    invalidate_tally(instance.poll_id)
+
+
+m2m_changed.connect(_votes_changed, sender=Choice.votes.through,
+                    dispatch_uid='poll_tally_votes')
+post_save.connect(_choice_changed, sender=Choice,
+                  dispatch_uid='poll_tally_choice_saved')
+post_delete.connect(_choice_changed, sender=Choice,
+                    dispatch_uid='poll_tally_choice_deleted')
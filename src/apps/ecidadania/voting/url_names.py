@@ -43,6 +43,8 @@ VOTE_VOTING = 'vote-voting'
 
 VIEW_VOTING = 'view-voting'
 
+VIEW_VOTING_RESULTS = 'view-voting-results'
+
 LIST_VOTING = 'list-votings'
 
 VALIDATE_VOTE = 'validate-vote'
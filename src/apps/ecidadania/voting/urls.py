@@ -23,7 +23,7 @@ from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from apps.ecidadania.voting.views.polls import ViewPoll, DeletePoll, \
     ListPolls, ViewPollResults
 from apps.ecidadania.voting.views.voting import ViewVoting, ListVotings, \
-    AddVoting, EditVoting, DeleteVoting
+    AddVoting, EditVoting, DeleteVoting, ViewVotingResults
 from apps.ecidadania.voting.url_names import *
 
 
@@ -55,6 +55,9 @@ urlpatterns = patterns('apps.ecidadania.voting.views',
 
     url(r'^(?P<voting_id>\d+)/$', ViewVoting.as_view(), name=VIEW_VOTING),
 
+    url(r'^(?P<voting_id>\d+)/results/$', ViewVotingResults.as_view(),
+        name=VIEW_VOTING_RESULTS),
+
     url(r'^vote/poll/(?P<poll_id>\d+)/$', 'polls.vote_poll', name=VOTE_POLL),
 
     url(r'^vote/voting/$', 'voting.vote_voting', name=VOTE_VOTING),
@@ -29,15 +29,20 @@ from django.contrib.auth.models import User
 from django.forms.formsets import formset_factory, BaseFormSet
 from django.forms.models import modelformset_factory, inlineformset_factory
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
-from helpers.cache import get_or_insert_object_in_cache
+from helpers.cache import get_cached_object_or_404
 from django.core.urlresolvers import reverse
+from django.db import transaction
 from django.db.models import Count, Sum
 from django.core.exceptions import PermissionDenied
 
-from core.spaces.models import Space
+from core.spaces.models import Space, SpaceMembership
+from core.spaces.middleware import get_request_space
+from core.spaces.mixins import SpaceMixin
 from core.spaces import url_names as urln
 from apps.ecidadania.voting import url_names as urln_voting
 from apps.ecidadania.voting.models import Choice, Poll
+from apps.ecidadania.voting.tallies import get_tally
+from helpers.votes import add_vote
 from apps.ecidadania.voting.forms import PollForm, ChoiceFormSet
 from apps.ecidadania.proposals.models import Proposal
 
@@ -52,7 +57,7 @@ def add_poll(request, space_url):
     :parameters: space_url
     :context: get_place
     """
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
     poll_form = PollForm(request.POST or None)
     choice_form = ChoiceFormSet(request.POST or None, prefix="choiceform",
         queryset=Choice.objects.none())
@@ -66,7 +71,7 @@ def add_poll(request, space_url):
                 poll_form_uncommited.author = request.user
 
                 saved_poll = poll_form_uncommited.save()
-                poll_instance = get_object_or_404(Poll,
+                poll_instance = get_cached_object_or_404(Poll,
                     pk=poll_form_uncommited.pk)
 
                 cform_uncommited = choice_form.save(commit=False)
@@ -84,7 +89,7 @@ def add_poll(request, space_url):
     raise PermissionDenied
 
 
-class ViewPoll(DetailView):
+class ViewPoll(SpaceMixin, DetailView):
 
     """
     Display a poll. If the poll didn't start, ended, or the user already voted
@@ -95,24 +100,10 @@ class ViewPoll(DetailView):
     context_object_name = 'poll'
     template_name = 'voting/poll_detail.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewPoll, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
-        poll = get_object_or_404(Poll, pk=self.kwargs['pk'])
+        poll = get_cached_object_or_404(Poll, pk=self.kwargs['pk'])
         return poll
 
-    def get_context_data(self, **kwargs):
-        context = super(ViewPoll, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
-
     def get(self, request, **kwargs):
         self.object = self.get_object()
         if self.request.user in self.object.participants.all() \
@@ -126,7 +117,7 @@ class ViewPoll(DetailView):
             return self.render_to_response(context)
 
 
-class ViewPollResults(DetailView):
+class ViewPollResults(SpaceMixin, DetailView):
 
     """
     Displays an specific poll results. The results are always available even
@@ -139,32 +130,15 @@ class ViewPollResults(DetailView):
     context_object_name = 'poll'
     template_name = 'voting/poll_results.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewPollResults, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
-        self.poll = get_object_or_404(Poll, pk=self.kwargs['pk'])
+        self.poll = get_cached_object_or_404(Poll, pk=self.kwargs['pk'])
         return self.poll
 
     def get_context_data(self, **kwargs):
         context = super(ViewPollResults, self).get_context_data(**kwargs)
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        total_votes = Choice.objects.filter(poll=self.poll)
-
-        # This fuckin' shitty logic should be removed from here, maybe there's
-        # a way to do this with django. The thing is to obtain all the votes
-        # from each choice and 'sum them all!'
-        v = 0
-        for vote in total_votes:
-            v += vote.votes.count()
-
-        context['get_place'] = space
-        context['votes_total'] = v
+        tally = get_tally(self.poll)
+        context['tally'] = tally
+        context['votes_total'] = tally.total
         return context
 
 
@@ -176,13 +150,13 @@ def edit_poll(request, space_url, poll_id):
     :parameters: space_url, poll_id
     :context: form, get_place, choiceform, pollid
     """
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if (request.user.has_perm('admin_space', place) or
         request.user.has_perm('mod_space', place)):
 
         ChoiceFormSet = inlineformset_factory(Poll, Choice, extra=1)
-        instance = Poll.objects.get(pk=poll_id)
+        instance = get_cached_object_or_404(Poll, pk=poll_id)
         poll_form = PollForm(request.POST or None, instance=instance)
         choice_form = ChoiceFormSet(request.POST or None, instance=instance,
             prefix="choiceform")
@@ -213,39 +187,24 @@ def edit_poll(request, space_url, poll_id):
     else:
         raise PermissionDenied
 
-class DeletePoll(DeleteView):
+class DeletePoll(SpaceMixin, DeleteView):
 
     """
     Delete an existent poll. Poll deletion is only reserved to spaces
     administrators or site admins.
     """
     context_object_name = "get_place"
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(DeletePoll, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return '/spaces/%s' % (space)
 
     def get_object(self):
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return get_object_or_404(Poll, pk=self.kwargs['poll_id'])
-
-    def get_context_data(self, **kwargs):
-        context = super(DeletePoll, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
+        return get_cached_object_or_404(Poll, pk=self.kwargs['poll_id'])
 
 
-class ListPolls(ListView):
+class ListPolls(SpaceMixin, ListView):
     """
     Return a list of polls for the current space.
 
@@ -253,27 +212,10 @@ class ListPolls(ListView):
     """
     paginate_by = 10
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListPolls, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        key = self.kwargs['space_url']
-        current_space = get_or_insert_object_in_cache(Space, key, url=key)
-        polls = Poll.objects.filter(space=current_space)
+        polls = Poll.objects.filter(space=self.space)
         return polls
 
-    def get_context_data(self, **kwargs):
-        context = super(ListPolls, self).get_context_data(**kwargs)
-        key = self.kwargs['space_url']
-        space = get_or_insert_object_in_cache(Space, key, url=key)
-        context['get_place'] = space
-        return context
-
 
 def vote_poll(request, poll_id, space_url):
 
@@ -282,10 +224,11 @@ def vote_poll(request, poll_id, space_url):
 
     .. versionadded:: 0.1.5
     """
-    space = get_object_or_404(Space, url=space_url)
-    poll = get_object_or_404(Poll, pk=poll_id)
+    space = get_request_space(request, space_url)
+    poll = get_cached_object_or_404(Poll, pk=poll_id)
     try:
-        choice = get_object_or_404(Choice, pk=request.POST['choice'])
+        choice = get_object_or_404(Choice, pk=request.POST['choice'],
+                                   poll=poll)
     except KeyError:
         return render_to_response('voting/poll_detail.html', {
             'poll': poll,
@@ -293,12 +236,26 @@ def vote_poll(request, poll_id, space_url):
             'error_message': "You didn't select a choice.",
         }, context_instance=RequestContext(request))
 
-    if request.user.has_perm('view_space', space) and request.method == 'POST':
-        poll.participants.add(request.user)
-        choice.votes.add(request.user)
+    if (request.method == 'POST' and
+            SpaceMembership.objects.is_member(request.user, space)):
+        # The participants tell who has voted, one vote per user and poll.
+        # Both votes are written together or not at all.
+        with transaction.commit_on_success():
+            voted = add_vote(poll, 'participants', request.user)
+            if voted:
+                add_vote(choice, 'votes', request.user)
+        if not voted:
+            return render_to_response('voting/poll_detail.html', {
+                'poll': poll,
+                'get_place': space,
+                'error_message': "You have already voted in this poll.",
+            }, context_instance=RequestContext(request))
+
+        tally = get_tally(poll)
         return render_to_response('voting/poll_results.html',
-            {'poll': poll, 'get_place': space, 'error_message': "You didn't \
-            select a choice."}, context_instance=RequestContext(request))
+            {'poll': poll, 'get_place': space, 'tally': tally,
+             'votes_total': tally.total},
+            context_instance=RequestContext(request))
 
     else:
         raise PermissionDenied
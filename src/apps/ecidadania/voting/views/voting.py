@@ -15,10 +15,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
 import hashlib
 
-from django.core.mail import send_mail
-from django.http import HttpResponse, HttpResponseRedirect, Http404, HttpResponseServerError
+from django.http import HttpResponse, HttpResponseRedirect, Http404, \
+    HttpResponseServerError, HttpResponseBadRequest
 from django.shortcuts import render_to_response, get_object_or_404, redirect
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required, permission_required
@@ -32,21 +33,28 @@ from django.contrib.auth.models import User
 from django.forms.formsets import formset_factory, BaseFormSet
 from django.forms.models import modelformset_factory, inlineformset_factory
 from django.core.exceptions import ObjectDoesNotExist
-from helpers.cache import get_or_insert_object_in_cache
+from helpers.cache import get_cached_object_or_404
 from django.core.urlresolvers import NoReverseMatch, reverse
 from django.template.response import TemplateResponse
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.sites.models import get_current_site
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Q
 
 from e_cidadania import settings
+from core.mailqueue.mail import send_mail
 from core.spaces.models import Space
+from core.spaces.mixins import SpaceMixin
 from apps.ecidadania.voting.models import *
 from apps.ecidadania.voting.forms import *
+from apps.ecidadania.voting.ponderation import get_results
+from apps.ecidadania.voting.budget import get_allocation
 from apps.ecidadania.proposals.models import Proposal, ProposalSet
+from helpers.votes import add_vote
 
 
-class AddVoting(FormView):
+class AddVoting(SpaceMixin, FormView):
 
     """
     Create a new voting process. Only registered users belonging to a concrete
@@ -59,32 +67,21 @@ class AddVoting(FormView):
     """
     form_class = VotingForm
     template_name = 'voting/voting_form.html'
-
-    def dispatch(self, request, *Args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(AddVoting, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_form_kwargs(self):
         """
         This send the current space to the form so we can change the
         foreignkeys querysets there.
         """
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
         kwargs = super(AddVoting, self).get_form_kwargs()
-        kwargs['current_space'] = space
+        kwargs['current_space'] = self.space
         return kwargs
 
     def get_success_url(self):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         return '/spaces/' + self.space.url + '/'
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.author = self.request.user
         form_uncommited.space = self.space
@@ -92,14 +89,8 @@ class AddVoting(FormView):
         form.save_m2m()
         return super(AddVoting, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(AddVoting, self).get_context_data(**kwargs)
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = self.space
-        return context
-
 
-class ViewVoting(DetailView):
+class ViewVoting(SpaceMixin, DetailView):
 
     """
     View a specific voting process.
@@ -110,16 +101,8 @@ class ViewVoting(DetailView):
     context_object_name = 'voting'
     template_name = 'voting/voting_detail.html'
 
-    def dispatch(self, request, *Args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewVoting, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
-        return Voting.objects.get(pk=self.kwargs['voting_id'])
+        return get_cached_object_or_404(Voting, pk=self.kwargs['voting_id'])
 
     def get_context_data(self, **kwargs):
 
@@ -127,8 +110,7 @@ class ViewVoting(DetailView):
         Get extra context data for the ViewVoting view.
         """
         context = super(ViewVoting, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space, url=self.kwargs['space_url'])
-        voting = Voting.objects.get(pk=self.kwargs['voting_id'])
+        voting = get_cached_object_or_404(Voting, pk=self.kwargs['voting_id'])
         all_proposals = Proposal.objects.all()
         proposalsets = voting.proposalsets.all()
         proposals = voting.proposals.all()
@@ -139,7 +121,33 @@ class ViewVoting(DetailView):
         return context
 
 
-class EditVoting(UpdateView):
+class ViewVotingResults(SpaceMixin, DetailView):
+
+    """
+    Displays the results of a voting process, weighted by its ponderation,
+    and the proposals funded with its budget if it has one.
+
+    .. versionadded:: 0.1.9
+
+    :context: get_place, voting, results, allocation
+    """
+    context_object_name = 'voting'
+    template_name = 'voting/voting_results.html'
+
+    def get_object(self):
+        self.voting = get_cached_object_or_404(Voting,
+                                               pk=self.kwargs['voting_id'])
+        return self.voting
+
+    def get_context_data(self, **kwargs):
+        context = super(ViewVotingResults, self).get_context_data(**kwargs)
+        context['results'] = get_results(self.voting)
+        if self.voting.budget:
+            context['allocation'] = get_allocation(self.voting)
+        return context
+
+
+class EditVoting(SpaceMixin, UpdateView):
 
     """
     Edit an existent voting process.
@@ -149,65 +157,33 @@ class EditVoting(UpdateView):
     """
     model = Voting
     template_name = 'voting/voting_form.html'
-
-    def dispatch(self, request, *Args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(EditVoting, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         return '/spaces/' + self.space.url
 
     def get_object(self):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return get_object_or_404(Voting, pk=self.kwargs['voting_id'])
+        return get_cached_object_or_404(Voting, pk=self.kwargs['voting_id'])
 
-    def get_context_data(self, **kwargs):
-        context = super(EditVoting, self).get_context_data(**kwargs)
-        context['get_place'] = self.space
-        return context
 
-
-class DeleteVoting(DeleteView):
+class DeleteVoting(SpaceMixin, DeleteView):
 
     """
     Delete an existent voting process. Voting process deletion is only reserved to spaces
     administrators or site admins.
     """
     context_object_name = "get_place"
-
-    def dispatch(self, request, *Args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(DeleteVoting, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return '/spaces/%s' % (space)
 
     def get_object(self):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return get_object_or_404(Voting, pk=self.kwargs['voting_id'])
+        return get_cached_object_or_404(Voting, pk=self.kwargs['voting_id'])
 
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for the ViewVoting view.
-        """
-        context = super(DeleteVoting, self).get_context_data(**kwargs)
-        context['get_place'] = self.space
-        return context
 
-
-class ListVotings(ListView):
+class ListVotings(SpaceMixin, ListView):
 
     """
     List all the existing votings inside the space. This is meant to be a
@@ -218,26 +194,27 @@ class ListVotings(ListView):
     """
     paginate_by = 10
 
-    def dispatch(self, request, *Args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListVotings, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        key = self.kwargs['space_url']
-        current_space = get_or_insert_object_in_cache(Space, key, url=key)
-        votings = Voting.objects.filter(space=current_space)
+        votings = Voting.objects.filter(space=self.space)
         return votings
 
-    def get_context_data(self, **kwargs):
-        context = super(ListVotings, self).get_context_data(**kwargs)
-        key = self.kwargs['space_url']
-        space = get_or_insert_object_in_cache(Space, key, url=key)
-        context['get_place'] = space
-        return context
+
+def _get_votings(proposal):
+    """
+    Returns the votings where a vote on `proposal` counts, all the votings
+    with the proposal or its proposal set.
+    """
+    lookup = Q(proposals=proposal)
+    if proposal.proposalset_id is not None:
+        lookup |= Q(proposalsets=proposal.proposalset_id)
+    return Voting.objects.filter(lookup).distinct()
+
+
+class VoteRefused(Exception):
+
+    """
+    Gives back the votes taken for a vote that can't be cast.
+    """
 
 
 def vote_voting(request, space_url):
@@ -247,16 +224,23 @@ def vote_voting(request, space_url):
     proposals support_votes. This function creates a new ConfirmVote object
     trough VoteForm with the user and a token. After that an email is sent
     to the user with the token for validation. This function does not add the
-    votes.
+    votes, but it refuses to send the email if the user has no votes left in
+    the voting (see :meth:`BallotCounterManager.votes_left`).
 
     .. versionadded:: 0.1.7
     """
     proposal = get_object_or_404(Proposal, pk=request.POST['propid'])
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
     voteform = VoteForm(request.POST)
 
-    if request.user_has_perm('view_space', space):
+    if request.user.has_perm('view_space', space):
         if request.method == 'POST' and voteform.is_valid():
+            for voting in _get_votings(proposal):
+                if BallotCounter.objects.votes_left(voting,
+                                                    request.user) == 0:
+                    return HttpResponseBadRequest(
+                        _("You have no votes left in this voting."))
+
             # Generate the objetct
             token = hashlib.md5("%s%s%s" % (request.user, space,
                         datetime.datetime.now())).hexdigest()
@@ -277,6 +261,7 @@ def vote_voting(request, space_url):
                 send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [user_email])
             except:
                 return HttpResponseServerError(_("Couldn't send the email."))
+            return HttpResponse(_("We sent you an email for validating the vote."))
         else:
             return HttpResponseBadRequest(_("Request is not POST."))
     else:
@@ -290,20 +275,48 @@ def validate_voting(request, space_url, token):
     token provided by the user is the same located in the database. If the
     token is the same, a vote is added, if not, we redirect the user to an
     error page.
+
+    The vote takes one of the votes of the user in every voting where it
+    counts, and it's refused if there are none left in any of them. Those
+    are checked and taken atomically by :class:`BallotCounter`, so parallel
+    validations can't go over `Voting.max_votes`. The votes are taken and
+    the vote is inserted in the same transaction: if the user had voted the
+    proposal already (or any step fails) the votes are given back.
     """
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
     tk = get_object_or_404(ConfirmVote, token=token)
 
     if (request.user.has_perm('admin_space', space) or
         request.user.has_perm('mod_space', space) or
         request.user == tk.user):
+        prop = get_object_or_404(Proposal, pk=tk.proposal_id)
+        voted = None
         try:
-            prop = get_object_or_404(Proposal, pk=tk.proposal.id)
-            prop.votes.add(request.user)
-            return HttpResponse("Your vote has been validated.")
-        except:
-            return HttpResponse("Error V01: Couldn't find the token for validation or the token has already been used.")
+            with transaction.commit_on_success():
+                claimed = []
+                try:
+                    for voting in _get_votings(prop):
+                        if not BallotCounter.objects.claim(voting,
+                                                           request.user):
+                            raise VoteRefused
+                        claimed.append(voting)
+                    # The vote goes last, its signals must only see real votes
+                    voted = add_vote(prop, 'votes', request.user)
+                    if not voted:
+                        raise VoteRefused
+                except VoteRefused:
+                    # The rollback undoes the claims as well, this is for
+                    # databases without transactions
+                    for voting in claimed:
+                        BallotCounter.objects.release(voting, request.user)
+                    raise
+        except VoteRefused:
+            if voted is False:
+                return HttpResponse("Error V01: Couldn't find the token for validation or the token has already been used.")
+            return HttpResponseBadRequest(
+                _("You have no votes left in this voting."))
         tk.delete()
+        return HttpResponse("Your vote has been validated.")
 
     else:
         raise PermissionDenied
@@ -8,6 +8,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from apps.thirdparty.userprofile.models import EmailValidation
 from django.core.files.uploadedfile import SimpleUploadedFile
+from helpers.images import validate_image
 import mimetypes
 import urllib
 
@@ -53,9 +54,10 @@ class PublicFieldsForm(forms.ModelForm):
 
 class AvatarForm(forms.Form):
     """
-    The avatar form requires only one image field.
+    The avatar form requires only one image field. Images over the
+    IMAGE_MAX_PIXELS setting are refused from their header.
     """
-    photo = forms.ImageField(required=False)
+    photo = forms.ImageField(required=False, validators=[validate_image])
     url = forms.URLField(required=False)
 
     def clean_url(self):
@@ -65,7 +67,9 @@ class AvatarForm(forms.Form):
         filename, headers = urllib.urlretrieve(url)
         if not mimetypes.guess_all_extensions(headers.get('Content-Type')):
             raise forms.ValidationError(_('The file type is invalid: %s' % type))
-        return SimpleUploadedFile(filename, open(filename).read(), content_type=headers.get('Content-Type'))
+        image = SimpleUploadedFile(filename, open(filename).read(), content_type=headers.get('Content-Type'))
+        validate_image(image)
+        return image
 
     def clean(self):
         if not (self.cleaned_data.get('photo') or self.cleaned_data.get('url')):
@@ -81,6 +85,8 @@ class AvatarCropForm(forms.Form):
     bottom = forms.IntegerField()
     left = forms.IntegerField()
     right = forms.IntegerField()
+    # Width of the image shown in the crop page
+    width = forms.IntegerField(required=False)
 
     def clean(self):
         if int(self.cleaned_data.get('right')) - int(self.cleaned_data.get('left')) < 96:
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background jobs of the avatars (see :mod:`core.jobs.runner`).
+
+.. versionadded:: 0.1.9
+"""
+
+import os
+
+from core.jobs.models import HIGH
+from core.jobs.runner import register
+from apps.thirdparty.userprofile.models import Avatar, AVATAR_SIZES
+from helpers.images import Pipeline
+
+# Size of the uploaded avatars shown in the crop page
+CROP_SIZE = 480
+
+
+def get_size_path(path, size):
+    """
+    Returns the path of the avatar in `path` resized to `size`.
+    """
+    base, extension = os.path.splitext(path)
+    return '%s.%s%s' % (base, size, extension)
+
+
+def get_sizes_pipeline(path, pipeline=None):
+    """
+    Returns a pipeline that saves every size of AVATAR_SIZES of the avatar in
+    `path`, after the operations of `pipeline` if it's given. Every size is
+    made from the previous, bigger one.
+    """
+    pipeline = pipeline or Pipeline()
+    for size in sorted(AVATAR_SIZES, reverse=True):
+        pipeline = pipeline.scale(size, size) \
+            .save(get_size_path(path, size), 'JPEG')
+    return pipeline
+
+
+def make_sizes(image, path):
+    """
+    Saves every size of AVATAR_SIZES of the avatar in `path` from `image`,
+    the PIL image of the avatar.
+    """
+    get_sizes_pipeline(path).apply(image)
+
+
+@register('userprofile.shrink_avatar', priority=HIGH)
+def shrink_avatar(avatar_id):
+    """
+    Shrinks a new avatar to fit in the crop page.
+    """
+    try:
+        avatar = Avatar.objects.get(pk=avatar_id)
+    except Avatar.DoesNotExist:
+        return
+    path = avatar.image.path
+    Pipeline().scale(CROP_SIZE, CROP_SIZE).save(path, 'JPEG').run(path)
+
+
+@register('userprofile.resize_avatar', unique=True)
+def resize_avatar(path):
+    """
+    Creates every size of AVATAR_SIZES of the avatar in `path`, decoding it
+    only once.
+    """
+    if not os.path.isfile(path):
+        # Deleted in the meantime
+        return
+    get_sizes_pipeline(path).run(path)
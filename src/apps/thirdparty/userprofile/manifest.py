@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cached manifest of the avatar of every user, used by the ``{% avatar %}``
+tag.
+
+The manifest of a user is a dictionary with the URL of every size of
+AVATAR_SIZES, built with a single query and kept in the cache for
+AVATAR_MANIFEST_TIMEOUT seconds, so the tag doesn't touch the database or
+the disk. It is dropped whenever an avatar of the user is saved or deleted.
+The manifests of a whole list of users are read at once with
+:func:`get_manifests`, building the missing ones with a single query.
+
+Since every size is made when the avatar is validated (see
+:func:`apps.thirdparty.userprofile.jobs.make_sizes`), the files are only
+looked for when the manifest is built. Sizes that are still missing (for
+example of the avatars validated before the sizes were made at that time)
+are queued to be made, the full avatar is given in their place and the
+manifest is kept only for AVATAR_MANIFEST_RETRY seconds.
+
+The users without avatar get DEFAULT_AVATAR_STATIC, a static file whose
+sizes are static files too (``generic.96.jpg``...). Nothing is ever made
+for it, the sizes missing from the static files are given the full avatar.
+
+.. versionadded:: 0.1.9
+"""
+
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+from apps.thirdparty.userprofile.models import Avatar, AVATAR_SIZES
+from apps.thirdparty.userprofile.jobs import get_size_path, resize_avatar
+
+MANIFEST_TIMEOUT = getattr(settings, 'AVATAR_MANIFEST_TIMEOUT',
+                           60 * 60 * 24)
+MANIFEST_RETRY = getattr(settings, 'AVATAR_MANIFEST_RETRY', 60)
+
+# Name of the default avatar in the static files
+DEFAULT_AVATAR = getattr(settings, 'DEFAULT_AVATAR_STATIC', 'generic.jpg')
+
+DEFAULT_KEY = 'avatar_manifest_default'
+
+# Views put the preloaded manifests (see get_manifests) in this variable of
+# the template context, the avatar tag looks there before going to the cache
+MANIFESTS_VARIABLE = 'avatar_manifests'
+
+
+def _get_manifest_key(user_id):
+    """
+    Returns the cache key of the manifest of the user with `user_id`.
+    """
+    return 'avatar_manifest_%s' % user_id
+
+
+def _build_manifest(path, url):
+    """
+    Returns the manifest of the avatar in `path`, served from `url`, and
+    whether all its sizes exist.
+    """
+    base, extension = os.path.splitext(url)
+    manifest = {}
+    for size in AVATAR_SIZES:
+        if os.path.isfile(get_size_path(path, size)):
+            manifest[size] = '%s.%s%s' % (base, size, extension)
+        else:
+            manifest[size] = url
+    complete = url not in manifest.values()
+    if not complete:
+        resize_avatar.delay(path)
+    return manifest, complete
+
+
+def _build_default_manifest():
+    """
+    Returns the manifest of the default avatar, served from the static
+    files, and whether all its sizes exist.
+    """
+    manifest = {}
+    for size in AVATAR_SIZES:
+        name = get_size_path(DEFAULT_AVATAR, size)
+        if not finders.find(name):
+            name = DEFAULT_AVATAR
+        manifest[size] = staticfiles_storage.url(name)
+    # The static files don't change while running, there's nothing to retry
+    return manifest, True
+
+
+def _get_or_build(key, build):
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest, complete = build()
+        cache.set(key, manifest,
+                  MANIFEST_TIMEOUT if complete else MANIFEST_RETRY)
+    return manifest
+
+
+def get_default_manifest():
+    """
+    Returns the manifest of the avatar of the users without one.
+    """
+    return _get_or_build(DEFAULT_KEY, _build_default_manifest)
+
+
+def get_manifest(user):
+    """
+    Returns a dictionary with the URL of every size of the avatar of `user`
+    (a user or its primary key). Users without a valid avatar, and the
+    anonymous one, get the default avatar.
+    """
+    user_id = getattr(user, 'pk', user)
+    if user_id is None:
+        return get_default_manifest()
+
+    def build():
+        try:
+            image = Avatar.objects.only('image') \
+                .get(user=user_id, valid=True).image
+        except Avatar.DoesNotExist:
+            # Don't look for this user again until it has an avatar
+            return {}, True
+        return _build_manifest(image.path, image.url)
+
+    return _get_or_build(_get_manifest_key(user_id), build) or \
+        get_default_manifest()
+
+
+def get_manifests(users):
+    """
+    Returns a dictionary with the manifest of every user of `users` (users
+    or their primary keys) by user id. The manifests missing from the cache
+    are built with a single query.
+    """
+    user_ids = set(getattr(user, 'pk', user) for user in users)
+    user_ids.discard(None)
+    keys = dict((_get_manifest_key(user_id), user_id) for user_id in user_ids)
+    cached = cache.get_many(keys.keys())
+    manifests = dict((keys[key], manifest)
+                     for key, manifest in cached.items())
+
+    missing = user_ids.difference(manifests)
+    if missing:
+        built = dict((user_id, {}) for user_id in missing)
+        complete = set(missing)
+        for avatar in Avatar.objects.filter(user__in=missing, valid=True) \
+                .only('user', 'image'):
+            built[avatar.user_id], done = _build_manifest(avatar.image.path,
+                                                          avatar.image.url)
+            if not done:
+                complete.discard(avatar.user_id)
+        for user_ids, timeout in ((complete, MANIFEST_TIMEOUT),
+                                  (missing - complete, MANIFEST_RETRY)):
+            if user_ids:
+                cache.set_many(dict((_get_manifest_key(user_id),
+                                     built[user_id]) for user_id in user_ids),
+                               timeout)
+        manifests.update(built)
+
+    default = None
+    for user_id, manifest in manifests.items():
+        if not manifest:
+            default = default or get_default_manifest()
+            manifests[user_id] = default
+    return manifests
+
+
+def get_avatar_urls(users, size):
+    """
+    Returns a dictionary with the URL of the avatar in `size` of every user
+    of `users` (users or their primary keys) by user id, see
+    :func:`get_manifests`.
+    """
+    return dict((user_id, manifest[size])
+                for user_id, manifest in get_manifests(users).items())
+
+
+def get_avatar_url(user, size):
+    """
+    Returns the URL of the avatar of `user` in `size`, one of AVATAR_SIZES.
+    """
+    return get_manifest(user)[size]
+
+
+def invalidate_manifest(user_id):
+    """
+    Drops the manifest of the user with `user_id` from the cache.
+    """
+    cache.delete(_get_manifest_key(user_id))
+
+
+# Signal handlers
+
+def _avatar_changed(sender, instance, **kwargs):
+    invalidate_manifest(instance.user_id)
+
+
+post_save.connect(_avatar_changed, sender=Avatar,
+                  dispatch_uid='avatar_manifest_save')
+post_delete.connect(_avatar_changed, sender=Avatar,
+                    dispatch_uid='avatar_manifest_delete')
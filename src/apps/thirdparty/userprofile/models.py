@@ -6,7 +6,7 @@ from django.template.defaultfilters import slugify
 from django.utils.translation import ugettext as _
 from django.template import loader, Context
 from django.core.urlresolvers import reverse
-from django.core.mail import send_mail
+from core.mailqueue.mail import send_mail
 from django.conf import settings
 import datetime
 import cPickle as pickle
@@ -160,3 +160,7 @@ class EmailValidation(models.Model):
         self.created = datetime.datetime.now()
         self.save()
         return True
+
+
+# Keeps the avatar manifests up to date
+import apps.thirdparty.userprofile.manifest
@@ -8,8 +8,7 @@ from django.conf import settings
 
 from userprofile import profile_settings as _settings
 from userprofile.models import Profile
-# from PythonMagick import Image
-from utils.TuxieMagick import Image
+from helpers.images import Pipeline, get_image_size
 
 from os import path, makedirs
 from shutil import copy
@@ -40,7 +39,7 @@ class ResizedThumbnailNode(Node):
         if not file:
             return self.size == _settings.DEFAULT_AVATAR_WIDTH
         else:
-            return self.size == Image(file).size().width()
+            return self.size == get_image_size(file)[0]
 
     def get_profile(self):
         # Maybe django-profile it's not set as AUTH_PROFILE_MODULE
@@ -115,7 +114,6 @@ class ResizedThumbnailNode(Node):
                     file_path = path.join(file_root, _settings.DEFAULT_AVATAR)
         # Oops, I din't find it, let's try to generate it.
         if path.exists(file_path):
-            orig_file = Image(file_path)
             dest_root = path.join(avatars_root, str(self.size))
             try:
                 makedirs(dest_root)
@@ -126,10 +124,10 @@ class ResizedThumbnailNode(Node):
         else:
             # Did my best...
             return ''  # fail silently
-        orig_file.scale(self.size)
-        if orig_file.write(dest_path):
+        try:
+            Pipeline().scale(self.size).save(dest_path).run(file_path)
             return self.as_url(dest_path)
-        else:
+        except IOError:
             print '=== ERROR ==='
             return ''  # damn! Close but no cigar...
 
@@ -1,23 +1,13 @@
 # coding=UTF-8
 from django.template import Library, Node, Template, TemplateSyntaxError, \
-    Variable
+    Variable, VariableDoesNotExist
 from django.utils.translation import ugettext as _
-from apps.thirdparty.userprofile.models import Avatar, AVATAR_SIZES
-from django.contrib.auth.models import User
-from django.conf import settings
-import Image
-# from PythonMagick import Image
-# from utils.TuxieMagick import Image
-import os
-import time
+from apps.thirdparty.userprofile.models import AVATAR_SIZES
+from apps.thirdparty.userprofile.manifest import get_avatar_url, \
+    get_default_manifest, get_manifests, MANIFESTS_VARIABLE as MANIFESTS
 
 register = Library()
 
-if hasattr(settings, "DEFAULT_AVATAR") and settings.DEFAULT_AVATAR:
-    DEFAULT_AVATAR = settings.DEFAULT_AVATAR
-else:
-    DEFAULT_AVATAR = os.path.join(settings.MEDIA_ROOT, "generic.jpg")
-
 
 class ResizedThumbnailNode(Node):
     def __init__(self, size, username=None):
@@ -40,26 +30,38 @@ class ResizedThumbnailNode(Node):
 
         try:
             user = self.user.resolve(context)
-            avatar = Avatar.objects.get(user=user, valid=True).image
-            avatar_path = avatar.path
-            base, filename = os.path.split(avatar_path)
-            name, extension = os.path.splitext(filename)
-            filename = os.path.join(base, "%s.%s%s" % (name, self.size, extension))
-            base, temp = os.path.split(avatar.url)
-            url = os.path.join(base, "%s.%s%s" % (name, self.size, extension))
-        except:
-            avatar_path = DEFAULT_AVATAR
-            base, filename = os.path.split(avatar_path)
-            generic, extension = os.path.splitext(filename)
-            filename = os.path.join(base, "%s.%s%s" % (generic, self.size, extension))
-            url = filename.replace(settings.MEDIA_ROOT, settings.MEDIA_URL)
+        except VariableDoesNotExist:
+            user = None
 
-        if not os.path.isfile(filename):
-            image = Image.open(avatar_path)
-            image.thumbnail((self.size, self.size), Image.ANTIALIAS)
-            image.save(filename, "JPEG")
+        # Read from the preloaded or cached manifest, without touching the
+        # disk
+        user_id = getattr(user, "pk", None)
+        manifest = context.get(MANIFESTS, {}).get(user_id)
+        if manifest is not None:
+            return manifest[self.size]
+        return get_avatar_url(user_id, self.size)
 
-        return url
+
+class AvatarsNode(Node):
+    def __init__(self, users, size, var_name):
+        self.users = Variable(users)
+        self.size = Variable(size)
+        self.var_name = var_name
+
+    def render(self, context):
+        users = list(self.users.resolve(context))
+        size = int(self.size.resolve(context))
+        manifests = get_manifests(users)
+        # The avatar tag uses them for these users from now on
+        preloaded = context.get(MANIFESTS)
+        if preloaded is None:
+            preloaded = context.dicts[0][MANIFESTS] = {}
+        preloaded.update(manifests)
+        context[self.var_name] = [
+            (user, (manifests.get(getattr(user, "pk", user)) or
+                    get_default_manifest())[size])
+            for user in users]
+        return ''
 
 
 @register.tag('avatar')
@@ -75,3 +77,17 @@ def Thumbnail(parser, token):
     elif len(bits) < 2:
         bits.append("96")
     return ResizedThumbnailNode(bits[1], username)
+
+
+@register.tag('avatars')
+def Avatars(parser, token):
+    """
+    Gets the avatars of a list of users at once:
+    {% avatars users 48 as user_avatars %} sets user_avatars to a list of
+    (user, url) pairs. The avatar tag doesn't look them up again later.
+    """
+    bits = token.split_contents()
+    if len(bits) != 5 or bits[3] != "as":
+        raise TemplateSyntaxError(_(u"Usage: {% avatars users size as \
+            variable %}"))
+    return AvatarsNode(bits[1], bits[2], bits[4])
@@ -17,7 +17,6 @@
 
 import base64
 import cPickle as pickle
-import Image
 import os
 import random
 import urllib
@@ -39,13 +38,16 @@ from django.contrib.auth.models import User, SiteProfileNotAvailable, Group
 from django.template import RequestContext
 from django.conf import settings
 from django.db.models import Q
-from guardian.shortcuts import get_objects_for_user
 
 from apps.ecidadania.proposals.models import Proposal
 from apps.thirdparty.userprofile.forms import AvatarForm, AvatarCropForm, \
     EmailValidationForm, ProfileForm, RegistrationForm, \
     LocationForm, PublicFieldsForm, ChangeEmail
 from apps.thirdparty.userprofile.models import EmailValidation, Avatar
+from apps.thirdparty.userprofile.jobs import shrink_avatar, \
+    get_sizes_pipeline
+from apps.thirdparty.userprofile.manifest import get_default_manifest
+from helpers.images import Pipeline, get_image_size
 from core.spaces.models import Space
 
 if not settings.AUTH_PROFILE_MODULE:
@@ -60,19 +62,6 @@ except (ImportError, ImproperlyConfigured):
 if not Profile:
     raise SiteProfileNotAvailable
 
-if hasattr(settings, "DEFAULT_AVATAR") and settings.DEFAULT_AVATAR:
-    DEFAULT_AVATAR = settings.DEFAULT_AVATAR
-else:
-    DEFAULT_AVATAR = os.path.join(settings.MEDIA_ROOT, "generic.jpg")
-
-if not os.path.isfile(DEFAULT_AVATAR):
-    import shutil
-    image = os.path.join(os.path.abspath(os.path.dirname(__file__)),
-                         "generic.jpg")
-    print image
-    print DEFAULT_AVATAR
-    shutil.copy(image, DEFAULT_AVATAR)
-
 GOOGLE_MAPS_API_KEY = hasattr(settings, "GOOGLE_MAPS_API_KEY") and \
     settings.GOOGLE_MAPS_API_KEY or None
 AVATAR_WEBSEARCH = hasattr(settings, "AVATAR_WEBSEARCH") and \
@@ -143,7 +132,7 @@ def overview(request):
     # AFTER TESTING
     proposals = Proposal.objects.annotate(models.Count('support_votes')).filter(author=request.user.id).order_by('pub_date')
     profile, created = Profile.objects.get_or_create(user=request.user)
-    spaces = get_objects_for_user(request.user, 'view_space', klass=Space)
+    spaces = Space.objects.joined_by(request.user)
     validated = False
     try:
         email = EmailValidation.objects.get(user=request.user).email
@@ -236,22 +225,15 @@ def avatarchoose(request):
             image = form.cleaned_data.get('url') or form.cleaned_data.get('photo')
             avatar = Avatar(user=request.user, image=image, valid=False)
             avatar.image.save("%s.jpg" % request.user.username, image)
-            image = Image.open(avatar.image.path)
-            image.thumbnail((480, 480), Image.ANTIALIAS)
-            image.convert("RGB").save(avatar.image.path, "JPEG")
             avatar.save()
+            shrink_avatar.delay(avatar.pk)
             return HttpResponseRedirect('%scrop/' % request.path_info)
 
             base, filename = os.path.split(avatar_path)
             generic, extension = os.path.splitext(filename)
 
-    if DEFAULT_AVATAR:
-        base, filename = os.path.split(DEFAULT_AVATAR)
-        filename, extension = os.path.splitext(filename)
-        generic96 = "%s/%s.96%s" % (base, filename, extension)
-        generic96 = generic96.replace(settings.MEDIA_ROOT, settings.MEDIA_URL)
-    else:
-        generic96 = ""
+    # The default avatar is served from the static files
+    generic96 = get_default_manifest()[96]
 
     template = "userprofile/avatar/choose.html"
     data = {'generic96': generic96, 'form': form,
@@ -275,13 +257,18 @@ def avatarcrop(request):
             right = int(form.cleaned_data.get('right'))
             bottom = int(form.cleaned_data.get('bottom'))
 
-            image = Image.open(avatar.image.path)
+            path = avatar.image.path
+            image_width = get_image_size(path)[0]
             box = [left, top, right, bottom]
-            image = image.crop(box)
-            if image.mode not in ('L', 'RGB'):
-                image = image.convert('RGB')
-
-            image.save(avatar.image.path)
+            width = form.cleaned_data.get('width')
+            if width and width != image_width:
+                # The image was shrunk after the crop page was shown
+                scale = image_width / float(width)
+                box = [int(round(x * scale)) for x in box]
+
+            # Every size is ready before the avatar is shown anywhere
+            get_sizes_pipeline(path, Pipeline().crop(box).save(path, 'JPEG')) \
+                .run(path)
             avatar.valid = True
             avatar.save()
             return HttpResponseRedirect(reverse("profile_avatar_crop_done"))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.contrib import admin
+from django.utils.translation import ugettext_lazy as _
+
+from core.jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+
+    """
+    Lists the background jobs. Failed jobs can be queued again.
+
+    .. versionadded:: 0.1.9
+    """
+    list_display = ('name', 'priority', 'status', 'attempts', 'created',
+                    'next_attempt', 'finished')
+    list_filter = ('status', 'name', 'priority')
+    search_fields = ('name', 'arguments')
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        count = Job.objects.requeue(queryset)
+        self.message_user(request, _('%d jobs queued again.') % count)
+    requeue.short_description = _('Queue the failed jobs again')
+
+
+admin.site.register(Job, JobAdmin)
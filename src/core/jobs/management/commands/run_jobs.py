@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Run the background jobs.
+"""
+
+import datetime
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import runner
+from core.jobs.models import Job, DONE
+
+
+class Command(BaseCommand):
+
+    """
+    Runs the jobs that are due. It's meant to be run once with --loop as a
+    daemon, or every minute from cron.
+    """
+    help = "Run the background jobs."
+    option_list = BaseCommand.option_list + (
+        make_option('--threads', type='int', default=runner.THREADS,
+                    help='Number of jobs run at once.'),
+        make_option('--limit', type='int', default=None,
+                    help='Run at most this many jobs.'),
+        make_option('--loop', action='store_true', default=False,
+                    help='Keep running, checking the queue every '
+                    '--interval seconds.'),
+        make_option('--interval', type='float', default=5,
+                    help='Seconds between checks with --loop.'),
+        make_option('--purge', type='int', default=None, metavar='DAYS',
+                    help='Delete the jobs finished more than DAYS days '
+                    'ago.'),
+    )
+
+    def handle(self, *args, **options):
+        runner.autodiscover()
+
+        if options['purge'] is not None:
+            before = datetime.datetime.now() - datetime.timedelta(
+                days=options['purge'])
+            purged = Job.objects.filter(status=DONE, finished__lt=before)
+            self.stdout.write('Deleted %d finished jobs.\n' % purged.count())
+            purged.delete()
+
+        while True:
+            done, failed = runner.run_pending(options['limit'],
+                                              options['threads'])
+            if done or failed or not options['loop']:
+                self.stdout.write('Finished %d jobs, %d failed.\n' %
+                                  (done, failed))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
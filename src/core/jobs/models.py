@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background jobs. See :mod:`core.jobs.runner`.
+
+.. versionadded:: 0.1.9
+"""
+
+import datetime
+import json
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+# How long a worker can keep the jobs it took before another worker can take
+# them again
+LEASE = getattr(settings, 'JOBS_LEASE', 60 * 30)
+
+HIGH = 1
+NORMAL = 2
+LOW = 3
+PRIORITIES = (
+    (HIGH, _('High')),
+    (NORMAL, _('Normal')),
+    (LOW, _('Low')),
+)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+STATUSES = (
+    (QUEUED, _('Queued')),
+    (RUNNING, _('Running')),
+    (DONE, _('Done')),
+    (FAILED, _('Failed')),
+)
+
+
+class JobManager(models.Manager):
+
+    """
+    Takes the jobs that are due out of the queue.
+    """
+
+    def get_due(self):
+        """
+        Returns the queued jobs that are due, and the running ones whose
+        worker went away without finishing them (unless that was their last
+        attempt), highest priority first.
+        """
+        now = datetime.datetime.now()
+        return self.filter(status__in=(QUEUED, RUNNING),
+                           next_attempt__lte=now,
+                           attempts__lt=models.F('max_attempts')) \
+            .order_by('priority', 'next_attempt', 'pk')
+
+    def claim(self, size):
+        """
+        Takes up to `size` jobs that are due and keeps them out of the other
+        workers for LEASE seconds, counting an attempt for each of them.
+        Returns the list of jobs taken.
+        """
+        pks = list(self.get_due().values_list('pk', flat=True)[:size])
+        if not pks:
+            return []
+
+        # Only the rows still due are taken, another worker may have taken
+        # some of them since we read them
+        now = datetime.datetime.now()
+        lock = uuid.uuid4().hex
+        self.filter(pk__in=pks, status__in=(QUEUED, RUNNING),
+                    next_attempt__lte=now,
+                    attempts__lt=models.F('max_attempts')) \
+            .update(lock=lock, status=RUNNING, started=now,
+                    attempts=models.F('attempts') + 1,
+                    next_attempt=now + datetime.timedelta(seconds=LEASE))
+        return list(self.filter(lock=lock).order_by('priority', 'pk'))
+
+    def fail_abandoned(self):
+        """
+        Marks as failed the running jobs whose worker went away during their
+        last attempt, which :meth:`claim` doesn't take again. Returns how
+        many there were.
+        """
+        now = datetime.datetime.now()
+        return self.filter(status=RUNNING, next_attempt__lte=now,
+                           attempts__gte=models.F('max_attempts')) \
+            .update(status=FAILED, finished=now, lock='',
+                    last_error='The worker went away while running the job.')
+
+    def requeue(self, queryset=None):
+        """
+        Puts the failed jobs (of `queryset` if given) back in the queue.
+        """
+        if queryset is None:
+            queryset = self.all()
+        return queryset.filter(status=FAILED).update(
+            status=QUEUED, attempts=0, next_attempt=datetime.datetime.now())
+
+
+class Job(models.Model):
+
+    """
+    A call to one of the functions registered with
+    :func:`core.jobs.runner.register`, waiting to be run by the ``run_jobs``
+    command. The arguments are stored as JSON.
+
+    .. versionadded:: 0.1.9
+    """
+    name = models.CharField(_('Name'), max_length=100, db_index=True)
+    arguments = models.TextField(_('Arguments'), default='[[], {}]')
+    priority = models.PositiveSmallIntegerField(_('Priority'),
+        choices=PRIORITIES, default=NORMAL)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUSES,
+        default=QUEUED, db_index=True)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_('Maximum attempts'),
+        default=3)
+    next_attempt = models.DateTimeField(_('Next attempt'), db_index=True,
+        default=datetime.datetime.now)
+    last_error = models.TextField(_('Last error'), blank=True)
+    lock = models.CharField(max_length=32, blank=True, db_index=True,
+        editable=False)
+    created = models.DateTimeField(_('Created'), auto_now_add=True)
+    started = models.DateTimeField(_('Started'), blank=True, null=True)
+    finished = models.DateTimeField(_('Finished'), blank=True, null=True)
+    objects = JobManager()
+
+    class Meta:
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+
+    def __unicode__(self):
+        return self.name
+
+    def get_arguments(self):
+        """
+        Returns the (args, kwargs) of the call.
+        """
+        args, kwargs = json.loads(self.arguments)
+        return args, dict((str(k), v) for k, v in kwargs.items())
+
+    def set_arguments(self, args, kwargs):
+        self.arguments = json.dumps([list(args), kwargs], sort_keys=True)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Lightweight background jobs, for the slow work that doesn't need to be done
+before answering the request (resizing images, sending mail...).
+
+A job is a function registered with :func:`register`, which gives it a
+``delay()`` method that stores the call in the database instead of running
+it::
+
+    @register('spaces.resize_image', priority=HIGH)
+    def resize_image(app_label, model_name, pk, field_name):
+        ...
+
+    resize_image.delay('spaces', 'space', space.pk, 'logo')
+
+The arguments must be JSON serializable (ids rather than instances). Jobs
+are registered in the ``jobs`` module of every installed app, which the
+worker imports when it starts.
+
+The ``run_jobs`` management command runs the queue with :func:`run_pending`,
+highest priority first, in a pool of JOBS_WORKER_THREADS threads. A job that
+raises an exception is tried again later, waiting JOBS_RETRY_DELAY seconds
+the first time and twice as long every next time, until it has been tried as
+many times as its `max_attempts`. Several workers can run at once, every job
+is taken by one of them, and the jobs of a worker that went away are taken
+again after JOBS_LEASE seconds, or marked as failed if that was their last
+attempt. See the job status page (``job-status``).
+
+The jobs are run right away instead of queued unless BACKGROUND_JOBS is
+True. Only turn it on where a ``run_jobs`` worker is running, the queued
+jobs wait forever otherwise.
+
+.. versionadded:: 0.1.9
+"""
+
+import datetime
+import traceback
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connection
+from django.utils.importlib import import_module
+from django.utils.module_loading import module_has_submodule
+
+from core.jobs.models import Job, NORMAL, QUEUED, DONE, FAILED
+
+ENABLED = getattr(settings, 'BACKGROUND_JOBS', False)
+BATCH_SIZE = getattr(settings, 'JOBS_BATCH_SIZE', 20)
+RETRY_DELAY = getattr(settings, 'JOBS_RETRY_DELAY', 60)
+THREADS = getattr(settings, 'JOBS_WORKER_THREADS', 4)
+
+# Registered jobs: name -> (function, priority, max_attempts, unique)
+_registry = {}
+
+
+def register(name, priority=NORMAL, max_attempts=3, unique=False):
+    """
+    Decorator that registers the function as the job `name`. If `unique` is
+    True a call is not queued when the same call is already waiting in the
+    queue.
+    """
+    def decorator(function):
+        _registry[name] = (function, priority, max_attempts, unique)
+        function.delay = lambda *args, **kwargs: enqueue(name, args, kwargs)
+        return function
+    return decorator
+
+
+def autodiscover():
+    """
+    Imports the ``jobs`` module of every installed app, so their jobs are
+    registered.
+    """
+    for app in settings.INSTALLED_APPS:
+        try:
+            import_module('%s.jobs' % app)
+        except ImportError:
+            if module_has_submodule(import_module(app), 'jobs'):
+                raise
+
+
+def enqueue(name, args=(), kwargs=None, priority=None):
+    """
+    Queues a call to the job `name`, or runs it right away if
+    BACKGROUND_JOBS is off. Returns the queued :class:`Job`, or None if it
+    wasn't queued.
+    """
+    function, default_priority, max_attempts, unique = _registry[name]
+    if not ENABLED:
+        function(*args, **(kwargs or {}))
+        return None
+
+    job = Job(name=name, priority=priority or default_priority,
+              max_attempts=max_attempts)
+    job.set_arguments(args, kwargs or {})
+    if unique and Job.objects.filter(name=name, arguments=job.arguments,
+                                     status=QUEUED).exists():
+        return None
+    job.save()
+    return job
+
+
+def run_job(job):
+    """
+    Runs a job taken from the queue and records the result. Returns True if
+    it finished.
+    """
+    try:
+        function = _registry[job.name][0]
+        args, kwargs = job.get_arguments()
+        function(*args, **kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts or job.name not in _registry:
+            job.status = FAILED
+            job.finished = datetime.datetime.now()
+        else:
+            job.status = QUEUED
+            job.next_attempt = datetime.datetime.now() + datetime.timedelta(
+                seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+        done = False
+    else:
+        job.status = DONE
+        job.finished = datetime.datetime.now()
+        job.last_error = ''
+        done = True
+
+    job.lock = ''
+    job.save()
+    return done
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Every thread has its own connection to the database
+        connection.close()
+
+
+def run_pending(limit=None, threads=1):
+    """
+    Runs the jobs that are due, up to `limit` of them, in a pool of
+    `threads` threads. Returns a tuple with the number of jobs that finished
+    and failed, counting the ones abandoned by a worker on their last attempt
+    as failed.
+    """
+    done = 0
+    failed = Job.objects.fail_abandoned()
+    pool = ThreadPool(threads) if threads > 1 else None
+
+    try:
+        while limit is None or done + failed < limit:
+            size = BATCH_SIZE
+            if limit is not None:
+                size = min(size, limit - done - failed)
+            batch = Job.objects.claim(size)
+            if not batch:
+                break
+
+            if pool is None:
+                results = [run_job(job) for job in batch]
+            else:
+                results = pool.map(_run_in_thread, batch)
+            done += results.count(True)
+            failed += results.count(False)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return done, failed
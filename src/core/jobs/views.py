@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Count
+from django.shortcuts import render_to_response
+from django.template import RequestContext
+
+from core.jobs.models import Job, STATUSES, FAILED
+
+# Failed jobs shown in the status page
+RECENT_FAILURES = 20
+
+
+@staff_member_required
+def job_status(request):
+
+    """
+    Shows the number of jobs of every type by status, and the last jobs that
+    failed with their errors.
+
+    :context: statuses, jobs, failures
+
+    .. versionadded:: 0.1.9
+    """
+    counts = {}
+    for name, status, count in Job.objects.values_list('name', 'status') \
+            .annotate(Count('pk')).order_by():
+        counts.setdefault(name, {})[status] = count
+
+    jobs = [(name, [counts[name].get(status, 0) for status, label in
+                    STATUSES]) for name in sorted(counts)]
+    failures = Job.objects.filter(status=FAILED) \
+        .order_by('-finished')[:RECENT_FAILURES]
+
+    return render_to_response('jobs/job_status.html', {
+        'statuses': [label for status, label in STATUSES],
+        'jobs': jobs, 'failures': failures},
+        context_instance=RequestContext(request))
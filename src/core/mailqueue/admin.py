@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.contrib import admin
+from django.utils.translation import ugettext_lazy as _
+
+from core.mailqueue.models import QueuedMail
+
+
+class QueuedMailAdmin(admin.ModelAdmin):
+
+    """
+    Lists the queued and failed messages. Failed messages can be queued
+    again.
+
+    .. versionadded:: 0.1.9
+    """
+    list_display = ('subject', 'to', 'priority', 'status', 'attempts',
+                    'next_attempt', 'last_error')
+    list_filter = ('status', 'priority')
+    search_fields = ('subject', 'to', 'bcc')
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        count = QueuedMail.objects.requeue(queryset)
+        self.message_user(request, _('%d messages queued again.') % count)
+    requeue.short_description = _('Queue the failed messages again')
+
+
+admin.site.register(QueuedMail, QueuedMailAdmin)
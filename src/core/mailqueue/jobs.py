@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background jobs of the mail queue (see :mod:`core.jobs.runner`).
+
+.. versionadded:: 0.1.9
+"""
+
+from core.jobs.models import HIGH
+from core.jobs.runner import register
+
+
+@register('mailqueue.send_queued', priority=HIGH, unique=True)
+def send_queued_mail():
+    """
+    Sends the mail queue. It's queued with every message, so the jobs worker
+    sends the mail without running ``send_queued_mail`` too.
+    """
+    # The mail module queues this job
+    from core.mailqueue.mail import send_queued
+    send_queued()
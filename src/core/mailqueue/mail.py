@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Outbound mail queue. :func:`send_mail` stores the message in the database
+and returns right away, so the views don't wait for the SMTP server. The
+queue is sent with :func:`send_queued` by a background job (see
+:mod:`core.jobs.runner`) queued with the messages, or by the
+``send_queued_mail`` management command (run it from cron, or with --loop
+as a daemon):
+
+* Messages are sent in batches of MAIL_QUEUE_BATCH_SIZE, highest priority
+  first, over a single connection that is only closed when the queue is
+  empty (or reopened after an error). They are deleted once sent.
+* Messages that can't be sent are tried again later, waiting
+  MAIL_QUEUE_RETRY_DELAY seconds the first time and twice as long every
+  next time, and marked as failed after MAIL_QUEUE_MAX_ATTEMPTS attempts.
+  Failed messages can be queued again from the admin.
+* No more than MAIL_QUEUE_RATE messages are sent per second (0 for no
+  limit), for SMTP servers that throttle the senders.
+* Several workers can run at once, every message is taken by one of them.
+
+The mail is sent during the request instead of queued unless MAIL_QUEUE
+is True. Only turn it on where the queue is sent by a ``run_jobs`` worker or
+by ``send_queued_mail``, the queued messages wait forever otherwise.
+
+.. versionadded:: 0.1.9
+"""
+
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from core.mailqueue.jobs import send_queued_mail
+from core.mailqueue.models import QueuedMail, NORMAL
+
+ENABLED = getattr(settings, 'MAIL_QUEUE', False)
+BATCH_SIZE = getattr(settings, 'MAIL_QUEUE_BATCH_SIZE', 100)
+RATE = getattr(settings, 'MAIL_QUEUE_RATE', 0)
+
+
+def send_mail(subject, message, from_email, recipient_list,
+              html_message=None, bcc=None, priority=NORMAL):
+    """
+    Queues a message. It takes the same arguments as Django's
+    ``send_mail``, plus an HTML version of the message, a list of hidden
+    recipients and a priority. Returns the number of messages queued (0 if
+    there are no recipients).
+    """
+    recipient_list = list(recipient_list or [])
+    bcc = list(bcc or [])
+    if not recipient_list and not bcc:
+        return 0
+
+    mail = QueuedMail(subject=subject, body=message,
+                      html_body=html_message or '',
+                      from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                      to='\n'.join(recipient_list), bcc='\n'.join(bcc),
+                      priority=priority)
+    if not ENABLED:
+        return mail.get_message().send()
+    mail.save()
+    send_queued_mail.delay()
+    return 1
+
+
+class Throttle(object):
+
+    """
+    Waits as needed to keep under `rate` calls per second.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.time()
+        if self.next_time > now:
+            time.sleep(self.next_time - now)
+            now = self.next_time
+        self.next_time = now + self.interval
+
+
+def send_queued(limit=None, connection=None):
+    """
+    Sends the messages that are due, up to `limit` of them. Returns a tuple
+    with the number of messages sent and failed.
+    """
+    throttle = Throttle(RATE)
+    sent = failed = 0
+    own_connection = connection is None
+
+    try:
+        while limit is None or sent + failed < limit:
+            size = BATCH_SIZE
+            if limit is not None:
+                size = min(size, limit - sent - failed)
+            batch = QueuedMail.objects.claim(size)
+            if not batch:
+                break
+
+            for mail in batch:
+                if connection is None:
+                    connection = get_connection()
+                    connection.open()
+                throttle.wait()
+                try:
+                    if not connection.send_messages([mail.get_message()]):
+                        raise ValueError('The message was not sent.')
+                except Exception as e:
+                    mail.defer('%s: %s' % (e.__class__.__name__, e))
+                    failed += 1
+                    if own_connection:
+                        # It may be broken, open a new one for the next
+                        connection.close()
+                        connection = None
+                else:
+                    mail.delete()
+                    sent += 1
+    finally:
+        if own_connection and connection is not None:
+            connection.close()
+
+    return sent, failed
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Send the outbound mail queue.
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from core.mailqueue import mail
+
+
+class Command(BaseCommand):
+
+    """
+    Sends the queued messages that are due. It's meant to be run every
+    minute from cron, or once with --loop to keep sending as messages
+    arrive.
+    """
+    help = "Send the queued mail."
+    option_list = BaseCommand.option_list + (
+        make_option('--limit', type='int', default=None,
+                    help='Send at most this many messages.'),
+        make_option('--loop', action='store_true', default=False,
+                    help='Keep running, checking the queue every '
+                    '--interval seconds.'),
+        make_option('--interval', type='float', default=10,
+                    help='Seconds between checks with --loop.'),
+    )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = mail.send_queued(options['limit'])
+            if sent or failed or not options['loop']:
+                self.stdout.write('Sent %d messages, %d failed.\n' %
+                                  (sent, failed))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
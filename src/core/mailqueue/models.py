@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Outbound mail queue. See :mod:`core.mailqueue.mail`.
+
+.. versionadded:: 0.1.9
+"""
+
+import datetime
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+MAX_ATTEMPTS = getattr(settings, 'MAIL_QUEUE_MAX_ATTEMPTS', 5)
+RETRY_DELAY = getattr(settings, 'MAIL_QUEUE_RETRY_DELAY', 60)
+# How long a worker can keep the messages it took before another worker
+# can take them again
+LEASE = getattr(settings, 'MAIL_QUEUE_LEASE', 60 * 10)
+
+HIGH = 1
+NORMAL = 2
+LOW = 3
+PRIORITIES = (
+    (HIGH, _('High')),
+    (NORMAL, _('Normal')),
+    (LOW, _('Low')),
+)
+
+QUEUED = 'queued'
+FAILED = 'failed'
+STATUSES = (
+    (QUEUED, _('Queued')),
+    (FAILED, _('Failed')),
+)
+
+
+class QueuedMailManager(models.Manager):
+
+    """
+    Takes the messages that are due out of the queue.
+    """
+
+    def get_due(self):
+        return self.filter(status=QUEUED,
+                           next_attempt__lte=datetime.datetime.now()) \
+            .order_by('priority', 'next_attempt', 'pk')
+
+    def claim(self, size):
+        """
+        Takes up to `size` messages that are due, highest priority first,
+        and keeps them out of the other workers for LEASE seconds. Returns
+        the list of messages taken.
+        """
+        pks = list(self.get_due().values_list('pk', flat=True)[:size])
+        if not pks:
+            return []
+
+        # Only the rows still due are taken, another worker may have taken
+        # some of them since we read them
+        lock = uuid.uuid4().hex
+        self.filter(pk__in=pks, status=QUEUED,
+                    next_attempt__lte=datetime.datetime.now()) \
+            .update(lock=lock, next_attempt=datetime.datetime.now() +
+                    datetime.timedelta(seconds=LEASE))
+        return list(self.filter(lock=lock).order_by('priority', 'pk'))
+
+    def requeue(self, queryset=None):
+        """
+        Puts the failed messages (of `queryset` if given) back in the queue.
+        """
+        if queryset is None:
+            queryset = self.all()
+        return queryset.filter(status=FAILED).update(
+            status=QUEUED, attempts=0, next_attempt=datetime.datetime.now())
+
+
+class QueuedMail(models.Model):
+
+    """
+    An email waiting to be sent by the ``send_queued_mail`` command. It's
+    deleted once sent. Messages that can't be sent are tried again later,
+    waiting twice as long every time, and kept as failed after
+    MAIL_QUEUE_MAX_ATTEMPTS attempts.
+
+    .. versionadded:: 0.1.9
+    """
+    subject = models.CharField(_('Subject'), max_length=255)
+    body = models.TextField(_('Body'))
+    html_body = models.TextField(_('HTML body'), blank=True)
+    from_email = models.CharField(_('From'), max_length=255)
+    # One address per line
+    to = models.TextField(_('To'), blank=True)
+    bcc = models.TextField(_('Bcc'), blank=True)
+    priority = models.PositiveSmallIntegerField(_('Priority'),
+        choices=PRIORITIES, default=NORMAL)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUSES,
+        default=QUEUED, db_index=True)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    next_attempt = models.DateTimeField(_('Next attempt'), db_index=True,
+        default=datetime.datetime.now)
+    last_error = models.TextField(_('Last error'), blank=True)
+    lock = models.CharField(max_length=32, blank=True, db_index=True,
+        editable=False)
+    created = models.DateTimeField(_('Created'), auto_now_add=True)
+    objects = QueuedMailManager()
+
+    class Meta:
+        verbose_name = _('Queued mail')
+        verbose_name_plural = _('Queued mail')
+
+    def __unicode__(self):
+        return self.subject
+
+    def get_message(self, connection=None):
+        """
+        Returns the ``EmailMessage`` to send.
+        """
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email,
+            self.to.split('\n') if self.to else [],
+            self.bcc.split('\n') if self.bcc else [], connection=connection)
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+    def defer(self, error):
+        """
+        Records a failed attempt and schedules the next one, or marks the
+        message as failed if it was the last one.
+        """
+        self.attempts += 1
+        self.last_error = error
+        self.lock = ''
+        if self.attempts >= MAX_ATTEMPTS:
+            self.status = FAILED
+        else:
+            self.next_attempt = datetime.datetime.now() + datetime.timedelta(
+                seconds=RETRY_DELAY * 2 ** (self.attempts - 1))
+        self.save()
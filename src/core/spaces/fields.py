@@ -16,11 +16,16 @@
 # limitations under the License.
 
 import os
+import posixpath
 import shutil
-from django.db.models.fields.files import ImageField
-from django.db.models import signals
+from django.db.models.fields.files import ImageField, ImageFieldFile
+from django.db.models import signals, get_model
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
+
+from core.spaces.jobs import resize_image
+from helpers.images import Pipeline, process, process_many, \
+    get_image_size, get_compact_formats, validate_image
 try:
     from south.modelsinspector import add_introspection_rules
     # Add some simple introspection for the StdImageField
@@ -31,26 +36,80 @@ except ImportError:
 
 class ThumbnailField:
     """Instances of this class will be used to access data of the
-    generated thumbnails"""
-    def __init__(self, name):
+    generated thumbnails. Until the thumbnail is made they give the data of
+    the image itself"""
+    def __init__(self, name, image_name=None, storage=None):
         self.name = name
-        self.storage = FileSystemStorage()
+        self.image_name = image_name
+        self.storage = storage or FileSystemStorage()
+
+    def _get_name(self):
+        if self.image_name and not self.storage.exists(self.name):
+            return self.image_name
+        return self.name
 
     def path(self):
-        return self.storage.path(self.name)
+        return self.storage.path(self._get_name())
 
     def url(self):
-        return self.storage.url(self.name)
+        return self.storage.url(self._get_name())
 
     def size(self):
-        return self.storage.size(self.name)
+        return self.storage.size(self._get_name())
+
+
+class ThumbnailDescriptor(object):
+    """Gives the "thumbnail" attribute of the files of a StdImageField. It is
+    only built the first time it is used, and then kept in the file, so
+    loading objects doesn't do any work for thumbnails nobody asks for"""
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if not instance.name:
+            return None
+        thumbnail = ThumbnailField(
+            instance.field._get_thumbnail_filename(instance.name),
+            instance.name, instance.storage)
+        # Found before the descriptor from now on
+        instance.__dict__['thumbnail'] = thumbnail
+        return thumbnail
+
+
+class StdImageFieldFile(ImageFieldFile):
+    """File of a StdImageField, with a "thumbnail" attribute of the same
+    class of the image, so "path", "url"... can be used on it
+    """
+    thumbnail = ThumbnailDescriptor()
+
+    def save(self, name, content, save=True):
+        self.__dict__.pop('thumbnail', None)
+        super(StdImageFieldFile, self).save(name, content, save)
+
+    def delete(self, save=True):
+        self.__dict__.pop('thumbnail', None)
+        super(StdImageFieldFile, self).delete(save)
 
 
 class StdImageField(ImageField):
     """Django field that behaves as ImageField, with some extra features like:
         - Auto resizing
         - Automatically generate thumbnails
+
+    The upload is saved as it comes and served like that until a background
+    job (see core.spaces.jobs) makes all the variants from a single decode
+    with the pipelines of helpers.images: it keeps the upload aside, writes
+    the resized image in its place with its compact versions for the web
+    (WebP and progressive JPEG, with hashed names) next to it, and writes
+    the thumbnail. Their sizes are recorded as
+    core.spaces.models.ImageVariant. The object is never saved again.
+
+    The thumbnail is reached through the "thumbnail" attribute of the file,
+    see StdImageFieldFile. Uploads over the IMAGE_MAX_PIXELS setting are
+    refused from their header, before anything decodes them.
     """
+    attr_class = StdImageFieldFile
+    default_validators = [validate_image]
+
     def __init__(self, verbose_name=None, name=None, width_field=None,
                  height_field=None, size=None, thumbnail_size=None, **kwargs):
         """Added fields:
@@ -77,77 +136,134 @@ class StdImageField(ImageField):
         """Call methods for generating all operations on specified signals
         """
         super(StdImageField, self).contribute_to_class(cls, name)
-        signals.post_save.connect(self._rename_resize_image, sender=cls)
-        signals.post_init.connect(self._set_thumbnail, sender=cls)
+        signals.post_save.connect(self._queue_variants, sender=cls)
 
-    def _get_thumbnail_filename(self, filename):
-        """Returns the thumbnail name associated to the standard image filename
+    def pre_save(self, model_instance, add):
+        """Takes note of the new uploads before they are stored
+        """
+        image = getattr(model_instance, self.attname)
+        if image and not image._committed:
+            model_instance.__dict__.setdefault('_new_images', set()) \
+                .add(self.name)
+        return super(StdImageField, self).pre_save(model_instance, add)
+
+    def _get_variant_filename(self, filename, variant):
+        """Returns the name of a variant of the standard image filename
 
         Example: /var/www/myproject/media/img/picture_1.jpeg will return
-            /var/www/myproject/media/img/picture_1.thumbnail.jpeg
+            /var/www/myproject/media/img/picture_1.thumbnail.jpeg for the
+            thumbnail
         """
         splitted_filename = list(os.path.splitext(filename))
-        splitted_filename.insert(1, '.thumbnail')
+        splitted_filename.insert(1, '.%s' % variant)
         return ''.join(splitted_filename)
 
-    def _resize_image(self, filename, size):
-        """Resizes the image to specified width, height and force option
-            - filename: full path of image to resize
-            - size: dictionary containing:
-                - width: new width
-                - height: new height
-                - force: if True, image will be cropped to fit the exact size,
-                    if False, it will have the bigger size that fits the
-                    specified size, but without cropping, so it could be
-                    smaller on width or height
+    def _get_thumbnail_filename(self, filename):
+        """Returns the thumbnail name associated to the standard image filename
         """
-        WIDTH, HEIGHT = 0, 1
-        from PIL import Image, ImageOps
-        img = Image.open(filename)
-        if img.size[WIDTH] > size['width'] or img.size[HEIGHT] > size['height']:
-            if size['force']:
-                img = ImageOps.fit(img, (size['width'], size['height']), Image.ANTIALIAS)
-            else:
-                img.thumbnail((size['width'], size['height']), Image.ANTIALIAS)
-            try:
-                img.save(filename, optimize=1)
-            except IOError:
-                img.save(filename)
-
-    def _rename_resize_image(self, instance=None, **kwargs):
-        """Renames the image, and calls methods to resize and create the
-            thumbnail
+        return self._get_variant_filename(filename, 'thumbnail')
+
+    def _queue_variants(self, instance=None, **kwargs):
+        """Queues the job that makes the variants of a new upload, so the
+            request doesn't wait for it
+        """
+        new_images = instance.__dict__.get('_new_images', ())
+        if self.name in new_images:
+            new_images.discard(self.name)
+            if self.size or self.thumbnail_size:
+                resize_image.delay(instance._meta.app_label,
+                                   instance._meta.object_name, instance.pk,
+                                   self.name)
+
+    def _get_variants(self, image):
+        """Returns the name of the file the variants of image are made from
+            (the upload kept aside, or the image itself if it isn't
+            resized) and the pipelines that make the variants, with the
+            variants they save, in order
         """
-        if getattr(instance, self.name):
-            filename = getattr(instance, self.name).path
-            ext = os.path.splitext(filename)[1].lower().replace('jpg', 'jpeg')
-            dst = self.generate_filename(instance, '%s_%s%s' % (
-                self.name,
-                instance._get_pk_val(),
-                ext))
-            dst_fullpath = os.path.join(settings.MEDIA_ROOT, dst)
-            normpath = lambda x: os.path.normpath(os.path.abspath(x))
-            if normpath(filename) != normpath(dst_fullpath):
-                os.rename(filename, dst_fullpath)
-                if self.size:
-                    self._resize_image(dst_fullpath, self.size)
-                if self.thumbnail_size:
-                    thumbnail_filename = self._get_thumbnail_filename(dst_fullpath)
-                    shutil.copyfile(dst_fullpath, thumbnail_filename)
-                    self._resize_image(thumbnail_filename, self.thumbnail_size)
-                setattr(instance, self.attname, dst)
-                instance.save()
-
-    def _set_thumbnail(self, instance=None, **kwargs):
-        """Creates a "thumbnail" object as attribute of the ImageField instance
-        Thumbnail attribute will be of the same class of original image, so
-        "path", "url"... properties can be used
+        ImageVariant = get_model('spaces', 'ImageVariant')
+        storage = image.storage
+        path = storage.path(image.name)
+        compact = [ImageVariant.WEBP if format == 'WEBP' else
+                   ImageVariant.JPEG
+                   for format, extension, options in get_compact_formats()]
+        variants = []
+        if self.size:
+            # Keep the upload, the resized image goes in its place
+            source = self._get_variant_filename(image.name,
+                                                ImageVariant.ORIGINAL)
+            if not storage.exists(source):
+                shutil.copyfile(path, storage.path(source))
+            variants.append(([ImageVariant.RESIZED] + compact, Pipeline()
+                .scale(self.size['width'], self.size['height'],
+                       self.size['force'])
+                .save(path).save_compact(path)))
+        else:
+            source = image.name
+            variants.append((compact, Pipeline().save_compact(path)))
+        if self.thumbnail_size:
+            thumbnail = self._get_thumbnail_filename(image.name)
+            variants.append(([ImageVariant.THUMBNAIL], Pipeline()
+                .scale(self.thumbnail_size['width'],
+                       self.thumbnail_size['height'],
+                       self.thumbnail_size['force'])
+                .save(storage.path(thumbnail))))
+        return source, variants
+
+    def _record_variants(self, image, source, variants, outputs):
+        """Records the sizes of the variants made by the pipelines, and
+            deletes the compact versions of the previous upload
+        """
+        ImageVariant = get_model('spaces', 'ImageVariant')
+        storage = image.storage
+        width, height = get_image_size(storage.path(source))
+        records = [(ImageVariant.ORIGINAL, source, width, height,
+                    storage.size(source))]
+        for (names, pipeline), saved in zip(variants, outputs):
+            for variant, (path, (width, height)) in zip(names, saved):
+                # Every variant is saved next to the image
+                name = posixpath.join(posixpath.dirname(image.name),
+                                      os.path.basename(path))
+                records.append((variant, name, width, height,
+                                storage.size(name)))
+
+        names = set(record[1] for record in records)
+        for old in ImageVariant.objects.get_variants(image.name).values():
+            if old.variant in ImageVariant.COMPACT and old.name not in names:
+                storage.delete(old.name)
+        ImageVariant.objects.record(image.name, records)
+
+    def make_variants(self, instance):
+        """Makes the resized image, its compact versions and the thumbnail
+            of the image of instance, decoding it once, and records them
         """
-        if getattr(instance, self.name):
-            filename = self.generate_filename(
-                instance,
-                os.path.basename(
-                    getattr(instance, self.name).path))
-            thumbnail_filename = self._get_thumbnail_filename(filename)
-            thumbnail_field = ThumbnailField(thumbnail_filename)
-            setattr(getattr(instance, self.name), 'thumbnail', thumbnail_field)
+        image = getattr(instance, self.name)
+        if not image:
+            return
+        source, variants = self._get_variants(image)
+        outputs = process(image.storage.path(source),
+                          *[pipeline for names, pipeline in variants])
+        self._record_variants(image, source, variants, outputs)
+
+    def make_all_variants(self, instances, processes=None):
+        """Makes the variants of the images of all the instances on a pool
+            of processes (see helpers.images.process_many). Returns the
+            number of images that couldn't be read
+        """
+        batch = []
+        for instance in instances:
+            image = getattr(instance, self.name)
+            if image:
+                batch.append((image,) + self._get_variants(image))
+        results = process_many([
+            (batch_image.storage.path(source),
+             [pipeline for names, pipeline in variants])
+            for batch_image, source, variants in batch], processes)
+
+        failed = 0
+        for (image, source, variants), outputs in zip(batch, results):
+            if outputs is None:
+                failed += 1
+            else:
+                self._record_variants(image, source, variants, outputs)
+        return failed
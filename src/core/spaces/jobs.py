@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Background jobs of the spaces (see :mod:`core.jobs.runner`).
+
+.. versionadded:: 0.1.9
+"""
+
+from django.db.models import get_model
+
+from core.jobs.models import HIGH
+from core.jobs.runner import register
+
+
+@register('spaces.resize_image', priority=HIGH, unique=True)
+def resize_image(app_label, model_name, pk, field_name):
+    """
+    Makes the variants of the image in the
+    :class:`core.spaces.fields.StdImageField` `field_name` of an object.
+    """
+    model = get_model(app_label, model_name)
+    try:
+        instance = model.objects.get(pk=pk)
+    except model.DoesNotExist:
+        return
+    model._meta.get_field(field_name).make_variants(instance)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Queue the jobs that make the variants of the images.
+"""
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db.models import get_models
+
+from core.spaces.fields import StdImageField
+from core.spaces.jobs import resize_image
+
+
+class Command(BaseCommand):
+
+    """
+    Queues the jobs that make the resized images and thumbnails of every
+    StdImageField again, for example after changing their sizes. They are
+    run by the ``run_jobs`` command. With --now they are made right away
+    instead, on a pool of processes.
+    """
+    help = "Queue the jobs that make the variants of the images."
+    option_list = BaseCommand.option_list + (
+        make_option('--now', action='store_true', default=False,
+                    help='Make the variants now instead of queueing them.'),
+        make_option('--processes', type='int', default=None,
+                    help='Number of images made at once with --now (one '
+                    'per CPU by default).'),
+    )
+
+    def handle(self, *args, **options):
+        count = failed = 0
+        for model in get_models():
+            for field in model._meta.fields:
+                if not isinstance(field, StdImageField):
+                    continue
+                objects = model.objects.exclude(**{field.name: ''})
+                if options['now']:
+                    instances = list(objects)
+                    failed += field.make_all_variants(instances,
+                                                      options['processes'])
+                    count += len(instances)
+                    continue
+                for pk in objects.values_list('pk', flat=True):
+                    resize_image.delay(model._meta.app_label,
+                                       model._meta.object_name, pk,
+                                       field.name)
+                    count += 1
+
+        if options['now']:
+            self.stdout.write('Made the variants of %d images, %d failed.\n'
+                              % (count - failed, failed))
+        else:
+            self.stdout.write('Queued %d images.\n' % count)
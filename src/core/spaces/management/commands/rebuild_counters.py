@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rebuild the denormalized counters.
+"""
+
+from django.core.management.base import BaseCommand
+
+from helpers import counters
+
+
+class Command(BaseCommand):
+
+    """
+    Counts the support votes, comments and the rest of the registered counters
+    from scratch and fixes the ones that are wrong. The migrations that add
+    the counter columns fill them, this can be run periodically (for example
+    from cron) to fix the counters changed outside of Django.
+    """
+    help = "Rebuild the support votes and comments counters."
+
+    def handle(self, *args, **options):
+        for model, field in counters.get_counters():
+            fixed = counters.rebuild_counter(model, field)
+            self.stdout.write('%s.%s: fixed %d objects.\n' %
+                              (model.__name__, field, fixed))
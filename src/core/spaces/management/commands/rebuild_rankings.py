@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rebuild the space index rankings.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.spaces import rankings
+from core.spaces.models import Space
+
+
+class Command(BaseCommand):
+
+    """
+    Rebuilds the rankings of the given spaces, or of every space if none is
+    given. It's meant to be run periodically (for example from cron) so the
+    space index never has to build a ranking during a request.
+    """
+    args = "[space_url space_url ...]"
+    help = "Rebuild the most commented, highlighted and most viewed rankings \
+    of the spaces."
+
+    def handle(self, *args, **options):
+        spaces = Space.objects.all()
+        if args:
+            spaces = spaces.filter(url__in=args)
+
+        space_ids = list(spaces.values_list('pk', flat=True))
+        if args and len(space_ids) != len(set(args)):
+            raise CommandError("Some of the given spaces do not exist.")
+
+        for space_id in space_ids:
+            rankings.rebuild_rankings(space_id)
+
+        self.stdout.write('Rebuilt the rankings of %d spaces.\n' %
+                          len(space_ids))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rebuild the space memberships from the space permissions.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.spaces.models import Space, SpaceMembership
+
+
+class Command(BaseCommand):
+
+    """
+    Builds the memberships of the given spaces, or of every space if none is
+    given, from the admin_space, mod_space and view_space permissions of the
+    users and of their groups. The memberships are kept in sync on every
+    permission and group change, this is only needed if they were changed
+    without sending signals.
+    """
+    args = "[space_url space_url ...]"
+    help = "Rebuild the memberships and roles of the spaces from their \
+    permissions."
+
+    def handle(self, *args, **options):
+        if not args:
+            total = SpaceMembership.objects.rebuild()
+        else:
+            spaces = list(Space.objects.filter(url__in=args))
+            if len(spaces) != len(set(args)):
+                raise CommandError("Some of the given spaces do not exist.")
+            total = sum(SpaceMembership.objects.rebuild(space)
+                        for space in spaces)
+
+        self.stdout.write('Rebuilt %d space memberships.\n' % total)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Resolves the space of the current request only once.
+
+Every URL of a space carries its ``space_url``. Instead of looking the space
+up again in each method of the view (``dispatch``, ``get_object``,
+``get_context_data``...) the middleware attaches it to the request as
+``request.space`` before the view runs, and the views read it from there.
+
+.. versionadded:: 0.1.9
+"""
+
+from core.spaces.models import Space
+from helpers.cache import get_cached_object_or_404
+
+
+def get_request_space(request, space_url):
+    """
+    Returns the space with `space_url` for this request, resolving it only
+    the first time it is asked for. Works with or without the middleware.
+
+    :raises: Http404 if the space does not exist
+    """
+    space = getattr(request, 'space', None)
+    if space is None or space.url != space_url:
+        space = get_cached_object_or_404(Space, url=space_url)
+        request.space = space
+    return space
+
+
+class SpaceMiddleware(object):
+
+    """
+    Sets ``request.space`` for the views that receive a ``space_url``
+    argument. Requests for a space that doesn't exist get a 404 before
+    reaching the view.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if 'space_url' in view_kwargs:
+            get_request_space(request, view_kwargs['space_url'])
+        return None
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Mixins for the class-based views that live inside a space.
+
+.. versionadded:: 0.1.9
+"""
+
+from django.core.exceptions import PermissionDenied
+
+from core.spaces.middleware import get_request_space
+
+
+class SpaceMixin(object):
+
+    """
+    Resolves the space of the view once (see
+    :class:`core.spaces.middleware.SpaceMiddleware`), stores it in
+    ``self.space`` and checks the permissions of the user before running the
+    view. The space is also added to the context as ``get_place``.
+
+    The user needs any of the permissions in `space_permissions`. Views with
+    other rules override :meth:`has_space_permission`.
+
+    :permissions required: view_space by default
+    :context: get_place
+    """
+    space_permissions = ('view_space',)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.space = get_request_space(request, kwargs['space_url'])
+
+        if self.has_space_permission(request.user, self.space):
+            return super(SpaceMixin, self).dispatch(request, *args, **kwargs)
+        else:
+            raise PermissionDenied
+
+    def has_space_permission(self, user, space):
+        """
+        Returns True if `user` can use this view in `space`.
+        """
+        for perm in self.space_permissions:
+            if user.has_perm(perm, space):
+                return True
+        return False
+
+    def get_context_data(self, **kwargs):
+        context = super(SpaceMixin, self).get_context_data(**kwargs)
+        context['get_place'] = self.space
+        return context
@@ -15,8 +15,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 from datetime import datetime
 
+from django.core.cache import cache
 from django.core.validators import RegexValidator
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
@@ -26,6 +28,41 @@ from django.contrib.sites.models import Site
 from core.spaces.file_validation import ContentTypeRestrictedFileField
 from fields import StdImageField
 from allowed_types import ALLOWED_CONTENT_TYPES
+from helpers.cache import cache_model
+from helpers.viewcounts import count_views
+
+
+class SpaceManager(models.Manager):
+
+    """
+    Manager for the spaces.
+    """
+
+    def visible_to(self, user):
+        """
+        Returns the spaces `user` can see: the public ones plus the ones where
+        the user has a role (see :class:`SpaceMembership`), as a single query
+        with a subquery over the indexed memberships that can be paginated in
+        the database. Superusers see all the spaces.
+
+        .. versionadded:: 0.1.9
+        """
+        if not user.is_authenticated() or not user.is_active:
+            return self.filter(public=True)
+        if user.is_superuser:
+            return self.all()
+
+        joined = SpaceMembership.objects.filter(user=user).values('space')
+        return self.filter(models.Q(public=True) | models.Q(pk__in=joined))
+
+    def joined_by(self, user):
+        """
+        Returns the spaces where `user` has a role (see
+        :class:`SpaceMembership`).
+
+        .. versionadded:: 0.1.9
+        """
+        return self.filter(memberships__user=user)
 
 
 class Space(models.Model):
@@ -55,9 +92,9 @@ class Space(models.Model):
         help_text = _('Valid extensions are jpg, jpeg, png and gif'))
     banner = StdImageField(upload_to='spaces/banners', size=(500, 75, False),
         help_text = _('Valid extensions are jpg, jpeg, png and gif'))
-    public = models.BooleanField(_('Public space'), help_text=_("This will \
-        make the space visible to everyone, but registration will be \
-        necessary to participate."))
+    public = models.BooleanField(_('Public space'), db_index=True,
+        help_text=_("This will make the space visible to everyone, but \
+        registration will be necessary to participate."))
 
 # Modules
     mod_debate = models.BooleanField(_('Debate'))
@@ -67,6 +104,8 @@ class Space(models.Model):
     mod_docs = models.BooleanField(_('Documents'))
     mod_voting = models.BooleanField(_('Voting'))
 
+    objects = SpaceManager()
+
     class Meta:
         ordering = ['name']
         verbose_name = _('Space')
@@ -182,6 +221,7 @@ class Event(models.Model):
         max_digits=17, decimal_places=15, help_text=_('Specify it in decimal'))
     longitude = models.DecimalField(_('Longitude'), blank=True, null=True,
         max_digits=17, decimal_places=15, help_text=_('Specify it in decimal'))
+    views = models.IntegerField(_('Views'), default=0, editable=False)
 
     def is_due(self):
         if self.event_date < datetime.now():
@@ -226,3 +266,335 @@ class Intent(models.Model):
     def get_approve_url(self):
         site = Site.objects.all()[0]
         return "http://%s%sintent/approve/%s" % (site.domain, self.space.get_absolute_url(), self.token)
+
+
+def _get_members_key(space_id):
+    return 'space_members_%s' % space_id
+
+
+class SpaceMembershipManager(models.Manager):
+
+    """
+    Manager for the space memberships. The memberships are derived from the
+    guardian object permissions of the users and of their groups, these
+    methods bring them up to date.
+    """
+
+    def _get_space_perms(self, space_ids=None, user_ids=None):
+        """
+        Returns the space permission codenames of the users, given to them
+        or to their groups, by (space id, user id). Only the spaces with
+        `space_ids` and the users with `user_ids` are read if given.
+        """
+        from guardian.models import UserObjectPermission, \
+            GroupObjectPermission
+        ctype = ContentType.objects.get_for_model(Space)
+        user_rows = UserObjectPermission.objects.filter(content_type=ctype)
+        group_rows = GroupObjectPermission.objects.filter(content_type=ctype)
+        if space_ids is not None:
+            object_pks = [str(pk) for pk in space_ids]
+            user_rows = user_rows.filter(object_pk__in=object_pks)
+            group_rows = group_rows.filter(object_pk__in=object_pks)
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            user_rows = user_rows.filter(user__in=user_ids)
+            group_rows = group_rows.filter(group__user__in=user_ids)
+
+        perms = {}
+        for rows in (user_rows.values_list('object_pk', 'user',
+                                           'permission__codename'),
+                     group_rows.values_list('object_pk', 'group__user',
+                                            'permission__codename')):
+            for object_pk, user_id, codename in rows:
+                # Groups without users, and the other members of the groups
+                if user_id is None or \
+                        (user_ids is not None and user_id not in user_ids):
+                    continue
+                perms.setdefault((int(object_pk), user_id), set()) \
+                    .add(codename)
+        return perms
+
+    def _replace(self, memberships, perms):
+        """
+        Replaces the `memberships` queryset with the ones given by `perms`
+        (see :meth:`_get_space_perms`). Returns the number of memberships.
+        """
+        # Permissions of deleted spaces are left behind by guardian
+        space_ids = set(Space.objects.filter(
+            pk__in=set(space_id for space_id, user_id in perms))
+            .values_list('pk', flat=True))
+        new = []
+        for (space_id, user_id), codenames in perms.items():
+            role = SpaceMembership.role_for_perms(codenames)
+            if role is not None and space_id in space_ids:
+                new.append(SpaceMembership(space_id=space_id,
+                                           user_id=user_id, role=role))
+
+        space_ids.update(memberships.values_list('space', flat=True))
+        memberships.delete()
+        self.bulk_create(new)
+        cache.delete_many([_get_members_key(pk) for pk in space_ids])
+        return len(new)
+
+    def sync(self, space_id, user_ids):
+        """
+        Updates the memberships of the users with `user_ids` in the space
+        from their current permissions, removing the ones of the users that
+        have no role anymore.
+        """
+        self._replace(self.filter(space=space_id, user__in=user_ids),
+                      self._get_space_perms([space_id], user_ids))
+
+    def sync_user(self, user_id):
+        """
+        Updates all the memberships of the user, for example after it joined
+        or left a group.
+        """
+        self._replace(self.filter(user=user_id),
+                      self._get_space_perms(user_ids=[user_id]))
+
+    def rebuild(self, space=None):
+        """
+        Builds the memberships of all the spaces (or only `space`) again from
+        the permissions tables. Returns the number of memberships.
+        """
+        if space is None:
+            return self._replace(self.all(), self._get_space_perms())
+        return self._replace(self.filter(space=space),
+                             self._get_space_perms([space.pk]))
+
+    def get_member_ids(self, space_id):
+        """
+        Returns the set of ids of the users with a role in the space. It is
+        kept in the cache, so checking if a user belongs to a space usually
+        doesn't need a query.
+        """
+        key = _get_members_key(space_id)
+        member_ids = cache.get(key)
+        if member_ids is None:
+            member_ids = frozenset(self.filter(space=space_id)
+                                   .values_list('user', flat=True))
+            cache.set(key, member_ids)
+        return member_ids
+
+    def is_member(self, user, space):
+        """
+        Returns True if `user` can take part in `space`, which is the same as
+        having the view_space permission. Most users are found in the cached
+        member ids, the permissions are only checked for the rest (for
+        example the anonymous user).
+        """
+        if user.is_active and user.pk in self.get_member_ids(space.pk):
+            return True
+        return user.has_perm('view_space', space)
+
+
+class SpaceMembership(models.Model):
+
+    """
+    Role of a user inside a space. This is a materialized view of the
+    admin_space, mod_space and view_space object permissions of the user and
+    of its groups, kept in sync by the signal handlers below, so the
+    participants of a space and the spaces of a user can be listed with a
+    single indexed query.
+
+    .. versionadded:: 0.1.9
+    """
+    ADMIN = 'admin'
+    MOD = 'mod'
+    USER = 'user'
+    ROLES = (
+        (ADMIN, _('Administrator')),
+        (MOD, _('Moderator')),
+        (USER, _('User')),
+    )
+
+    space = models.ForeignKey(Space, related_name='memberships')
+    user = models.ForeignKey(User, related_name='space_memberships')
+    role = models.CharField(_('Role'), max_length=5, choices=ROLES)
+
+    objects = SpaceMembershipManager()
+
+    class Meta:
+        unique_together = ('space', 'user')
+        verbose_name = _('Space membership')
+        verbose_name_plural = _('Space memberships')
+
+    def __unicode__(self):
+        return u'%s (%s)' % (self.user, self.role)
+
+    @classmethod
+    def role_for_perms(cls, perms):
+        """
+        Returns the role given by the space permission codenames in `perms`,
+        the highest one wins. Returns None if there is no role.
+        """
+        if 'admin_space' in perms:
+            return cls.ADMIN
+        if 'mod_space' in perms:
+            return cls.MOD
+        if 'view_space' in perms:
+            return cls.USER
+        return None
+
+
+# Variants are only dropped from the cache when they are made again
+VARIANTS_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class ImageVariantManager(models.Manager):
+
+    """
+    Metadata of the variants of the images of the StdImageFields.
+    """
+
+    def _get_cache_key(self, image):
+        return 'image_variants_%s' % hashlib.md5(image.encode('utf-8')) \
+            .hexdigest()
+
+    def record(self, image, variants):
+        """
+        Replaces the variants recorded for the image stored as `image` with
+        `variants`, a list of (variant, name, width, height, size) tuples.
+        """
+        self.filter(image=image).delete()
+        objects = [ImageVariant(image=image, variant=variant, name=name,
+                                width=width, height=height, size=size)
+                   for variant, name, width, height, size in variants]
+        self.bulk_create(objects)
+        cache.set(self._get_cache_key(image),
+                  dict((v.variant, v) for v in objects), VARIANTS_TIMEOUT)
+
+    def get_variants(self, image):
+        """
+        Returns a dictionary with the variants of the image stored as
+        `image`, by variant.
+        """
+        return dict((v.variant, v) for v in self.filter(image=image))
+
+    def get_cached_variants(self, image):
+        """
+        Same as :meth:`get_variants`, kept in the cache until the variants
+        are made again.
+        """
+        key = self._get_cache_key(image)
+        variants = cache.get(key)
+        if variants is None:
+            variants = self.get_variants(image)
+            cache.set(key, variants, VARIANTS_TIMEOUT)
+        return variants
+
+
+class ImageVariant(models.Model):
+
+    """
+    An image made by a :class:`core.spaces.fields.StdImageField` from an
+    upload: the untouched upload (``original``), the upload resized to the
+    size of the field (``resized``, stored under the name of the upload) and
+    the thumbnail (``thumbnail``), plus the compact versions of the resized
+    image for the web (``webp`` and ``jpeg``, a progressive JPEG) with the
+    hash of their content in their names. They are made in the background,
+    until then there are no variants and the upload is served as it is.
+
+    .. versionadded:: 0.1.9
+    """
+    ORIGINAL = 'original'
+    RESIZED = 'resized'
+    THUMBNAIL = 'thumbnail'
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    COMPACT = (WEBP, JPEG)
+
+    # Name of the file in the field
+    image = models.CharField(_('Image'), max_length=255, db_index=True)
+    variant = models.CharField(_('Variant'), max_length=20)
+    name = models.CharField(_('File name'), max_length=255)
+    width = models.PositiveIntegerField(_('Width'))
+    height = models.PositiveIntegerField(_('Height'))
+    size = models.PositiveIntegerField(_('Size in bytes'))
+
+    objects = ImageVariantManager()
+
+    class Meta:
+        unique_together = ('image', 'variant')
+        verbose_name = _('Image variant')
+        verbose_name_plural = _('Image variants')
+
+    def __unicode__(self):
+        return self.name
+
+
+# Spaces are looked up by url in almost every view
+cache_model(Space, lookups=('pk', 'url'))
+count_views(Event)
+
+
+# guardian.models loads the user model when imported, and with it every app,
+# so the membership handlers are connected once the permission model is
+# ready instead of importing it here.
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete, m2m_changed, \
+    class_prepared
+
+
+def _sync_membership(sender, instance, **kwargs):
+    if instance.content_type_id == \
+            ContentType.objects.get_for_model(Space).id:
+        SpaceMembership.objects.sync(instance.object_pk, [instance.user_id])
+
+
+def _sync_group_membership(sender, instance, **kwargs):
+    if instance.content_type_id == \
+            ContentType.objects.get_for_model(Space).id:
+        SpaceMembership.objects.sync(instance.object_pk, list(
+            User.objects.filter(groups=instance.group_id)
+            .values_list('pk', flat=True)))
+
+
+def _sync_group_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Updates the memberships of the users that joined or left a group.
+    """
+    if action == 'pre_clear' and reverse:
+        # The users of the group are gone by post_clear
+        instance._cleared_user_ids = list(
+            instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == 'post_clear':
+        user_ids = instance.__dict__.pop('_cleared_user_ids', [])
+    else:
+        user_ids = pk_set
+    for user_id in user_ids:
+        SpaceMembership.objects.sync_user(user_id)
+
+m2m_changed.connect(_sync_group_members, sender=User.groups.through,
+                    dispatch_uid='space_membership_groups')
+
+_membership_handlers = {
+    'UserObjectPermission': _sync_membership,
+    'GroupObjectPermission': _sync_group_membership,
+}
+
+
+def _connect_membership_handlers(sender, **kwargs):
+    if sender._meta.app_label != 'guardian' or \
+            sender._meta.object_name not in _membership_handlers:
+        return
+    handler = _membership_handlers[sender._meta.object_name]
+    name = sender._meta.object_name.lower()
+    post_save.connect(handler, sender=sender,
+                      dispatch_uid='space_membership_save_%s' % name)
+    post_delete.connect(handler, sender=sender,
+                        dispatch_uid='space_membership_delete_%s' % name)
+
+for _name in _membership_handlers:
+    _permission_model = models.get_model('guardian', _name, seed_cache=False,
+                                         only_installed=False)
+    if _permission_model is not None:
+        _connect_membership_handlers(_permission_model)
+class_prepared.connect(_connect_membership_handlers)
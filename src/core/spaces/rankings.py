@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-space rankings used by the space index page (most commented proposals,
+highlighted proposals, most viewed and most commented news).
+
+Every ranking is stored in the cache as the ordered list of the primary keys
+of the top RANKING_SIZE objects of the space. Reading a ranking costs a single
+``in_bulk`` query no matter how many objects the space has. When the list is
+not in the cache it is rebuilt with one query over the counter columns kept
+by :mod:`helpers.counters`. The signal handlers at the bottom of this file
+drop the affected rankings whenever comments, support votes, proposals or
+posts change. They are connected when the proposals or news models are loaded,
+so every process that can change them (including management commands and
+the job worker) keeps the rankings right. The ``rebuild_rankings`` management
+command can be used to rebuild all of them periodically.
+
+The handlers only drop the rankings from the cache of the process that made
+the change. With a cache that isn't shared by the workers (like LocMemCache)
+the others keep their copy until it expires, so rankings are only kept for
+SPACE_RANKING_TIMEOUT seconds, 5 minutes by default. Raise it with a shared
+cache such as memcached.
+
+.. versionadded:: 0.1.9
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.contrib.comments.models import Comment
+
+from apps.ecidadania.news.models import Post
+from apps.ecidadania.proposals.models import Proposal
+from helpers.viewcounts import views_flushed
+
+RANKING_SIZE = getattr(settings, 'SPACE_RANKING_SIZE', 10)
+RANKING_TIMEOUT = getattr(settings, 'SPACE_RANKING_TIMEOUT', 60 * 5)
+
+PROPOSALS_COMMENTED = 'proposals_commented'
+PROPOSALS_SUPPORTED = 'proposals_supported'
+POSTS_VIEWED = 'posts_viewed'
+POSTS_COMMENTED = 'posts_commented'
+
+
+def _get_ranking_key(space_id, ranking):
+    """
+    Returns the cache key for the `ranking` of the space with `space_id`.
+    """
+    return 'ranking_%s_%s' % (ranking, space_id)
+
+
+def _top_commented(model, space_id):
+    """
+    Returns the primary keys of the `model` objects in the space ordered by
+    their number of public comments. Objects without comments are left out.
+    """
+    return list(model.objects.filter(space=space_id, comment_count__gt=0)
+        .order_by('-comment_count', '-pub_date')
+        .values_list('pk', flat=True)[:RANKING_SIZE])
+
+
+def _top_supported(space_id):
+    """
+    Returns the primary keys of the proposals in the space ordered by their
+    number of support votes. Proposals without support are left out.
+    """
+    return list(Proposal.objects.filter(space=space_id, support_count__gt=0)
+        .order_by('-support_count', '-pub_date')
+        .values_list('pk', flat=True)[:RANKING_SIZE])
+
+
+def _top_viewed(space_id):
+    """
+    Returns the primary keys of the posts in the space ordered by views.
+    """
+    return list(Post.objects.filter(space=space_id).order_by('-views')
+        .values_list('pk', flat=True)[:RANKING_SIZE])
+
+
+RANKINGS = {
+    PROPOSALS_COMMENTED: (Proposal, lambda s: _top_commented(Proposal, s)),
+    PROPOSALS_SUPPORTED: (Proposal, _top_supported),
+    POSTS_VIEWED: (Post, _top_viewed),
+    POSTS_COMMENTED: (Post, lambda s: _top_commented(Post, s)),
+}
+
+
+def rebuild_ranking(space_id, ranking):
+    """
+    Computes the `ranking` of the space again, stores it in the cache and
+    returns the list of primary keys.
+    """
+    model, builder = RANKINGS[ranking]
+    pks = builder(space_id)
+    cache.set(_get_ranking_key(space_id, ranking), pks, RANKING_TIMEOUT)
+    return pks
+
+
+def rebuild_rankings(space_id):
+    """
+    Rebuilds every ranking of the space.
+    """
+    for ranking in RANKINGS:
+        rebuild_ranking(space_id, ranking)
+
+
+def invalidate_rankings(space_id, *rankings):
+    """
+    Drops the given rankings of the space from the cache, or all of them if
+    none is given. They will be rebuilt the next time they are read.
+    """
+    cache.delete_many([_get_ranking_key(space_id, r)
+                       for r in (rankings or RANKINGS.keys())])
+
+
+def get_ranking(space, ranking, limit=RANKING_SIZE):
+    """
+    Returns a list with the top `limit` objects of the `ranking` for the
+    given space, best first.
+
+    :param space: Space instance or primary key
+    :param ranking: one of the RANKINGS keys
+    :rtype: list
+    """
+    space_id = getattr(space, 'pk', space)
+    model, builder = RANKINGS[ranking]
+    pks = cache.get(_get_ranking_key(space_id, ranking))
+
+    if pks is None:
+        pks = rebuild_ranking(space_id, ranking)
+
+    pks = pks[:limit]
+    objects = model.objects.in_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
+
+
+# Signal handlers. They only drop the rankings, the next read of the space
+# index will rebuild them with a single query.
+
+def _comment_changed(sender, instance, **kwargs):
+    model = instance.content_type.model_class()
+    if model not in (Proposal, Post):
+        return
+
+    try:
+        space_id = model.objects.filter(pk=instance.object_pk) \
+            .values_list('space', flat=True)[0]
+    except (IndexError, ValueError):
+        return
+
+    if model is Proposal:
+        invalidate_rankings(space_id, PROPOSALS_COMMENTED)
+    else:
+        invalidate_rankings(space_id, POSTS_COMMENTED)
+
+
+def _support_votes_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # The change was made from the user side, we don't know which spaces
+        # were affected without asking for them.
+        space_ids = set(Proposal.objects.filter(pk__in=kwargs['pk_set'] or [])
+                        .values_list('space', flat=True))
+    else:
+        space_ids = [instance.space_id]
+
+    for space_id in space_ids:
+        invalidate_rankings(space_id, PROPOSALS_SUPPORTED)
+
+
+def _proposal_changed(sender, instance, **kwargs):
+    invalidate_rankings(instance.space_id, PROPOSALS_COMMENTED,
+                        PROPOSALS_SUPPORTED)
+
+
+def _post_changed(sender, instance, **kwargs):
+    invalidate_rankings(instance.space_id, POSTS_VIEWED, POSTS_COMMENTED)
+
+
+def _post_views_flushed(sender, counts, **kwargs):
+    space_ids = set(Post.objects.filter(pk__in=counts.keys())
+                    .values_list('space', flat=True))
+    for space_id in space_ids:
+        invalidate_rankings(space_id, POSTS_VIEWED)
+
+
+post_save.connect(_comment_changed, sender=Comment)
+post_delete.connect(_comment_changed, sender=Comment)
+m2m_changed.connect(_support_votes_changed,
+                    sender=Proposal.support_votes.through)
+post_save.connect(_proposal_changed, sender=Proposal)
+post_delete.connect(_proposal_changed, sender=Proposal)
+post_save.connect(_post_changed, sender=Post)
+post_delete.connect(_post_changed, sender=Post)
+views_flushed.connect(_post_views_flushed, sender=Post)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Template tags for the images of the StdImageFields.
+
+.. versionadded:: 0.1.9
+"""
+
+from django.template import Library
+from django.utils.html import format_html
+
+from core.spaces.models import ImageVariant
+
+register = Library()
+
+
+@register.simple_tag
+def picture(image, alt=''):
+    """
+    Shows the image of a StdImageField in its smallest variant the browser
+    can show: ``{% picture get_place.logo %}``. Browsers with WebP support
+    get the WebP version, the rest the progressive JPEG one (or the image as
+    it was uploaded while its variants are being made). The variants are
+    read from the cache, see :class:`core.spaces.models.ImageVariant`.
+    """
+    if not image:
+        return ''
+    variants = ImageVariant.objects.get_cached_variants(image.name)
+    storage = image.storage
+    fallback = variants.get(ImageVariant.JPEG)
+    if fallback is None:
+        return format_html('<img src="{0}" alt="{1}" />', image.url, alt)
+
+    img = format_html('<img src="{0}" width="{1}" height="{2}" alt="{3}" />',
+                      storage.url(fallback.name), fallback.width,
+                      fallback.height, alt)
+    webp = variants.get(ImageVariant.WEBP)
+    if webp is None:
+        return img
+    return format_html('<picture><source srcset="{0}" type="image/webp" />'
+                       '{1}</picture>', storage.url(webp.name), img)
@@ -25,10 +25,12 @@ from django.core.exceptions import PermissionDenied
 
 from core.spaces import url_names as urln
 from core.spaces.models import Space, Document
+from core.spaces.mixins import SpaceMixin
+from helpers.cache import get_cached_object_or_404
 from core.spaces.forms import SpaceForm, DocForm
 
 
-class AddDocument(FormView):
+class AddDocument(SpaceMixin, FormView):
 
     """
     Upload a new document and attach it to the current space.
@@ -39,22 +41,13 @@ class AddDocument(FormView):
     """
     form_class = DocForm
     template_name = 'spaces/document_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(AddDocument, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln.SPACE_INDEX, kwargs={'space_url': space})
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.space = self.space
         form_uncommited.author = self.request.user
@@ -62,14 +55,8 @@ class AddDocument(FormView):
 
         return super(AddDocument, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(AddDocument, self).get_context_data(**kwargs)
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = space
-        return context
-
 
-class EditDocument(UpdateView):
+class EditDocument(SpaceMixin, UpdateView):
 
     """
     Returns a DocForm filled with the current document data.
@@ -80,15 +67,7 @@ class EditDocument(UpdateView):
     """
     model = Document
     template_name = 'spaces/document_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(EditDocument, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
@@ -100,15 +79,13 @@ class EditDocument(UpdateView):
 
     def get_context_data(self, **kwargs):
         context = super(EditDocument, self).get_context_data(**kwargs)
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = space
         context['user_is_admin'] = (has_space_permission(self.request.user,
-            space, allow=['admins', 'mods']) or has_all_permissions(
+            self.space, allow=['admins', 'mods']) or has_all_permissions(
                 self.request.user))
         return context
 
 
-class DeleteDocument(DeleteView):
+class DeleteDocument(SpaceMixin, DeleteView):
 
     """
     Returns a confirmation page before deleting the current document.
@@ -117,15 +94,7 @@ class DeleteDocument(DeleteView):
     :rtype: Confirmation
     :context: get_place
     """
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        doc = get_object_or_404(Document, pk=kwargs['doc_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space')):
-            return super(DeleteDocument, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_object(self):
         return get_object_or_404(Document, pk=self.kwargs['doc_id'])
@@ -138,14 +107,8 @@ class DeleteDocument(DeleteView):
         f.delete()
         return reverse(urln.SPACE_INDEX, kwargs={'space_url': space})
 
-    def get_context_data(self, **kwargs):
-        context = super(DeleteDocument, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
 
-
-class ListDocs(ListView):
+class ListDocs(SpaceMixin, ListView):
 
     """
     Returns a list of documents attached to the current space.
@@ -156,22 +119,7 @@ class ListDocs(ListView):
     paginate_by = 25
     context_object_name = 'document_list'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListDocs, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        objects = Document.objects.all().filter(space=place.id) \
+        objects = Document.objects.all().filter(space=self.space.id) \
             .order_by('pub_date')
         return objects
-
-    def get_context_data(self, **kwargs):
-        context = super(ListDocs, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
@@ -27,11 +27,13 @@ from guardian.shortcuts import assign_perm
 
 from core.spaces import url_names as urln
 from core.spaces.models import Space, Event
+from core.spaces.mixins import SpaceMixin
 from core.spaces.forms import SpaceForm, EventForm
-from helpers.cache import get_or_insert_object_in_cache
+from helpers.viewcounts import add_view
+from helpers.cache import get_cached_object_or_404
 
 
-class AddEvent(FormView):
+class AddEvent(SpaceMixin, FormView):
 
     """
     Returns an empty MeetingForm to create a new Meeting. Space and author
@@ -43,22 +45,13 @@ class AddEvent(FormView):
     """
     form_class = EventForm
     template_name = 'spaces/event_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(AddEvent, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_success_url(self):
         space = self.kwargs['space_url']
         return reverse(urln.SPACE_INDEX, kwargs={'space_url': space})
 
     def form_valid(self, form):
-        self.space = get_object_or_404(Space, url=self.kwargs['space_url'])
         form_uncommited = form.save(commit=False)
         form_uncommited.event_author = self.request.user
         form_uncommited.space = self.space
@@ -67,14 +60,8 @@ class AddEvent(FormView):
 
         return super(AddEvent, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(AddEvent, self).get_context_data(**kwargs)
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = place
-        return context
 
-
-class ViewEvent(DetailView):
+class ViewEvent(SpaceMixin, DetailView):
 
     """
     View the content of a event.
@@ -86,25 +73,13 @@ class ViewEvent(DetailView):
     context_object_name = 'event'
     template_name = 'spaces/event_detail.html'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ViewEvent, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_object(self):
-        return get_object_or_404(Event, pk=self.kwargs['event_id'])
+        event = get_object_or_404(Event, pk=self.kwargs['event_id'])
+        add_view(event)
+        return event
 
-    def get_context_data(self, **kwargs):
-        context = super(ViewEvent, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
 
-
-class EditEvent(UpdateView):
+class EditEvent(SpaceMixin, UpdateView):
 
     """
     Returns a MeetingForm filled with the current Meeting data to be edited.
@@ -115,16 +90,7 @@ class EditEvent(UpdateView):
     """
     model = Event
     template_name = 'spaces/event_form.html'
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        event = get_object_or_404(Event, pk=kwargs['event_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(EditEvent, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_object(self):
         cur_event = get_object_or_404(Event, pk=self.kwargs['event_id'])
@@ -141,14 +107,8 @@ class EditEvent(UpdateView):
 
         return super(EditEvent, self).form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super(EditEvent, self).get_context_data(**kwargs)
-        space = get_object_or_404(Space, url=self.kwargs['space_url'])
-        context['get_place'] = space
-        return context
-
 
-class DeleteEvent(DeleteView):
+class DeleteEvent(SpaceMixin, DeleteView):
 
     """
     Returns a confirmation page before deleting the Meeting object.
@@ -157,16 +117,7 @@ class DeleteEvent(DeleteView):
     :rtype: Confirmation
     :context: get_place
     """
-
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        event = get_object_or_404(Event, url=kwargs['event_id'])
-
-        if (request.user.has_perm('admin_space', space) or
-            request.user.has_perm('mod_space', space)):
-            return super(DeleteEvent, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    space_permissions = ('admin_space', 'mod_space')
 
     def get_object(self):
         return get_object_or_404(Event, pk=self.kwargs['event_id'])
@@ -175,14 +126,8 @@ class DeleteEvent(DeleteView):
         space = self.kwargs['space_url']
         return reverse(urln.SPACE_INDEX, kwargs={'space_url': space})
 
-    def get_context_data(self, **kwargs):
-        context = super(DeleteEvent, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
 
-
-class ListEvents(ListView):
+class ListEvents(SpaceMixin, ListView):
 
     """
     List all the events attached to a space.
@@ -194,20 +139,6 @@ class ListEvents(ListView):
     paginate_by = 25
     context_object_name = 'event_list'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-        if request.user.has_perm('view_space', space):
-            return super(ListEvents, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        objects = Event.objects.all().filter(space=place.id).order_by('event_date')
+        objects = Event.objects.all().filter(space=self.space.id).order_by('event_date')
         return objects
-
-    def get_context_data(self, **kwargs):
-        context = super(ListEvents, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
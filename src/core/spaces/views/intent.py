@@ -23,13 +23,13 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
 from django.utils.translation import ugettext_lazy as _
-from django.core.mail import send_mail
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 
 from e_cidadania import settings
+from core.mailqueue.mail import send_mail
 from core.spaces.models import Space, Intent
-from helpers.cache import get_or_insert_object_in_cache
+from helpers.cache import get_cached_object_or_404
 
 
 @login_required
@@ -44,7 +44,7 @@ def add_intent(request, space_url):
     :rtype: Multiple entity objects.
     :context: space_url, heading
     """
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
     admins = space.admins.all()
     mails = []
 
@@ -95,7 +95,7 @@ class ValidateIntent(DetailView):
         # Makes sure the space ins't already in the cache before hitting the
         # databass
         space_url = self.kwargs['space_url']
-        space_object = get_or_insert_object_in_cache(Space, space_url,
+        space_object = get_cached_object_or_404(Space,
             url=space_url)
 
         if has_space_permission(self.request.user, space_object,
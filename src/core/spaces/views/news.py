@@ -26,6 +26,8 @@ from django.core.exceptions import PermissionDenied
 
 from core.spaces import url_names as urln
 from core.spaces.models import Space
+from core.spaces.mixins import SpaceMixin
+from helpers.cache import get_cached_object_or_404
 from apps.ecidadania.news.models import Post
 
 
@@ -45,7 +47,7 @@ class RedirectArchive(RedirectView):
         return reverse(urln.NEWS_ARCHIVE, kwargs={'space_url': space})
 
 
-class YearlyPosts(YearArchiveView):
+class YearlyPosts(SpaceMixin, YearArchiveView):
 
     """
     List all the news posts of the selected year. Uses default template naming.
@@ -58,34 +60,15 @@ class YearlyPosts(YearArchiveView):
     paginate_by = 12
     date_field = 'pub_date'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(YearlyPosts, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
         """
         We use the get queryset function to get only the posts relevant to
         a space, instead of all of them.
         """
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return Post.objects.filter(space=place.id)
-
-    def get_context_data(self, **kwargs):
+        return Post.objects.filter(space=self.space.id)
 
-        """
-        Get extra context data for the ViewPost view.
-        """
-        context = super(YearlyPosts, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
 
-
-class MonthlyPosts(MonthArchiveView):
+class MonthlyPosts(SpaceMixin, MonthArchiveView):
 
     """
     List all the news posts for the selected month. This view uses default
@@ -98,34 +81,15 @@ class MonthlyPosts(MonthArchiveView):
     paginate_by = 12
     date_field = 'pub_date'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(MonthlyPosts, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
         """
         We use the get queryset function to get only the posts relevant to
         a space, instead of all of them.
         """
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return Post.objects.filter(space=place.id)
-
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for the ViewPost view.
-        """
-        context = super(MonthlyPosts, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
+        return Post.objects.filter(space=self.space.id)
 
 
-class ListPosts(ArchiveIndexView):
+class ListPosts(SpaceMixin, ArchiveIndexView):
 
     """
     List all post ordered by date
@@ -134,28 +98,9 @@ class ListPosts(ArchiveIndexView):
     paginate_by = 12
     allow_empty = True
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if request.user.has_perm('view_space', space):
-            return super(ListPosts, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
-
     def get_queryset(self):
         """
         We use the get queryset function to get only the posts relevant to
         a space, instead of all of them.
         """
-        place = get_object_or_404(Space, url=self.kwargs['space_url'])
-        return Post.objects.filter(space=place.id)
-
-    def get_context_data(self, **kwargs):
-
-        """
-        Get extra context data for the ViewPost view.
-        """
-        context = super(ListPosts, self).get_context_data(**kwargs)
-        context['get_place'] = get_object_or_404(Space,
-            url=self.kwargs['space_url'])
-        return context
+        return Post.objects.filter(space=self.space.id)
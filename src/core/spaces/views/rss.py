@@ -28,6 +28,7 @@ from apps.ecidadania.proposals.models import Proposal
 from apps.ecidadania.debate.models import Debate
 from apps.ecidadania.news.models import Post
 from core.spaces.models import Space, Event
+from helpers.cache import get_cached_object_or_404
 
 
 class HTTPAuthFeed(Feed):
@@ -69,7 +70,7 @@ class SpaceFeed(HTTPAuthFeed):
     """
 
     def get_object(self, request, space_url):
-        current_space = get_object_or_404(Space, url=space_url)
+        current_space = get_cached_object_or_404(Space, url=space_url)
         return current_space
 
     def title(self, obj):
@@ -23,27 +23,29 @@ from django.shortcuts import render_to_response, get_object_or_404
 from django.contrib import messages
 from django.template import RequestContext
 from django.utils.translation import ugettext_lazy as _
-from django.contrib.comments.models import Comment
-from django.db.models import Count
 from django.core.urlresolvers import reverse
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponseRedirect, HttpResponse, \
     HttpResponseNotFound, HttpResponseBadRequest, HttpResponseServerError
 from django.contrib.auth.models import User
 
-from helpers.cache import get_or_insert_object_in_cache
-from operator import itemgetter
-from guardian.shortcuts import assign_perm, get_users_with_perms, remove_perm, get_perms
+from helpers.cache import get_cached_object_or_404
+from guardian.shortcuts import assign_perm, remove_perm, get_perms
 from guardian.core import ObjectPermissionChecker
 
 from core.spaces import url_names as urln
-from core.spaces.models import Space, Entity, Document, Event
+from core.spaces import rankings
+from core.spaces.models import Space, Entity, Document, Event, \
+    SpaceMembership
+from core.spaces.mixins import SpaceMixin
 from core.spaces.forms import SpaceForm, EntityFormSet, RoleForm
 from apps.ecidadania.news.models import Post
 from apps.ecidadania.proposals.models import Proposal, ProposalSet
 from apps.ecidadania.staticpages.models import StaticPage
 from apps.ecidadania.debate.models import Debate
 from apps.ecidadania.voting.models import Poll, Voting
+from apps.thirdparty.userprofile.manifest import get_manifests, \
+    MANIFESTS_VARIABLE
 from e_cidadania.settings import DEBUG
 
 
@@ -124,7 +126,7 @@ def create_space(request):
                               context_instance=RequestContext(request))
 
 
-class ViewSpaceIndex(DetailView):
+class ViewSpaceIndex(SpaceMixin, DetailView):
 
     """
     Returns the index page for a space. The access to spaces is restricted and
@@ -143,71 +145,32 @@ class ViewSpaceIndex(DetailView):
     context_object_name = 'get_place'
     template_name = 'spaces/space_index.html'
 
-    def dispatch(self, request, *args, **kwargs):
+    def has_space_permission(self, user, space):
         """
-        We get the current space and user, first we check if the space is
-        public, if so, we check if the user is anonymous and leave a message,
-        after that we return the view. If the space is not public we check
-        for the view permission of the object, if the user doesn't have it we
-        return a 403. Since dispatch is run before anything, this checks are
-        made before obtaining the object. If the user doesn't have the
-        permission we return a 403 code, which is handled by
+        First we check if the space is public, if so, we check if the user is
+        anonymous and leave a message, after that we return the view. If the
+        space is not public we check for the view permission of the object,
+        if the user doesn't have it we return a 403, which is handled by
         django-guardian and returns a template.
-
-        .. note:: Take in mind that the dispatch method takes **request** as a
-                  parameter.
         """
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
         if space.public:
-            if request.user.is_anonymous():
+            if user.is_anonymous():
                 messages.info(self.request, _("Hello anonymous user. Remember \
                     that this space is public to view, but you must \
                     <a href=\"/accounts/register\">register</a> or \
                     <a href=\"/accounts/login\">login</a> to participate."))
 
-            return super(ViewSpaceIndex, self).dispatch(request, *args, **kwargs)
+            return True
 
-        if request.user.has_perm('view_space', space):
-            return super(ViewSpaceIndex, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+        return user.has_perm('view_space', space)
 
     def get_object(self):
-        # Makes sure the space ins't already in the cache before hitting
-        # the database
-        space_url = self.kwargs['space_url']
-        space_object = get_or_insert_object_in_cache(Space, space_url, url=space_url)
-        return space_object
+        return self.space
 
     # Get extra context data
     def get_context_data(self, **kwargs):
         context = super(ViewSpaceIndex, self).get_context_data(**kwargs)
-        # Makes sure the space ins't already in the cache before hitting the
-        # databass
-        place_url = self.kwargs['space_url']
-        place = get_or_insert_object_in_cache(Space, place_url, url=place_url)
-        '''posts_by_score = Comment.objects.filter(is_public=True) \
-            .values('object_pk').annotate(score=Count('id')).order_by('-score')'''
-        posts_by_score = Comment.objects.filter(is_public=True) \
-            .values('object_pk').annotate(score=Count('id')).order_by('-score')
-        post_ids = [int(obj['object_pk']) for obj in posts_by_score]
-        top_posts = Post.objects.filter(space=place.id).in_bulk(post_ids)
-        # print top_posts.values()[0].title
-        # o_list = Comment.objects.annotate(ocount=Count('object_pk'))
-        comment_list = {}
-        most_commented = []
-        for proposal in Proposal.objects.filter(space=place.id):
-            comment_list[proposal.pk] = Comment.objects.filter(object_pk=proposal.pk).count()
-        for p in dict(sorted(comment_list.items(), key=itemgetter(1))):
-            most_commented.append(Proposal.objects.filter(pk=p))
-
-        highlighted = {}
-        highlight = []
-        for i in Proposal.objects.filter(space=place.id):
-            highlighted[i.pk] = i.support_votes.count
-        for p in dict(sorted(highlighted.items(), key=itemgetter(1))):
-            highlight.append(Proposal.objects.filter(pk=p))
+        place = self.space
 
         context['entities'] = Entity.objects.filter(space=place.id)
         context['documents'] = Document.objects.filter(space=place.id)
@@ -216,16 +179,14 @@ class ViewSpaceIndex(DetailView):
                                                     .order_by('-pub_date')
         context['publication'] = Post.objects.filter(space=place.id) \
                                                     .order_by('-pub_date')[:5]
-        context['mostviewed'] = Post.objects.filter(space=place.id) \
-                                                    .order_by('-views')[:5]
-        # context['mostcommented'] = [top_posts.get(id,None) for id in post_ids]
-        context['mostcommented'] = filter(None, map(lambda x: top_posts.get(x, None), post_ids))
-        context['mostcommentedproposal'] = most_commented
-        context['highlightedproposal'] = highlight
-
-        # context['mostcommented'] = sorted(o_list,
-        #     key=lambda k: k['ocount'])[:10]
-        # print sorted(o_list, key=lambda k: k['ocount'])[:10]
+        context['mostviewed'] = rankings.get_ranking(place,
+                                                     rankings.POSTS_VIEWED, 5)
+        context['mostcommented'] = rankings.get_ranking(place,
+                                                rankings.POSTS_COMMENTED)
+        context['mostcommentedproposal'] = rankings.get_ranking(place,
+                                                rankings.PROPOSALS_COMMENTED)
+        context['highlightedproposal'] = rankings.get_ranking(place,
+                                                rankings.PROPOSALS_SUPPORTED)
         context['page'] = StaticPage.objects.filter(show_footer=True) \
                                                     .order_by('-order')
         context['messages'] = messages.get_messages(self.request)
@@ -235,7 +196,18 @@ class ViewSpaceIndex(DetailView):
                                                 .order_by('-event_date')
         context['votings'] = Voting.objects.filter(space=place.id)
         context['polls'] = Poll.objects.filter(space=place.id)
-        context['participants'] = get_users_with_perms(place)
+        context['participants'] = User.objects.filter(
+            space_memberships__space=place)
+
+        # Avatars of the authors in the recent activity, with one query
+        authors = set()
+        for enabled, objects in ((place.mod_news, context['publication']),
+                                 (place.mod_debate, context['debates'][:3]),
+                                 (place.mod_proposals,
+                                  context['proposals'][:3])):
+            if enabled:
+                authors.update(objects.values_list('author', flat=True))
+        context[MANIFESTS_VARIABLE] = get_manifests(authors)
         return context
 
 
@@ -260,7 +232,7 @@ def edit_space(request, space_url):
     :rtype:                HTML Form
     :context:              form, get_place, entityformset
     """
-    place = get_object_or_404(Space, url=space_url)
+    place = get_cached_object_or_404(Space, url=space_url)
 
     if (request.user.has_perm('change_space', place) and
         request.user.has_perm('admin_space', place)):
@@ -294,7 +266,7 @@ def edit_space(request, space_url):
         raise PermissionDenied
 
 
-class DeleteSpace(DeleteView):
+class DeleteSpace(SpaceMixin, DeleteView):
 
     """
     Returns a confirmation page before deleting the space object completely.
@@ -308,19 +280,12 @@ class DeleteSpace(DeleteView):
     context_object_name = 'get_place'
     success_url = '/'
 
-    def dispatch(self, request, *args, **kwargs):
-        space = get_object_or_404(Space, url=kwargs['space_url'])
-
-        if (request.user.has_perm('delete_space', space) and
-            request.user.has_perm('admin_space', space)):
-            return super(DeleteSpace, self).dispatch(request, *args, **kwargs)
-        else:
-            raise PermissionDenied
+    def has_space_permission(self, user, space):
+        return (user.has_perm('delete_space', space) and
+                user.has_perm('admin_space', space))
 
     def get_object(self):
-        space_url = self.kwargs['space_url']
-        space = get_object_or_404(Space, url=space_url)
-        return space
+        return self.space
 
 
 class ListSpaces(ListView):
@@ -340,37 +305,14 @@ class ListSpaces(ListView):
     """
     paginate_by = 10
 
-    public_spaces = Space.objects.filter(public=True)
-    all_spaces = Space.objects.all()
-
     def get_queryset(self):
-
-        # I think I should explain this mess. What we want to obtain here is:
-        # a list of public spaces in case the user is anonymous, or a list of
-        # the public spaces plus the spaces the user is registered to if the
-        # user is logged in.
-        # To do the second, we create a set of PK objects, and outside of the
-        # 'for' loop we make a queryset for those PK objects, after that we
-        # combine the data of the user spaces and public ones with the '|'
-        # operand.
-        current_user = self.request.user
-        user_spaces = set()
-        all_spaces = Space.objects.all()
-        public_spaces = Space.objects.filter(public=True)
-
-        if not current_user.is_anonymous():
-            for space in self.all_spaces:
-                if current_user.has_perm('view_space', space):
-                    user_spaces.add(space.pk)
-
-            user_spaces = Space.objects.filter(pk__in=user_spaces)
-            return self.public_spaces | user_spaces
-
-        return self.public_spaces
+        # Public spaces plus the ones the user has been given access to,
+        # resolved in the database instead of checking every space.
+        return Space.objects.visible_to(self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super(ListSpaces, self).get_context_data(**kwargs)
-        context['public_spaces'] = self.public_spaces
+        context['public_spaces'] = Space.objects.filter(public=True)
         return context
 
 
@@ -393,7 +335,7 @@ def edit_roles(request, space_url):
     :versionadded: 0.1.9
     """
 
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
     perm_dict = {
         'admins': ['admin_space', 'view_space'],
         'mods': ['mod_space', 'view_space'],
@@ -428,24 +370,21 @@ def edit_roles(request, space_url):
                 except:
                     return HttpResponseBadRequest(_('Permission code not valid.'))
         else:
-            space_users = get_users_with_perms(space, with_superusers=False)
             admins = set()
             mods = set()
             users = set()
-            for user in space_users:
-                if user.has_perm('admin_space', space):
-                    admins.add(user)
-                elif user.has_perm('mod_space', space):
-                    mods.add(user)
-                else:
-                    # We omit the check for "view_space" because the space_users
-                    # variable is already filtered to show only the users with permissions
-                    # on that object and users shows all the users in the space.
-                    users.add(user)
+            buckets = {SpaceMembership.ADMIN: admins,
+                       SpaceMembership.MOD: mods,
+                       SpaceMembership.USER: users}
+            for membership in SpaceMembership.objects.filter(space=space) \
+                    .select_related('user'):
+                buckets[membership.role].add(membership.user)
 
             return render_to_response('spaces/user_groups.html',
                 {'get_place': space, 'user_admins': admins, 'user_mods': mods,
-                 'user_users': users}, context_instance=RequestContext(request))
+                 'user_users': users,
+                 MANIFESTS_VARIABLE: get_manifests(admins | mods | users)},
+                context_instance=RequestContext(request))
     else:
         raise PermissionDenied
 
@@ -460,7 +399,7 @@ def search_user(request, space_url):
     :returns: user ID
     .. versionadded:: 0.1.9
     """
-    space = get_object_or_404(Space, url=space_url)
+    space = get_cached_object_or_404(Space, url=space_url)
 
     if request.user.has_perm('admin_space', space):
         if request.method == 'POST' and request.is_ajax():
@@ -15,13 +15,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.conf import settings
 from django.shortcuts import render_to_response
 from django.template import RequestContext, loader, Context
 from django.contrib.auth.decorators import login_required
 from django.utils.translation import ugettext_lazy as _
 
-from e_cidadania import settings
+from core.mailqueue.mail import send_mail
 
 
 @login_required
@@ -29,8 +29,8 @@ def invite(request):
 
     """
     Simple view to send invitations to friends via mail. Making the invitation
-    system as a view, guarantees that no invitation will be monitored or saved
-    to the hard disk.
+    system as a view, guarantees that no invitation will be monitored. The
+    invitation is only kept in the mail queue until it's sent.
     """
     if request.method == "POST":
         mail_addr = request.POST['email_addr']
@@ -48,9 +48,9 @@ def invite(request):
             RequestContext(request,
                                                 {'msg': usr_msg}))
 
-        email = EmailMultiAlternatives(_('Invitation to join e-cidadania'), plain_msg, settings.DEFAULT_FROM_EMAIL, [], addr_list)
-        email.attach_alternative(html_msg, 'text/html')
-        email.send(fail_silently=False)
+        send_mail(_('Invitation to join e-cidadania'), plain_msg,
+                  settings.DEFAULT_FROM_EMAIL, [], html_message=html_msg,
+                  bcc=addr_list)
         return render_to_response('invite_done.html',
                                   context_instance=RequestContext(request))
     uri = request.build_absolute_uri("/")
@@ -118,12 +118,16 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    # SpaceMiddleware resolves the space of the request once for all the views
+    'core.spaces.middleware.SpaceMiddleware',
     #'debug_toolbar.middleware.DebugToolbarMiddleware',
 )
 
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',  # this is default
-    'guardian.backends.ObjectPermissionBackend',
+    # Same as guardian.backends.ObjectPermissionBackend, but it loads all the
+    # object permissions of the user once per request
+    'helpers.permissions.ObjectPermissionBackend',
 )
 
 ROOT_URLCONF = 'e_cidadania.urls'
@@ -169,6 +173,8 @@ ECIDADANIA_MODULES = (
     # Modules created for e-cidadania and installed by default. You can add
     # here your own modules
     'core.spaces',
+    'core.mailqueue',
+    'core.jobs',
     'apps.ecidadania.accounts',
     'apps.ecidadania.proposals',
     'apps.ecidadania.news',
@@ -25,11 +25,40 @@ from e_cidadania.settings.defaults import *
 DEFAULT_FROM_EMAIL = ""
 # EMAIL_USE_TLS = True
 
+# Slow work (resizing images, sending the mail queue) is done during the
+# request unless it's queued. Queue it only once "python manage.py run_jobs
+# --loop", or the same command run every minute from cron, is running (see
+# core.jobs.runner), the queued jobs wait forever otherwise.
+# BACKGROUND_JOBS = True
+# JOBS_WORKER_THREADS = 4
+
+# Images resized at once by "python manage.py make_image_variants --now"
+# (see helpers.images), one per CPU by default.
+# IMAGE_PROCESSES = 4
+
+# Uploaded images with more pixels than this are refused before they are
+# decoded (40 megapixels by default).
+# IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# The mail is sent during the request unless it's queued. The queue is sent
+# by the jobs above, or by "python manage.py send_queued_mail" (see
+# core.mailqueue.mail). Limit it to some messages per second if the SMTP
+# server throttles the senders.
+# MAIL_QUEUE = True
+# MAIL_QUEUE_RATE = 10
+
 # Time and zone configuration
 TIME_ZONE = 'Europe/Madrid'
 LANGUAGE_CODE = 'es-es'
 
-# Cache backend.
+# Cache backend. LocMemCache is not shared by the worker processes, so what
+# a worker drops from its cache stays in the others until it expires, and
+# the workers can't tell each other that they are already fetching an object
+# (see helpers.cache), so only the threads of each worker share their cache
+# misses. With a shared cache (memcached) the misses of all the workers are
+# coalesced, and the cached data can be kept longer, for example the rankings
+# of the spaces (5 minutes by default):
+# SPACE_RANKING_TIMEOUT = 60 * 60 * 24
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -62,3 +91,8 @@ DATABASES = {
         'PORT': '',
     }
 }
+
+# Append-only log of the votes of the votings and polls, used to audit and
+# recount them (see apps.ecidadania.voting.ballotlog). Set it to None to
+# turn it off.
+BALLOT_LOG_ROOT = cwd + '/db/ballots/'
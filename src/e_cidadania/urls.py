@@ -60,6 +60,9 @@ urlpatterns += patterns('',
     # Explore
     url(r'^explore/$', 'core.views.explore.explore', name='explore'),
 
+    # Background jobs status
+    url(r'^jobs/', include('core.jobs.urls')),
+
     # This urls is for the django comments system
     url(r'^comments/', include('django.contrib.comments.urls')),
 
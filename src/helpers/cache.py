@@ -17,34 +17,388 @@
 
 """
 This file contains functions to help with caching.
+
+Models are registered with :func:`cache_model`, giving the fields they can be
+looked up by (for example ``pk`` and ``url`` for spaces). Registered objects
+are stored once per lookup and dropped from the cache on ``post_save`` and
+``post_delete``, so the cached copy is never older than the last edit. Every
+key also carries a per-model version number, :func:`invalidate_model` bumps
+it to drop all the cached objects of a model at once (for example after a
+``QuerySet.update()``, which doesn't send any signal).
+
+Objects are kept in two tiers. A small LRU cache inside each process answers
+repeated lookups of the same object during a request (and the next ones)
+without going to the cache backend, its entries live for
+OBJECT_CACHE_LOCAL_TIMEOUT seconds so other processes see the changes made
+elsewhere after that time at most.
+
+When an object is missing from both tiers only one thread of the process
+fetches it from the database, the others that miss it meanwhile get the same
+result instead of running the same query. Across processes the fetch is
+guarded by a lock taken with ``cache.add`` for OBJECT_CACHE_LOCK_TIMEOUT
+seconds. While a process holds it the others serve the last value fetched,
+kept under a second key for OBJECT_CACHE_STALE_TIMEOUT seconds, instead of
+querying the database too. Nobody waits for the lock: a process that finds
+no previous value (a key that was never fetched, or an object that was
+just saved) fetches it right away. Saving or deleting an object drops both
+copies.
+
+The lock and the previous values only coalesce the processes that share
+the cache backend. With LocMemCache (the default of the production
+settings) every process has its own, so only the threads of each process
+are coalesced. Use a shared backend such as memcached to coalesce the
+misses of all the workers.
 """
 
+import copy
+import threading
+import time
+from collections import OrderedDict
+
 # Django's cache module
+from django.conf import settings
 from django.core.cache import cache
-
-# Cached models
-from core.spaces.models import Space
+from django.db.models.signals import pre_save, post_save, post_delete
 
 # Response types
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
-# Tries to get the object from cache
-# Else queries the database
-# Else returns a 404 error
+# Registered models and the fields they can be looked up by
+_registry = {}
+
+# Version numbers are kept for 30 days, the longest memcached allows
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+LOCAL_SIZE = getattr(settings, 'OBJECT_CACHE_LOCAL_SIZE', 500)
+LOCAL_TIMEOUT = getattr(settings, 'OBJECT_CACHE_LOCAL_TIMEOUT', 5)
+LOCK_TIMEOUT = getattr(settings, 'OBJECT_CACHE_LOCK_TIMEOUT', 10)
+STALE_TIMEOUT = getattr(settings, 'OBJECT_CACHE_STALE_TIMEOUT', 60 * 60)
+
+# Keys being fetched by a thread of this process, with the event the other
+# threads wait on
+_fetching = {}
+_fetching_lock = threading.Lock()
+
+
+class LocalCache(object):
+
+    """
+    Bounded in-process cache. The least recently used entry is dropped when
+    it grows over `size` entries, and entries expire after `timeout` seconds.
+    It is thread safe.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires < time.time():
+                return default
+            # Put it back as the most recently used
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + self.timeout, value)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalCache(LOCAL_SIZE, LOCAL_TIMEOUT)
+
+
+def clear_local_cache():
+    """
+    Empties the in-process tier, for example after a ``cache.clear()``.
+    """
+    local_cache.clear()
+
+
+def _get_version_key(model):
+    """
+    Returns the cache key that holds the version number of the `model`.
+    """
+    return model.__name__ + '_version'
+
+
+def _get_model_version(model):
+    """
+    Returns the current version of the `model` keys. If the version is not
+    in the cache we start a new one from the current time, so keys stored
+    under an evicted version can't be reused by mistake.
+    """
+    version_key = _get_version_key(model)
+    version = local_cache.get(version_key)
+    if version is not None:
+        return version
+
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time()), VERSION_TIMEOUT)
+        version = cache.get(version_key, int(time.time()))
+
+    local_cache.set(version_key, version)
+    return version
+
+
+def _get_stale_key(key):
+    """
+    Returns the key of the last value fetched for `key`, served while
+    another process fetches it again.
+    """
+    return key + '_stale'
+
+
+def _set_shared(values):
+    """
+    Stores the `values` dictionary in the shared cache, with the copies
+    served while they are fetched again.
+    """
+    cache.set_many(values)
+    cache.set_many(dict((_get_stale_key(key), value)
+                        for key, value in values.items()), STALE_TIMEOUT)
+
+
+def _fetch_shared(key, fetch):
+    """
+    Calls `fetch` and stores its value under `key` in the shared cache,
+    unless another process is already doing it and there's a previous value
+    to return meanwhile.
+    """
+    lock_key = key + '_lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        value = cache.get(_get_stale_key(key))
+        if value is not None:
+            return value
+        # Nothing to serve, don't wait for the other process
+        value = fetch()
+        _set_shared({key: value})
+        return value
+
+    try:
+        value = fetch()
+        _set_shared({key: value})
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def _get_or_fetch(key, fetch):
+    """
+    Returns the value stored under `key` in any of the two tiers. If it is
+    not there, `fetch` is called to get it and the value is stored in both.
+
+    Only one thread of the process calls `fetch` for the same `key` at a
+    time, the others that miss it meanwhile wait for that call and take its
+    value (or call `fetch` themselves if it failed). Across processes, see
+    :func:`_fetch_shared`. The caller always gets its own copy, so changing
+    it doesn't change the cached one.
+    """
+    value = local_cache.get(key)
+    if value is not None:
+        return copy.copy(value)
+
+    value = cache.get(key)
+    if value is None:
+        with _fetching_lock:
+            event = _fetching.get(key)
+            fetching = event is None
+            if fetching:
+                event = _fetching[key] = threading.Event()
+        if fetching:
+            try:
+                value = _fetch_shared(key, fetch)
+                local_cache.set(key, value)
+            finally:
+                with _fetching_lock:
+                    del _fetching[key]
+                event.set()
+            return copy.copy(value)
+
+        event.wait()
+        value = local_cache.get(key)
+        if value is None:
+            # The fetch failed (the object doesn't exist)
+            value = _fetch_shared(key, fetch)
+
+    local_cache.set(key, value)
+    return copy.copy(value)
 
 
 def _get_cache_key_for_model(model, key):
     """
     Returns a unique key for the given model.
 
-    We prefix the given `key` with the name of the `model` to provide a further
-    degree of uniqueness of keys across the cache.
+    We prefix the given `key` with the name of the `model` and its current
+    version to provide a further degree of uniqueness of keys across the
+    cache.
     """
 
     if not isinstance(key, basestring):
         raise TypeError('key must be  str or a unicode string')
 
-    return model.__name__ + '_' + key
+    return '%s_%s_%s' % (model.__name__, _get_model_version(model), key)
+
+
+def _get_lookup_key(model, field, value, version=None):
+    """
+    Returns the key of the object of `model` whose `field` is `value`.
+    """
+    if version is None:
+        version = _get_model_version(model)
+    return '%s_%s_%s_%s' % (model.__name__, version, field, value)
+
+
+def _get_lookup(model, kwargs):
+    """
+    Returns the (field, value) pair if `kwargs` is a single lookup by one of
+    the registered fields of `model`, or None otherwise.
+    """
+    if model not in _registry or len(kwargs) != 1:
+        return None
+
+    field, value = kwargs.items()[0]
+    if field == 'id':
+        field = 'pk'
+    if field not in _registry[model]:
+        return None
+
+    return field, value
+
+
+def _get_instance_keys(instance):
+    """
+    Returns all the keys under which `instance` can be stored.
+    """
+    model = instance.__class__
+    version = _get_model_version(model)
+    return [_get_lookup_key(model, field, getattr(instance, field), version)
+            for field in _registry[model]]
+
+
+def _remember_old_keys(sender, instance, raw=False, **kwargs):
+    """
+    Reads from the database the values of the lookups of `instance` before
+    it is saved, in case they are changed (for example a space url), and
+    keeps their keys in the instance for :func:`_invalidate_instance`.
+    """
+    fields = [field for field in _registry[sender] if field != 'pk']
+    if raw or instance.pk is None or not fields:
+        return
+    version = _get_model_version(sender)
+    instance._old_cache_keys = [
+        _get_lookup_key(sender, field, value, version)
+        for row in sender.objects.filter(pk=instance.pk).values_list(*fields)
+        for field, value in zip(fields, row)]
+
+
+def _invalidate_instance(sender, instance, **kwargs):
+    """
+    Drops the cached copies of `instance`, under its current lookups and the
+    ones it had in the database before it was saved.
+    """
+    keys = set(_get_instance_keys(instance))
+    keys.update(instance.__dict__.pop('_old_cache_keys', ()))
+
+    local_cache.delete_many(keys)
+    cache.delete_many(list(keys) + [_get_stale_key(key) for key in keys])
+
+
+def cache_model(model, lookups=('pk',)):
+    """
+    Registers `model` in the object cache. The objects can then be retrieved
+    from the cache with any of the fields in `lookups`, and they will be
+    invalidated when saved or deleted.
+    """
+    lookups = tuple(lookups)
+    if 'pk' not in lookups:
+        lookups = ('pk',) + lookups
+
+    _registry[model] = lookups
+    pre_save.connect(_remember_old_keys, sender=model,
+                     dispatch_uid='cache_%s' % model.__name__)
+    post_save.connect(_invalidate_instance, sender=model,
+                      dispatch_uid='cache_%s' % model.__name__)
+    post_delete.connect(_invalidate_instance, sender=model,
+                        dispatch_uid='cache_%s' % model.__name__)
+
+
+def invalidate_model(model):
+    """
+    Drops all the cached objects of `model` by increasing its version.
+    """
+    version_key = _get_version_key(model)
+    local_cache.delete_many([version_key])
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, int(time.time()), VERSION_TIMEOUT)
+
+
+def get_cached_object(model, **kwargs):
+    """
+    Returns the instance of the registered `model` matching the lookup given
+    in `kwargs` (only one field, for example ``url='foo'``). If the object is
+    not in the cache it is retrieved from the database and stored under all
+    its lookups.
+
+    :raises: model.DoesNotExist
+    """
+    lookup = _get_lookup(model, kwargs)
+    if lookup is None:
+        raise ValueError("%s can't be looked up in the cache by %s" %
+                         (model.__name__, ', '.join(kwargs.keys())))
+
+    fetched = []
+
+    def fetch():
+        fetched.append(model.objects.get(**kwargs))
+        return fetched[0]
+
+    return_object = _get_or_fetch(_get_lookup_key(model, *lookup), fetch)
+
+    if fetched:
+        # Store it under the rest of its lookups too
+        _set_shared(dict((key, fetched[0]) for key in
+                         _get_instance_keys(fetched[0])))
+
+    return return_object
+
+
+def get_cached_object_or_404(model, **kwargs):
+    """
+    Cached version of ``get_object_or_404`` for the registered models.
+    """
+    try:
+        return get_cached_object(model, **kwargs)
+    except model.DoesNotExist:
+        raise Http404('No %s matches the given query.' %
+                      model._meta.object_name)
 
 
 def get_or_insert_object_in_cache(model, key, *args, **kwargs):
@@ -52,13 +406,15 @@ def get_or_insert_object_in_cache(model, key, *args, **kwargs):
     Returns an instance of the `model` stored in the cache with the given key.
     If the object is not found in the cache, it is retrieved from the database
     and set in the cache.
-    """
 
-    actual_key = _get_cache_key_for_model(model, key)
-    return_object = cache.get(actual_key)
+    If `model` is registered and `kwargs` is a lookup by one of its fields,
+    the object is shared with :func:`get_cached_object` and invalidated on
+    every save.
+    """
 
-    if not return_object:
-        return_object = get_object_or_404(model, *args, **kwargs)
-        cache.set(actual_key, return_object)
+    if not args and _get_lookup(model, kwargs):
+        return get_cached_object_or_404(model, **kwargs)
 
-    return return_object
+    actual_key = _get_cache_key_for_model(model, key)
+    return _get_or_fetch(actual_key,
+                         lambda: get_object_or_404(model, *args, **kwargs))
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Denormalized counters. Counts that are shown in lists and detail pages (for
+example the support votes or comments of a proposal) are stored in integer
+columns of the counted object, so reading them doesn't need a COUNT query.
+
+The columns are changed with ``F()`` expressions by the signal handlers
+connected here, so concurrent events never overwrite each other. Every
+counter also knows how to count itself from scratch, which is what the
+``rebuild_counters`` management command uses to fix them in bulk.
+
+.. versionadded:: 0.1.9
+"""
+
+from django.db.models import Count, F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.contrib.comments.models import Comment
+from django.contrib.contenttypes.models import ContentType
+
+# Registered counters as (model, field, function returning the real counts)
+_counters = []
+
+# Models whose comments are counted and the field that holds the count
+_comment_counters = {}
+
+
+def increment(model, pk, field, amount=1):
+    """
+    Adds `amount` (which can be negative) to the `field` of the object of
+    `model` with primary key `pk`, in the database.
+    """
+    model.objects.filter(pk=pk).update(**{field: F(field) + amount})
+
+
+def register_counter(model, field, counts):
+    """
+    Registers a counter so it can be rebuilt. `counts` is a function that
+    returns the real counts as an iterable of (pk, count) pairs, objects that
+    are not in it are counted as zero.
+    """
+    _counters.append((model, field, counts))
+
+
+def get_counters():
+    """
+    Returns the registered counters as a list of (model, field) pairs.
+    """
+    return [(model, field) for model, field, counts in _counters]
+
+
+def rebuild_counter(model, field, counts=None):
+    """
+    Counts the `field` of all the objects of `model` again and stores the
+    values that changed, grouping them in one UPDATE per value. Returns the
+    number of objects that were wrong.
+    """
+    if counts is None:
+        counts = [c for m, f, c in _counters if m is model and f == field][0]
+
+    real = dict(counts())
+    wrong = {}
+    for pk, value in model.objects.values_list('pk', field):
+        if value != real.get(pk, 0):
+            wrong.setdefault(real.get(pk, 0), []).append(pk)
+
+    for value, pks in wrong.items():
+        model.objects.filter(pk__in=pks).update(**{field: value})
+
+    return sum(len(pks) for pks in wrong.values())
+
+
+def rebuild_counters():
+    """
+    Rebuilds every registered counter. Returns the number of objects fixed.
+    """
+    return sum(rebuild_counter(model, field, counts)
+               for model, field, counts in _counters)
+
+
+# Comments
+
+def _is_counted(comment):
+    """
+    Returns True if the comment is shown, the same ones get_comment_count
+    counts.
+    """
+    return comment.is_public and not comment.is_removed
+
+
+def _count_comments(model):
+    """
+    Returns the number of shown comments of every object of `model`.
+    """
+    ctype = ContentType.objects.get_for_model(model)
+    # Without order_by() the ordering of Comment would be grouped by too
+    rows = Comment.objects.filter(content_type=ctype, is_public=True,
+        is_removed=False).values_list('object_pk').order_by() \
+        .annotate(Count('id'))
+    return [(int(object_pk), count) for object_pk, count in rows]
+
+
+def _comment_saved(sender, instance, created, **kwargs):
+    model = instance.content_type.model_class()
+    field = _comment_counters.get(model)
+    if field is None:
+        return
+
+    if created:
+        if _is_counted(instance):
+            increment(model, instance.object_pk, field)
+    else:
+        # A moderator hid or showed the comment, we don't know how it was
+        # before so the object is counted again.
+        count = Comment.objects.filter(content_type=instance.content_type,
+            object_pk=instance.object_pk, is_public=True,
+            is_removed=False).count()
+        model.objects.filter(pk=instance.object_pk).update(**{field: count})
+
+
+def _comment_deleted(sender, instance, **kwargs):
+    model = instance.content_type.model_class()
+    field = _comment_counters.get(model)
+    if field is not None and _is_counted(instance):
+        increment(model, instance.object_pk, field, -1)
+
+
+def count_comments(model, field='comment_count'):
+    """
+    Keeps the number of shown comments of the objects of `model` in `field`.
+    """
+    _comment_counters[model] = field
+    register_counter(model, field, lambda: _count_comments(model))
+
+
+post_save.connect(_comment_saved, sender=Comment,
+                  dispatch_uid='counters_comment_saved')
+post_delete.connect(_comment_deleted, sender=Comment,
+                    dispatch_uid='counters_comment_deleted')
+
+
+# Many to many relations
+
+def count_related(model, relation, field):
+    """
+    Keeps the number of objects in the many to many `relation` of `model`
+    (for example the support votes of a proposal) in `field`.
+    """
+    through = getattr(model, relation).through
+
+    def count():
+        return model.objects.annotate(related_count=Count(relation)) \
+            .values_list('pk', 'related_count')
+
+    def recount(pks):
+        # Removed objects may not have been related, count those again
+        counts = dict(model.objects.filter(pk__in=pks)
+                      .annotate(related_count=Count(relation))
+                      .values_list('pk', 'related_count'))
+        for pk, value in counts.items():
+            model.objects.filter(pk=pk).update(**{field: value})
+
+    def changed(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add':
+            # Django only sends the objects that were really added
+            if reverse:
+                model.objects.filter(pk__in=pk_set) \
+                    .update(**{field: F(field) + 1})
+            else:
+                increment(model, instance.pk, field, len(pk_set))
+        elif action == 'post_remove':
+            recount(pk_set if reverse else [instance.pk])
+        elif action == 'pre_clear' and reverse:
+            # After the clear we can't know which objects were related
+            instance._counter_cleared = list(model.objects.filter(
+                **{relation: instance}).values_list('pk', flat=True))
+        elif action == 'post_clear':
+            if reverse:
+                recount(getattr(instance, '_counter_cleared', []))
+            else:
+                model.objects.filter(pk=instance.pk).update(**{field: 0})
+
+    register_counter(model, field, count)
+    m2m_changed.connect(changed, sender=through, weak=False,
+                        dispatch_uid='counters_%s_%s' % (model.__name__,
+                                                         field))
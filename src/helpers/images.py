@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process image pipeline, used by the StdImageField of the spaces and by
+the avatars.
+
+A :class:`Pipeline` is a chain of operations (scale, crop, watermark, mode
+conversion) with the places where the image is saved along the way, for
+example::
+
+    Pipeline().crop(box).save(path).scale(128, 128).save(path_128)
+
+:func:`process` decodes an image once and runs one or more pipelines over it,
+every operation makes a new image so the pipelines don't see each other's
+changes. :func:`process_many` does the same for a batch of images on a pool
+of IMAGE_PROCESSES processes (one per CPU by default), since resizing images
+keeps the interpreter busy and threads would run one at a time.
+
+The images are written to a temporary file next to their destination that
+is then renamed, so the old file is served until the new one is complete.
+:meth:`Pipeline.save_compact` saves small versions for the web (WebP and
+progressive JPEG) with the hash of their content in their names, so they can
+be served with far-future cache headers: a new image gets new names.
+
+Images are never decoded blindly: their size is read from the header first
+and images with more than IMAGE_MAX_PIXELS pixels are refused with
+:class:`ImageTooBig`, so a small file that decodes to gigabytes can't take
+a worker down (:func:`validate_image` refuses them at upload). When every
+pipeline starts scaling the image down, JPEGs are decoded directly at a
+reduced size (1/2, 1/4 or 1/8, see :meth:`Pipeline.get_draft_size`), which
+needs a fraction of the memory and time of a full decode.
+
+.. versionadded:: 0.1.9
+"""
+
+import hashlib
+import math
+import multiprocessing
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext as _
+from PIL import Image, ImageEnhance, ImageOps
+
+PROCESSES = getattr(settings, 'IMAGE_PROCESSES', None)
+WEBP_QUALITY = getattr(settings, 'IMAGE_WEBP_QUALITY', 80)
+JPEG_QUALITY = getattr(settings, 'IMAGE_JPEG_QUALITY', 85)
+MAX_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', 40 * 1000 * 1000)
+
+# Characters of the hash of the content in the hashed names
+HASH_LENGTH = 12
+
+# Corner or side of the image where the watermark goes
+GRAVITIES = {
+    'northwest': (0, 0), 'north': (1, 0), 'northeast': (2, 0),
+    'west': (0, 1), 'center': (1, 1), 'east': (2, 1),
+    'southwest': (0, 2), 'south': (1, 2), 'southeast': (2, 2),
+}
+
+
+class ImageTooBig(IOError):
+
+    """
+    The image has more pixels than IMAGE_MAX_PIXELS. It's an IOError, like
+    the ones of the images that can't be read.
+    """
+
+
+def _open(source):
+    """
+    Opens the image in the path or file `source`, reading only its header,
+    and checks that it's within IMAGE_MAX_PIXELS.
+    """
+    image = Image.open(source)
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageTooBig('The image is %dx%d, more than %d pixels' %
+                          (width, height, MAX_PIXELS))
+    return image
+
+
+def inspect_image(source):
+    """
+    Returns the format and size of the image in the path or file `source`,
+    reading only its header. Files are read from the start and left where
+    they were. Raises :class:`ImageTooBig` if the image has more than
+    IMAGE_MAX_PIXELS pixels and IOError if it's not an image.
+    """
+    if isinstance(source, basestring):
+        image = _open(source)
+        return image.format, image.size
+    position = source.tell()
+    source.seek(0)
+    try:
+        image = _open(source)
+        return image.format, image.size
+    finally:
+        source.seek(position)
+
+
+def validate_image(upload):
+    """
+    Validator of the uploaded images: checks from their header that they are
+    images within IMAGE_MAX_PIXELS, before anything decodes them. Files
+    already stored were checked when they were uploaded.
+    """
+    if getattr(upload, '_committed', False):
+        return
+    try:
+        inspect_image(upload)
+    except ImageTooBig:
+        raise ValidationError(_('The image is too big, it can have '
+                                '%(pixels)s megapixels at most.') %
+                              {'pixels': MAX_PIXELS // 1000000})
+    except IOError:
+        raise ValidationError(_('The file is not a valid image.'))
+
+
+def get_scaled_size(size, width, height=None):
+    """
+    Returns the biggest size that keeps the aspect ratio of `size` and fits
+    in `width` x `height` (only `width` if `height` is None). Images are
+    never enlarged.
+    """
+    x, y = size
+    if height is None:
+        height = max(y * width // x, 1)
+    if x > width:
+        y = max(y * width // x, 1)
+        x = width
+    if y > height:
+        x = max(x * height // y, 1)
+        y = height
+    return x, y
+
+
+def _scale(image, width, height, force):
+    if height is None:
+        height = get_scaled_size(image.size, width)[1]
+    if image.size[0] <= width and image.size[1] <= height:
+        return image
+    if force:
+        return ImageOps.fit(image, (width, height), Image.ANTIALIAS)
+    return image.resize(get_scaled_size(image.size, width, height),
+                        Image.ANTIALIAS)
+
+
+def _crop(image, box):
+    return image.crop(box)
+
+
+def _watermark(image, mark, opacity, gravity):
+    mark = Image.open(mark).convert('RGBA')
+    alpha = ImageEnhance.Brightness(mark.split()[3]).enhance(opacity)
+    mark.putalpha(alpha)
+    column, row = GRAVITIES[gravity]
+    position = ((image.size[0] - mark.size[0]) * column // 2,
+                (image.size[1] - mark.size[1]) * row // 2)
+    marked = image.convert('RGBA')
+    marked.paste(mark, position, mark)
+    if image.mode in ('L', 'RGB'):
+        return marked.convert(image.mode)
+    return marked
+
+
+def _convert(image, mode):
+    if image.mode == mode:
+        return image
+    return image.convert(mode)
+
+
+def supports_format(format):
+    """
+    Returns True if PIL can save images in `format` (WebP needs libwebp).
+    """
+    Image.init()
+    return format in Image.SAVE
+
+
+def _get_digest(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as saved:
+        for chunk in iter(lambda: saved.read(1 << 16), ''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def save_image(image, path, format=None, hashed=False, **options):
+    """
+    Saves `image` to `path` through a temporary file in the same directory
+    and returns the path. Images without a format of their own are saved as
+    JPEG if the format is not given. If `hashed` is True the path gets the
+    hash of the content before the extension (``logo.<hash>.jpg``).
+    """
+    format = format or image.format or 'JPEG'
+    if format in ('JPEG', 'WEBP') and image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        try:
+            image.save(temp_path, format, optimize=1, **options)
+        except IOError:
+            # Big images can't be optimized by some versions of PIL
+            image.save(temp_path, format, **options)
+        os.chmod(temp_path, 0644)
+        if hashed:
+            base, extension = os.path.splitext(path)
+            path = '%s.%s%s' % (base, _get_digest(temp_path), extension)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+    return path
+
+
+def get_compact_formats():
+    """
+    Returns the (format, extension, options) of the compact versions of the
+    images, smallest first: WebP, when PIL supports it, and a progressive
+    JPEG that every browser can show.
+    """
+    formats = []
+    if supports_format('WEBP'):
+        formats.append(('WEBP', '.webp', {'quality': WEBP_QUALITY}))
+    formats.append(('JPEG', '.jpg', {'quality': JPEG_QUALITY,
+                                     'progressive': True}))
+    return formats
+
+
+OPERATIONS = {
+    'scale': _scale,
+    'crop': _crop,
+    'watermark': _watermark,
+    'convert': _convert,
+}
+
+
+class Pipeline(object):
+
+    """
+    Chain of operations over an image. Every method returns a new pipeline
+    with the operation added at the end, so a pipeline can be the start of
+    several others. Pipelines can be pickled, to send them to the processes
+    of :func:`process_many`.
+    """
+
+    def __init__(self, steps=()):
+        self.steps = tuple(steps)
+
+    def _then(self, *step):
+        return Pipeline(self.steps + (step,))
+
+    def __add__(self, other):
+        return Pipeline(self.steps + other.steps)
+
+    def scale(self, width, height=None, force=False):
+        """
+        Scales the image down to fit in `width` x `height`, or to `width`
+        keeping the aspect ratio if there's no `height`. If `force` is True
+        the image is cropped to that exact size instead.
+        """
+        return self._then('scale', width, height, force)
+
+    def crop(self, box):
+        """
+        Crops the (left, top, right, bottom) `box` of the image.
+        """
+        return self._then('crop', tuple(box))
+
+    def watermark(self, mark, opacity=0.13, gravity='southeast'):
+        """
+        Puts the image in the file `mark` over the image, in the place given
+        by `gravity` (see GRAVITIES).
+        """
+        return self._then('watermark', mark, opacity, gravity)
+
+    def convert(self, mode):
+        """
+        Converts the image to `mode` ('RGB', 'L'...).
+        """
+        return self._then('convert', mode)
+
+    def save(self, path, format=None, **options):
+        """
+        Saves the image as it is at this point to `path`, in `format` (the
+        format of the source image by default). The options are given to
+        PIL, for example ``quality``.
+        """
+        return self._then('save', path, format, False, options)
+
+    def save_compact(self, path):
+        """
+        Saves the image as it is at this point as a WebP (if PIL supports
+        it) and as a progressive JPEG, next to `path` and with the hash of
+        their content in their names, see :func:`get_compact_formats`.
+        """
+        base = os.path.splitext(path)[0]
+        pipeline = self
+        for format, extension, options in get_compact_formats():
+            pipeline = pipeline._then('save', base + extension, format, True,
+                                      options)
+        return pipeline
+
+    def get_draft_size(self, size):
+        """
+        Returns the smallest size an image of `size` can be decoded at
+        without changing the result of the pipeline, or None if it has to
+        be decoded whole: the pipeline must scale the image down before
+        saving, cropping or watermarking it.
+        """
+        for step in self.steps:
+            if step[0] == 'convert':
+                continue
+            if step[0] != 'scale':
+                return None
+            width, height, force = step[1:]
+            if not force:
+                return get_scaled_size(size, width, height)
+            # The image is scaled to cover width x height and then cropped
+            x, y = size
+            if height is None:
+                height = get_scaled_size(size, width)[1]
+            factor = min(max(float(width) / x, float(height) / y), 1)
+            return (int(math.ceil(x * factor)), int(math.ceil(y * factor)))
+        return None
+
+    def apply(self, image, format=None):
+        """
+        Runs the pipeline over the PIL `image`, which is not changed.
+        `format` is the format of the source, used by the saves without one.
+        Returns the (path, size) of every saved image, in order.
+        """
+        format = format or image.format
+        outputs = []
+        for step in self.steps:
+            if step[0] == 'save':
+                path, save_format, hashed, options = step[1:]
+                path = save_image(image, path, save_format or format, hashed,
+                                  **options)
+                outputs.append((path, image.size))
+            else:
+                image = OPERATIONS[step[0]](image, *step[1:])
+        return outputs
+
+    def run(self, source):
+        """
+        Decodes the image in the path or file `source` and runs the pipeline
+        over it, see :meth:`apply`.
+        """
+        return process(source, self)[0]
+
+
+def process(source, *pipelines):
+    """
+    Decodes the image in the path or file `source` once and runs every
+    pipeline over it. Returns the outputs (see :meth:`Pipeline.apply`) of
+    every pipeline. JPEGs are decoded at the smallest size all the pipelines
+    allow (see :meth:`Pipeline.get_draft_size`). Raises
+    :class:`ImageTooBig` without decoding images over IMAGE_MAX_PIXELS.
+    """
+    image = _open(source)
+    format = image.format
+    if format == 'JPEG':
+        sizes = [pipeline.get_draft_size(image.size)
+                 for pipeline in pipelines]
+        if sizes and None not in sizes:
+            image.draft(image.mode, (max(x for x, y in sizes),
+                                     max(y for x, y in sizes)))
+    image.load()
+    return [pipeline.apply(image, format) for pipeline in pipelines]
+
+
+def _process_task(task):
+    source, pipelines = task
+    try:
+        return process(source, *pipelines)
+    except IOError:
+        return None
+
+
+def process_many(tasks, processes=None):
+    """
+    Processes a batch of images, `tasks` is a list of (source, pipelines)
+    pairs. They are spread over a pool of `processes` processes (the
+    IMAGE_PROCESSES setting, or one per CPU, by default). Returns the result
+    of :func:`process` for every task, or None for the images that couldn't
+    be read.
+    """
+    tasks = list(tasks)
+    if processes is None:
+        processes = PROCESSES or multiprocessing.cpu_count()
+    processes = min(processes, len(tasks))
+    if processes <= 1:
+        return map(_process_task, tasks)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_process_task, tasks,
+                        chunksize=max(1, len(tasks) // (processes * 4)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def get_image_size(source):
+    """
+    Returns the size of the image in the path or file `source`, reading only
+    its header.
+    """
+    return inspect_image(source)[1]
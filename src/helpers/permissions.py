@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Object permission checks done in bulk.
+
+django-guardian runs one or two queries every time ``user.has_perm(perm,
+obj)`` is called, and some views check five permissions in a row or one
+permission for every space in the site. The :class:`ObjectPermissionBackend`
+in this module replaces guardian's backend: the first check of a user on
+an object loads the object permissions of that user (directly assigned and
+through groups) on that object and on the space it belongs to in two
+queries, and keeps them in a :class:`PermissionChecker` attached to the user
+instance. Since ``request.user`` is created once per request, the rest of
+the checks of the request on the same objects don't touch the database.
+Views that check a list of objects load them all at once with
+:meth:`PermissionChecker.prefetch`, PERMISSIONS_PREFETCH_SIZE objects per
+two queries. Only the permissions on the checked objects are loaded, never
+all the ones of the user on a model.
+
+Any change in the permission tables discards the loaded permissions, so a
+permission assigned during the request is seen by the checks that follow.
+
+.. versionadded:: 0.1.9
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+
+from guardian.exceptions import WrongAppError
+from guardian.models import UserObjectPermission, GroupObjectPermission
+
+PREFETCH_SIZE = getattr(settings, 'PERMISSIONS_PREFETCH_SIZE', 500)
+
+# Changes every time a permission is assigned or removed in this process
+_generation = [0]
+
+
+def _permissions_changed(sender, **kwargs):
+    _generation[0] += 1
+
+post_save.connect(_permissions_changed, sender=UserObjectPermission)
+post_delete.connect(_permissions_changed, sender=UserObjectPermission)
+post_save.connect(_permissions_changed, sender=GroupObjectPermission)
+post_delete.connect(_permissions_changed, sender=GroupObjectPermission)
+
+
+class PermissionChecker(object):
+
+    """
+    Holds the object permissions of a user on the objects it was asked
+    about, indexed by content type id and object primary key. Anonymous
+    users get the permissions of guardian's anonymous user
+    (ANONYMOUS_USER_ID).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._perms = {}
+        self._generation = None
+
+    def _get_user_id(self):
+        if self.user.is_authenticated():
+            return self.user.pk
+        return settings.ANONYMOUS_USER_ID
+
+    def _get_key(self, model, pk):
+        return ContentType.objects.get_for_model(model).id, unicode(pk)
+
+    def _load(self, keys):
+        """
+        Loads the permissions of the user on the objects of `keys`, a list of
+        (content type id, object primary key) pairs, with two queries: one
+        for the permissions of the user and one for the ones of its groups.
+        """
+        if self._generation != _generation[0]:
+            self._perms = {}
+            self._generation = _generation[0]
+
+        keys = [key for key in keys if key not in self._perms]
+        if not keys:
+            return
+
+        pks = defaultdict(list)
+        for ctype_id, object_pk in keys:
+            pks[ctype_id].append(object_pk)
+            self._perms[ctype_id, object_pk] = set()
+        scope = models.Q()
+        for ctype_id, object_pks in pks.items():
+            scope |= models.Q(content_type=ctype_id, object_pk__in=object_pks)
+
+        user_id = self._get_user_id()
+        user_perms = UserObjectPermission.objects \
+            .filter(scope, user=user_id) \
+            .values_list('content_type', 'object_pk', 'permission__codename')
+        group_perms = GroupObjectPermission.objects \
+            .filter(scope, group__user=user_id) \
+            .values_list('content_type', 'object_pk', 'permission__codename')
+
+        for queryset in (user_perms, group_perms):
+            for ctype_id, object_pk, codename in queryset:
+                self._perms[ctype_id, object_pk].add(codename)
+
+    def prefetch(self, objects):
+        """
+        Loads the permissions of the user on all the `objects` at once, two
+        queries for every PREFETCH_SIZE objects.
+        """
+        keys = [self._get_key(obj.__class__, obj.pk) for obj in objects]
+        for start in range(0, len(keys), PREFETCH_SIZE):
+            self._load(keys[start:start + PREFETCH_SIZE])
+
+    def get_perms(self, obj):
+        """
+        Returns the set of permission codenames the user has on `obj`. The
+        permissions on the space of `obj` are loaded with them, since the
+        views check both.
+        """
+        key = self._get_key(obj.__class__, obj.pk)
+        keys = [key]
+        try:
+            space_field = obj._meta.get_field('space')
+        except FieldDoesNotExist:
+            pass
+        else:
+            space_id = getattr(obj, space_field.attname, None)
+            if space_field.rel and space_id is not None:
+                keys.append(self._get_key(space_field.rel.to, space_id))
+        self._load(keys)
+        return self._perms[key]
+
+    def has_perm(self, perm, obj):
+        """
+        Returns True if the user has `perm` (with or without app label) on
+        `obj`.
+        """
+        if not self.user.is_active and self.user.is_authenticated():
+            return False
+        if self.user.is_superuser:
+            return True
+        return perm.split('.')[-1] in self.get_perms(obj)
+
+
+def get_permission_checker(user):
+    """
+    Returns the :class:`PermissionChecker` of `user`, creating it the first
+    time.
+    """
+    checker = getattr(user, '_permission_checker', None)
+    if checker is None:
+        checker = PermissionChecker(user)
+        user._permission_checker = checker
+    return checker
+
+
+class ObjectPermissionBackend(object):
+
+    """
+    Authentication backend for object permissions. It answers the same as
+    ``guardian.backends.ObjectPermissionBackend`` but uses the checker of the
+    user, so only the first check hits the database.
+    """
+    supports_object_permissions = True
+    supports_anonymous_user = True
+    supports_inactive_user = True
+
+    def authenticate(self, username, password):
+        return None
+
+    def has_perm(self, user_obj, perm, obj=None):
+        if obj is None or not isinstance(obj, models.Model):
+            return False
+
+        if len(perm.split('.')) > 1:
+            app_label, perm = perm.split('.')
+            if app_label != obj._meta.app_label:
+                raise WrongAppError("Passed perm has app label of '%s' and "
+                    "given obj has '%s'" % (app_label, obj._meta.app_label))
+
+        return get_permission_checker(user_obj).has_perm(perm, obj)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Buffered view counters. Every page view of a post, proposal, debate or event
+used to be a write to its row, with this module the views are added up in
+the memory of the process and written every VIEW_COUNT_FLUSH_INTERVAL
+seconds, with one ``UPDATE ... SET views = views + n`` per model and number
+of views. The rows are never saved, so concurrent views are not lost and the
+cached copies of the objects are not invalidated.
+
+The first view after a flush starts a timer thread that flushes the views
+once the interval is over, so they are written even if the process gets no
+more views. The views of a process that dies before flushing are lost,
+which is fine for a popularity counter. The pending views are flushed when
+the process exits normally.
+They are kept in memory rather than in the cache because the cache can't
+list the keys that need flushing.
+
+Models are registered with :func:`count_views`, and :data:`views_flushed`
+is sent after every flush so other parts of the site (like the space
+rankings) can react to the new numbers.
+
+.. versionadded:: 0.1.9
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 30)
+MAX_PENDING = getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+
+# Sent after the views of `sender` (a model) are written, `counts` maps the
+# primary keys to the number of views added.
+views_flushed = Signal(providing_args=['counts'])
+
+# Registered models and the field that holds their views
+_fields = {}
+
+
+class ViewCounter(object):
+
+    """
+    Adds up the views of the registered models until they are flushed. It is
+    flushed automatically by a timer when the oldest pending view is
+    FLUSH_INTERVAL seconds old, or right away when there are more than
+    MAX_PENDING objects waiting. It is thread safe.
+    """
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = defaultdict(int)
+        self._since = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _start_timer(self):
+        """
+        Starts the timer of the next flush unless it is running. It must be
+        called with the lock held.
+        """
+        # A forked process gets the timer object but not its thread
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(self.interval, self._flush_in_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_in_timer(self):
+        with self._lock:
+            # The views added while flushing start a new timer
+            if self._timer is threading.current_thread():
+                self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own connection to the database
+            connection.close()
+
+    def stop_timer(self):
+        """
+        Stops the timer of the next flush, if it's running.
+        """
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+            if timer is not threading.current_thread():
+                timer.join()
+
+    def add(self, model, pk, views=1):
+        """
+        Adds `views` to the object of `model` with primary key `pk`.
+        """
+        with self._lock:
+            if self._since is None:
+                self._since = time.time()
+                self._start_timer()
+            self._pending[(model, pk)] += views
+            due = (len(self._pending) > self.max_pending or
+                   time.time() - self._since >= self.interval)
+
+        if due:
+            self.flush()
+
+    def get_pending(self, model, pk):
+        """
+        Returns the views of the object that have not been written yet.
+        """
+        with self._lock:
+            return self._pending.get((model, pk), 0)
+
+    def _requeue(self, model, pks, views):
+        with self._lock:
+            for pk in pks:
+                self._pending[(model, pk)] += views
+            if self._since is None:
+                self._since = time.time()
+                self._start_timer()
+
+    def flush(self):
+        """
+        Writes the pending views to the database. The objects that got the
+        same number of views are updated together. If an update fails the
+        error is logged, not raised, and the views that were not written
+        are kept for the next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._since = None
+
+        by_model = defaultdict(dict)
+        for (model, pk), views in pending.items():
+            by_model[model][pk] = views
+
+        failed = False
+        for model, counts in by_model.items():
+            field = _fields[model]
+            by_views = defaultdict(list)
+            for pk, views in counts.items():
+                by_views[views].append(pk)
+
+            written = {}
+            for views, pks in by_views.items():
+                if not failed:
+                    try:
+                        model.objects.filter(pk__in=pks) \
+                            .update(**{field: F(field) + views})
+                    except Exception:
+                        logger.exception("Couldn't write the views of %s",
+                                         model.__name__)
+                        # The database is probably gone, don't insist
+                        failed = True
+                if failed:
+                    self._requeue(model, pks, views)
+                else:
+                    written.update((pk, views) for pk in pks)
+
+            if written:
+                for receiver, result in views_flushed.send_robust(
+                        sender=model, counts=written):
+                    if isinstance(result, Exception):
+                        logger.error('Error handling the views of %s: %s',
+                                     model.__name__, result)
+
+
+view_counter = ViewCounter()
+
+
+def _flush_at_exit():
+    # Python 2 complains about the daemon threads still waiting at exit
+    view_counter.stop_timer()
+    # If the database is gone already the views are lost either way
+    view_counter.flush()
+
+atexit.register(_flush_at_exit)
+
+
+def count_views(model, field='views'):
+    """
+    Registers `model` so its views can be counted in `field`.
+    """
+    _fields[model] = field
+
+
+def add_view(obj):
+    """
+    Counts a view of `obj`, an instance of a registered model. It will be
+    written to the database with the next flush.
+    """
+    if obj.__class__ not in _fields:
+        raise ValueError("The views of %s are not counted" %
+                         obj.__class__.__name__)
+    view_counter.add(obj.__class__, obj.pk)
+
+
+def flush_views():
+    """
+    Writes all the pending views now.
+    """
+    view_counter.flush()
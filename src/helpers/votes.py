@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Clione Software
+# Copyright (c) 2010-2013 Cidadania S. Coop. Galega
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Votes written with a single insert. Support votes and poll votes are many
+to many relations with the users. ``add()`` first reads which of the users
+are already there and then inserts the rest, so two requests of the same
+user can both pass the check, and the second one fails with an
+IntegrityError.
+
+A vote added through this module is one INSERT in a savepoint. The unique
+constraint of the relation rejects a duplicate, and the savepoint is rolled
+back, no matter which process cast the first vote. The vote is in the
+database when the user is told it counted. Savepoints only work inside a
+transaction, so the callers add the votes in ``commit_on_success()``.
+
+``m2m_changed`` is sent for the new votes like ``add()`` would, so the
+counters, tallies and rankings that listen to it keep working.
+
+.. versionadded:: 0.1.9
+"""
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models.signals import m2m_changed
+
+
+class Relation(object):
+
+    """
+    A many to many relation with the users that takes votes, for example
+    the support votes of the proposals.
+    """
+
+    def __init__(self, model, name):
+        field = model._meta.get_field(name)
+        self.model = model
+        self.name = name
+        self.through = field.rel.through
+        self.object_field = field.m2m_field_name()
+        self.user_field = field.m2m_reverse_field_name()
+
+    def add(self, obj, user_pk):
+        """
+        Inserts the vote of the user with `user_pk` on `obj`. Returns False,
+        and changes nothing, if the user had already voted.
+        """
+        using = self.through.objects.db
+        sid = transaction.savepoint(using=using)
+        try:
+            self.through.objects.create(**{
+                '%s_id' % self.object_field: obj.pk,
+                '%s_id' % self.user_field: user_pk})
+        except IntegrityError:
+            transaction.savepoint_rollback(sid, using=using)
+            return False
+        transaction.savepoint_commit(sid, using=using)
+
+        m2m_changed.send(sender=self.through, action='post_add',
+                         instance=obj, reverse=False, model=User,
+                         pk_set=set([user_pk]), using=using)
+        return True
+
+
+_relations = {}
+
+
+def get_relation(model, name):
+    """
+    Returns the :class:`Relation` for the `name` many to many field of
+    `model`.
+    """
+    key = (model, name)
+    if key not in _relations:
+        _relations[key] = Relation(model, name)
+    return _relations[key]
+
+
+def add_vote(obj, name, user):
+    """
+    Adds the vote of `user` in the `name` many to many field of `obj`.
+    Returns False, and adds nothing, if the user had already voted. It must
+    be called inside a transaction.
+    """
+    return get_relation(obj.__class__, name).add(obj, user.pk)
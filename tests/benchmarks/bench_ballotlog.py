@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of the recount of a big ballot log: 5.000.000 records (a tenth of
+them removed votes) over 1.000 proposals, about 81MB on disk.
+
+Compares the recount with NumPy over the memory map with the plain Python
+recount, and checks that both give the same numbers. Benchmarks are not run
+with the unit tests, run them explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_ballotlog
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from django.test import SimpleTestCase
+
+from apps.ecidadania.voting import ballotlog
+
+RECORDS = 5000000
+PROPOSALS = 1000
+# Records appended with every write
+BATCH = 10000
+
+
+class BallotLogBenchmark(SimpleTestCase):
+
+    def setUp(self):
+        self.log_root = tempfile.mkdtemp()
+        self.old_log_root = ballotlog.LOG_ROOT
+        ballotlog.LOG_ROOT = self.log_root
+
+        rand = random.Random(42)
+        self.expected = defaultdict(int)
+        for start in xrange(0, RECORDS, BATCH):
+            records = []
+            for i in xrange(BATCH):
+                proposal = rand.randint(1, PROPOSALS)
+                action = ballotlog.REMOVE if i % 10 == 0 else ballotlog.VOTE
+                records.append((proposal, start + i, action))
+                self.expected[proposal] += action
+            ballotlog.append(ballotlog.VOTING, 1, records)
+        self.path = ballotlog.get_segment_path(ballotlog.VOTING, 1)
+
+    def tearDown(self):
+        ballotlog.LOG_ROOT = self.old_log_root
+        shutil.rmtree(self.log_root)
+
+    def test_recount(self):
+        numpy = ballotlog.numpy
+        start = time.time()
+        ballotlog.numpy = None
+        try:
+            python_votes = ballotlog.recount(self.path)
+        finally:
+            ballotlog.numpy = numpy
+        python_time = time.time() - start
+
+        print
+        print '%d records, %d proposals, %.1fMB' % (
+            RECORDS, PROPOSALS, os.path.getsize(self.path) / 1048576.0)
+        print '  python recount: %8.3fs' % python_time
+
+        if numpy is not None:
+            start = time.time()
+            numpy_votes = ballotlog.recount(self.path)
+            print '  numpy recount:  %8.3fs' % (time.time() - start)
+            self.assertEqual(numpy_votes, self.expected)
+
+        self.assertEqual(python_votes, self.expected)
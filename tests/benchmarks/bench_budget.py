@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of the budget allocation of big participatory budgets: 5.000
+proposals costing between 1.000 and 500.000 (in steps of 1.000, and of
+50.000 so the knapsack table is exact), with 25% of their total cost
+available.
+
+Compares the time and the total score of the greedy methods and the
+knapsack of :mod:`apps.ecidadania.voting.budget`, with and without NumPy,
+and shows the size of the knapsack table. Benchmarks are not run with the
+unit tests, run them explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_budget
+"""
+
+import random
+import time
+
+from django.test import TestCase
+
+from apps.ecidadania.voting import budget
+from apps.ecidadania.voting.budget import Item
+
+PROPOSALS = 5000
+SHARE = 0.25
+STEPS = (1000, 50000)
+
+
+class BudgetBenchmark(TestCase):
+
+    def _rows(self, step):
+        rand = random.Random(42)
+        return [(i, rand.randint(1, 500000 // step) * step,
+                 rand.randint(0, 3000)) for i in range(PROPOSALS)]
+
+    def _solve(self, rows, total, method, use_numpy=True):
+        numpy = budget.numpy
+        if not use_numpy:
+            budget.numpy = None
+        try:
+            items = [Item(i, str(i), cost, score) for i, cost, score in rows]
+            start = time.time()
+            allocation = budget.solve(items, total, method)
+            return allocation, time.time() - start
+        finally:
+            budget.numpy = numpy
+
+    def test_budget(self):
+        print
+        print '%d proposals, table of %d cells (%d KB with numpy)' % (
+            PROPOSALS, budget.KNAPSACK_CELLS,
+            budget.KNAPSACK_CELLS / 8 / 1024)
+        runs = [(budget.VOTES, True), (budget.RATIO, True),
+                (budget.KNAPSACK, True)]
+        if budget.numpy is not None:
+            runs.append((budget.KNAPSACK, False))
+
+        for step in STEPS:
+            rows = self._rows(step)
+            total = int(sum(cost for i, cost, score in rows) * SHARE)
+            print '  costs in steps of %d, budget %d' % (step, total)
+            scores = {}
+            for method, use_numpy in runs:
+                allocation, elapsed = self._solve(rows, total, method,
+                                                  use_numpy)
+                print '    %-8s %-6s %8.3fs score %10.0f spent %d %s' % (
+                    method, 'numpy' if use_numpy else 'python', elapsed,
+                    allocation.score, allocation.spent,
+                    '' if allocation.exact else '(approximate)')
+                self.assertTrue(allocation.spent <= total)
+                scores[method, use_numpy] = allocation.score
+
+            self.assertTrue(scores[budget.KNAPSACK, True] >=
+                            scores[budget.RATIO, True])
+            self.assertTrue(scores[budget.RATIO, True] >=
+                            scores[budget.VOTES, True])
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+
+
+"""
+Benchmark of the memory needed to process an image, measured as the peak
+resident memory of a process that does only that.
+
+Compares making the avatar sizes of a photo of 6000x4000 pixels decoding it
+whole (what happened before the reduced decoding of JPEGs) with decoding it
+at the reduced size the pipeline allows, and decoding a "decompression
+bomb", a PNG of a few hundred kilobytes with 144 million pixels, with
+refusing it from its header. Only works on Linux, since it reads the peak
+memory from /proc. Benchmarks are not run with the unit tests, run them
+explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_image_memory
+"""
+
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import warnings
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from django.utils.unittest import skipUnless
+from PIL import Image
+
+from helpers.images import Pipeline, validate_image
+
+PHOTO_SIZE = (6000, 4000)
+BOMB_SIZE = (12000, 12000)
+SIZES = (480, 128, 96, 64, 48, 32, 24, 16)
+
+
+def _read_status(field):
+    with open('/proc/self/status') as status:
+        return int(re.search(r'%s:\s+(\d+)' % field, status.read()).group(1))
+
+
+def _measure(function, connection):
+    # Reset the peak to the current resident memory
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    before = _read_status('VmRSS')
+    start = time.time()
+    try:
+        result = function()
+    except Exception as e:
+        result = type(e).__name__
+    elapsed = time.time() - start
+    connection.send(((_read_status('VmHWM') - before) / 1024.0, elapsed,
+                     result))
+
+
+def measure(function):
+    """
+    Runs `function` in a new process and returns the peak memory it needed,
+    in megabytes, the time it took and what it returned.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_measure,
+                                      args=(function, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+@skipUnless(os.path.exists('/proc/self/clear_refs'), 'Needs Linux')
+class ImageMemoryBenchmark(SimpleTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        rand = random.Random(42)
+        small = Image.frombytes('RGB', (60, 40), str(bytearray(
+            rand.randint(0, 255) for j in xrange(60 * 40 * 3))))
+        self.photo = os.path.join(self.temp_dir, 'photo.jpg')
+        small.resize(PHOTO_SIZE, Image.BILINEAR).save(self.photo, 'JPEG',
+                                                       quality=90)
+        del small
+        self.bomb = os.path.join(self.temp_dir, 'bomb.png')
+        Image.new('L', BOMB_SIZE).save(self.bomb, 'PNG')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_sizes(self, pipeline):
+        for size in SIZES:
+            pipeline = pipeline.scale(size, size).save(
+                os.path.join(self.temp_dir, 'photo.%d.jpg' % size))
+        return pipeline
+
+    def _full(self):
+        image = Image.open(self.photo)
+        image.load()
+        return self._get_sizes(Pipeline()).apply(image)
+
+    def _reduced(self):
+        return self._get_sizes(Pipeline()).run(self.photo)
+
+    def _decode_bomb(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            image = Image.open(self.bomb)
+            image.load()
+        return image.size
+
+    def _check_bomb(self):
+        upload = SimpleUploadedFile('bomb.png', open(self.bomb, 'rb').read())
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            try:
+                validate_image(upload)
+            except ValidationError:
+                return 'refused'
+
+    def test_memory(self):
+        results = [(name, measure(function)) for name, function in (
+            ('photo, whole decode', self._full),
+            ('photo, reduced decode', self._reduced),
+            ('bomb, decoded', self._decode_bomb),
+            ('bomb, header check', self._check_bomb))]
+
+        print
+        print 'photo of %dx%d (%d KB), bomb of %dx%d (%d KB)' % (
+            PHOTO_SIZE + (os.path.getsize(self.photo) // 1024,) +
+            BOMB_SIZE + (os.path.getsize(self.bomb) // 1024,))
+        for name, (peak, elapsed, result) in results:
+            print '  %-24s %8.1f MB %8.3fs' % (name, peak, elapsed)
+
+        (full, reduced, decoded, checked) = [result for name, result
+                                             in results]
+        self.assertEqual(full[2], reduced[2])
+        self.assertEqual(decoded[2], BOMB_SIZE)
+        self.assertEqual(checked[2], 'refused')
+        self.assertTrue(reduced[0] < full[0])
+        self.assertTrue(checked[0] < decoded[0])
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+"""
+Benchmark of the image pipeline with 60 photos of 1600x1200 pixels, making
+the 7 avatar sizes of every one of them.
+
+Compares making every size from its own decode of the photo (what the calls
+to ImageMagick of TuxieMagick did, one process and one decode per action)
+with a single decode and a chain of scales, and that with a pool of one
+process per CPU. Benchmarks are not run with the unit tests, run them
+explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_images
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+from PIL import Image
+
+from helpers.images import Pipeline, process, process_many
+
+PHOTOS = 60
+PHOTO_SIZE = (1600, 1200)
+SIZES = (128, 96, 64, 48, 32, 24, 16)
+
+
+class ImagePipelineBenchmark(SimpleTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        rand = random.Random(42)
+        self.photos = []
+        for i in xrange(PHOTOS):
+            # Smooth colours with some grain, compressed like a photo
+            small = Image.frombytes('RGB', (40, 30), str(bytearray(
+                rand.randint(0, 255) for j in xrange(40 * 30 * 3))))
+            photo = Image.blend(
+                small.resize(PHOTO_SIZE, Image.BILINEAR),
+                Image.effect_noise(PHOTO_SIZE, 40).convert('RGB'), 0.2)
+            path = os.path.join(self.temp_dir, 'photo_%d.jpg' % i)
+            photo.save(path, 'JPEG', quality=90)
+            self.photos.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_path(self, photo, size):
+        return '%s.%d.jpg' % (os.path.splitext(photo)[0], size)
+
+    def _per_action(self):
+        for photo in self.photos:
+            for size in SIZES:
+                Pipeline().scale(size, size) \
+                    .save(self._get_path(photo, size)).run(photo)
+
+    def _get_tasks(self):
+        tasks = []
+        for photo in self.photos:
+            pipeline = Pipeline()
+            for size in SIZES:
+                pipeline = pipeline.scale(size, size) \
+                    .save(self._get_path(photo, size))
+            tasks.append((photo, [pipeline]))
+        return tasks
+
+    def _chained(self):
+        for photo, pipelines in self._get_tasks():
+            process(photo, *pipelines)
+
+    def _pool(self):
+        return process_many(self._get_tasks(), multiprocessing.cpu_count())
+
+    def _measure(self, function):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        sizes = [Image.open(self._get_path(photo, size)).size
+                 for photo in self.photos for size in SIZES]
+        for photo in self.photos:
+            for size in SIZES:
+                os.remove(self._get_path(photo, size))
+        return elapsed, sizes
+
+    def test_pipeline(self):
+        per_action, per_action_sizes = self._measure(self._per_action)
+        chained, chained_sizes = self._measure(self._chained)
+        pool, pool_sizes = self._measure(self._pool)
+
+        print
+        print '%d sizes of %d photos of %dx%d' % ((len(SIZES), PHOTOS) +
+                                                  PHOTO_SIZE)
+        for name, elapsed in (('one decode per size', per_action),
+                              ('one decode, chained', chained),
+                              ('pool of %d processes' %
+                               multiprocessing.cpu_count(), pool)):
+            print '  %-24s %8.3fs %8.1f photos/s' % (name, elapsed,
+                                                      PHOTOS / elapsed)
+
+        self.assertEqual(per_action_sizes, chained_sizes)
+        self.assertEqual(chained_sizes, pool_sizes)
+        self.assertTrue(chained < per_action)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of the list of spaces visible to a user with 10.000 spaces.
+
+Compares the old way of building the list (one permission check for every
+space in the site) with ``Space.objects.visible_to``. Benchmarks are not run
+with the unit tests, run them explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_list_spaces
+"""
+
+import time
+
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from guardian.core import ObjectPermissionChecker
+from guardian.models import UserObjectPermission
+
+from core.spaces.models import Space, SpaceMembership
+
+SPACES = 10000
+PUBLIC_EVERY = 10
+MEMBER_OF = 50
+PAGE_SIZE = 10
+
+
+class ListSpacesBenchmark(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('bench_user', 'bench@e.com',
+                                             'bench_password')
+        Space.objects.bulk_create([
+            Space(name='space_%05d' % i, url='space_%05d' % i,
+                  public=(i % PUBLIC_EVERY == 0))
+            for i in range(SPACES)])
+
+        ctype = ContentType.objects.get_for_model(Space)
+        view = Permission.objects.get(content_type=ctype,
+                                      codename='view_space')
+        private_pks = Space.objects.filter(public=False) \
+            .values_list('pk', flat=True)[:MEMBER_OF]
+        UserObjectPermission.objects.bulk_create([
+            UserObjectPermission(user=self.user, permission=view,
+                                 content_type=ctype, object_pk=str(pk))
+            for pk in private_pks])
+        # bulk_create doesn't send the signals that keep the memberships
+        SpaceMembership.objects.rebuild()
+
+    def _old_list(self, user):
+        # What ListSpaces did before: check every space of the site.
+        checker = ObjectPermissionChecker(user)
+        user_spaces = set()
+        for space in Space.objects.all():
+            if checker.has_perm('view_space', space):
+                user_spaces.add(space.pk)
+        spaces = Space.objects.filter(public=True) | \
+            Space.objects.filter(pk__in=user_spaces)
+        return list(spaces[:PAGE_SIZE]), spaces.count()
+
+    def _new_list(self, user):
+        spaces = Space.objects.visible_to(user)
+        return list(spaces[:PAGE_SIZE]), spaces.count()
+
+    def _measure(self, function):
+        user = User.objects.get(pk=self.user.pk)
+        connection.use_debug_cursor = True
+        start_queries = len(connection.queries)
+        try:
+            start = time.time()
+            result = function(user)
+            elapsed = time.time() - start
+        finally:
+            connection.use_debug_cursor = False
+        return result, elapsed, len(connection.queries) - start_queries
+
+    def test_visible_spaces(self):
+        old, old_time, old_queries = self._measure(self._old_list)
+        new, new_time, new_queries = self._measure(self._new_list)
+
+        print
+        print 'ListSpaces with %d spaces (%d visible)' % (SPACES, new[1])
+        print '  per-space checks: %8.3fs %6d queries' % (old_time,
+                                                          old_queries)
+        print '  visible_to():     %8.3fs %6d queries' % (new_time,
+                                                          new_queries)
+
+        self.assertEqual(old, new)
+        self.assertTrue(new_queries <= 2)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of the results of a big voting process: 100.000 voters, 1.000
+proposals (half of them in proposal sets), 3 votes and 2 support votes per
+voter.
+
+Compares counting ``votes.count()`` and ``support_votes.count()`` for every
+proposal with :func:`apps.ecidadania.voting.ponderation.count_results`, and
+checks that both give the same numbers. Benchmarks are not run with the unit
+tests, run them explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_ponderation
+"""
+
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal, ProposalSet
+from apps.ecidadania.voting import ponderation
+from apps.ecidadania.voting.models import Voting
+
+USERS = 100000
+PROPOSALS = 1000
+SETS = 10
+VOTES_PER_USER = 3
+SUPPORT_PER_USER = 2
+
+
+class PonderationBenchmark(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.bulk_create([User(username='voter_%06d' % i)
+                                  for i in range(USERS)])
+        space = Space(name='bench_space', url='bench_space')
+        space.save()
+        ProposalSet.objects.bulk_create([
+            ProposalSet(name='Set %d' % i, space=space) for i in range(SETS)])
+        set_pks = list(ProposalSet.objects.values_list('pk', flat=True))
+        Proposal.objects.bulk_create([
+            Proposal(title='Proposal %d' % i, description='Bench',
+                     space=space, proposalset_id=set_pks[i % SETS]
+                     if i % 2 else None) for i in range(PROPOSALS)])
+
+        self.voting = Voting(title='Bench voting', space=space,
+                             ponderation='fixed', fixed_ponderation=20)
+        self.voting.save()
+        self.voting.proposalsets.add(*set_pks)
+        self.voting.proposals.add(*Proposal.objects.filter(
+            proposalset__isnull=True))
+
+        user_pks = list(User.objects.values_list('pk', flat=True))
+        proposal_pks = list(Proposal.objects.values_list('pk', flat=True))
+        rand = random.Random(42)
+        votes, support = [], []
+        for user_pk in user_pks:
+            for proposal_pk in rand.sample(proposal_pks, VOTES_PER_USER):
+                votes.append(Proposal.votes.through(
+                    proposal_id=proposal_pk, user_id=user_pk))
+            for proposal_pk in rand.sample(proposal_pks, SUPPORT_PER_USER):
+                support.append(Proposal.support_votes.through(
+                    proposal_id=proposal_pk, user_id=user_pk))
+        Proposal.votes.through.objects.bulk_create(votes)
+        Proposal.support_votes.through.objects.bulk_create(support)
+
+    def _per_proposal(self):
+        proposals = ponderation.get_voting_proposals(self.voting)
+        return dict((p.pk, (p.votes.count(), p.support_votes.count()))
+                    for p in proposals)
+
+    def test_results(self):
+        start = time.time()
+        old = self._per_proposal()
+        old_time = time.time() - start
+
+        start = time.time()
+        results = ponderation.count_results(self.voting)
+        new_time = time.time() - start
+
+        print
+        print '%d voters, %d proposals, %d votes, %d support votes (%s)' % (
+            USERS, PROPOSALS, results.total_votes, results.total_support,
+            'numpy' if ponderation.numpy else 'python')
+        print '  count() per proposal: %8.3fs' % old_time
+        print '  count_results:        %8.3fs' % new_time
+
+        self.assertEqual(old, dict((p.pk, (p.votes, p.support))
+                                   for p in results))
+        self.assertEqual(results.total_votes,
+                         Proposal.votes.through.objects.count())
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+"""
+Benchmark of loading 10.000 spaces with a logo and a banner.
+
+Compares the old thumbnail of StdImageField, built for every image of every
+loaded object on ``post_init``, with the lazy one that is only built when it
+is used. Benchmarks are not run with the unit tests, run them explicitly from
+the src directory::
+
+    python manage.py test tests.benchmarks.bench_space_init
+"""
+
+import time
+
+from django.db.models import signals
+from django.test import SimpleTestCase
+
+from core.spaces.fields import ThumbnailField
+from core.spaces.models import Space
+
+SPACES = 10000
+ROUNDS = 3
+
+
+def _old_set_thumbnail(sender, instance=None, **kwargs):
+    # What StdImageField did before on post_init, for the logo and the banner
+    for name in ('logo', 'banner'):
+        image = getattr(instance, name)
+        if image:
+            field = instance._meta.get_field(name)
+            setattr(image, 'thumbnail', ThumbnailField(
+                field._get_thumbnail_filename(image.name), image.name))
+
+
+class SpaceInitBenchmark(SimpleTestCase):
+
+    def _load(self):
+        # The arguments are given by position, as the querysets do
+        fields = [f.attname for f in Space._meta.fields]
+        row = dict((name, None) for name in fields)
+        row.update(name='space', url='space', description='',
+                   public=True, logo='spaces/logos/logo.png',
+                   banner='spaces/banners/banner.png')
+        row = [row[name] for name in fields]
+
+        best = None
+        for i in xrange(ROUNDS):
+            start = time.time()
+            spaces = [Space(*row) for j in xrange(SPACES)]
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return spaces, best
+
+    def test_space_init(self):
+        signals.post_init.connect(_old_set_thumbnail, sender=Space)
+        try:
+            old, old_time = self._load()
+        finally:
+            signals.post_init.disconnect(_old_set_thumbnail, sender=Space)
+        new, new_time = self._load()
+
+        print
+        print 'Instantiation of %d spaces with a logo and a banner' % SPACES
+        print '  thumbnail on post_init: %8.3fs' % old_time
+        print '  lazy thumbnail:         %8.3fs' % new_time
+
+        self.assertEqual(old[0].logo.thumbnail.name,
+                         new[0].logo.thumbnail.name)
+        self.assertEqual(old[0].banner.thumbnail.url(),
+                         new[0].banner.thumbnail.url())
+        self.assertTrue(new_time < old_time)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of the support votes of a busy space: 2.000 users voting 20
+proposals, with a duplicate vote every few votes.
+
+Compares ``support_votes.add()`` after checking the vote with the single
+insert of :mod:`helpers.votes`, measuring the votes per second and checking
+that both store exactly the same votes. Benchmarks are not run with the unit
+tests, run them explicitly from the src directory::
+
+    python manage.py test tests.benchmarks.bench_votes
+"""
+
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal
+from helpers.votes import get_relation
+
+USERS = 2000
+PROPOSALS = 20
+VOTES_PER_USER = 3
+DUPLICATE_EVERY = 5
+
+
+class VotesBenchmark(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.bulk_create([User(username='voter_%05d' % i)
+                                  for i in range(USERS)])
+        space = Space(name='bench_space', url='bench_space')
+        space.save()
+        Proposal.objects.bulk_create([
+            Proposal(title='Proposal %d' % i, description='Bench',
+                     space=space) for i in range(PROPOSALS)])
+
+        user_pks = list(User.objects.values_list('pk', flat=True))
+        proposal_pks = list(Proposal.objects.values_list('pk', flat=True))
+        rand = random.Random(42)
+        self.votes = []
+        for user_pk in user_pks:
+            for proposal_pk in rand.sample(proposal_pks, VOTES_PER_USER):
+                self.votes.append((proposal_pk, user_pk))
+                if len(self.votes) % DUPLICATE_EVERY == 0:
+                    self.votes.append((proposal_pk, user_pk))
+
+    def _reset(self):
+        Proposal.support_votes.through.objects.all().delete()
+        Proposal.objects.update(support_count=0)
+        cache.clear()
+
+    def _stored_votes(self):
+        return set(Proposal.support_votes.through.objects
+                   .values_list('proposal', 'user'))
+
+    def _old_votes(self):
+        proposals = Proposal.objects.in_bulk(set(p for p, u in self.votes))
+        accepted = 0
+        for proposal_pk, user_pk in self.votes:
+            proposal = proposals[proposal_pk]
+            if not proposal.support_votes.filter(pk=user_pk).exists():
+                proposal.support_votes.add(user_pk)
+                accepted += 1
+        return accepted
+
+    def _new_votes(self):
+        proposals = Proposal.objects.in_bulk(set(p for p, u in self.votes))
+        relation = get_relation(Proposal, 'support_votes')
+        accepted = 0
+        for proposal_pk, user_pk in self.votes:
+            if relation.add(proposals[proposal_pk], user_pk):
+                accepted += 1
+        return accepted
+
+    def _measure(self, function):
+        self._reset()
+        start = time.time()
+        accepted = function()
+        elapsed = time.time() - start
+        return accepted, elapsed, self._stored_votes()
+
+    def test_votes(self):
+        old, old_time, old_stored = self._measure(self._old_votes)
+        new, new_time, new_stored = self._measure(self._new_votes)
+
+        print
+        print '%d votes (%d duplicated) on %d proposals' % (
+            len(self.votes), len(self.votes) - old, PROPOSALS)
+        print '  add() per vote: %8.3fs %8.0f votes/s' % (
+            old_time, len(self.votes) / old_time)
+        print '  single insert:  %8.3fs %8.0f votes/s' % (
+            new_time, len(self.votes) / new_time)
+
+        self.assertEqual(old, new)
+        self.assertEqual(old_stored, new_stored)
+        counts = dict(Proposal.objects.values_list('pk', 'support_count'))
+        for proposal_pk, count in counts.items():
+            self.assertEqual(count, len([1 for p, u in new_stored
+                                         if p == proposal_pk]))
@@ -17,12 +17,14 @@
 # You should have received a copy of the GNU General Public License
 # along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+import time
 
 from django.core.cache import cache
 
 from core.spaces.models import Space
 
-from src.helpers import cache as cache_helper
+from helpers import cache as cache_helper
 
 from tests.test_utils import ECDTestCase
 
@@ -61,4 +63,158 @@ class CacheHelperTest(ECDTestCase):
         actual = cache_helper.get_or_insert_object_in_cache(Space, 
                                                             space.url, url=space.url)
         self.assertEqual(expected, actual)
-        
\ No newline at end of file
+
+
+class CachedObjectTest(ECDTestCase):
+
+    """
+    Tests the invalidation and the tiers of the cached objects.
+    """
+
+    def setUp(self):
+        cache.clear()
+        cache_helper.clear_local_cache()
+
+    def testSavedObjectIsInvalidated(self):
+        """
+        Tests that saving a cached object drops it under all its lookups.
+        """
+        space = Space(url='old_url', name='cached_space')
+        space.save()
+        cached = cache_helper.get_cached_object(Space, url='old_url')
+        self.assertEqual(cached.name, 'cached_space')
+
+        space.url = 'new_url'
+        space.name = 'renamed_space'
+        space.save()
+        self.assertEqual(cache.get(
+            cache_helper._get_lookup_key(Space, 'url', 'old_url')), None)
+        cached = cache_helper.get_cached_object(Space, pk=space.pk)
+        self.assertEqual(cached.name, 'renamed_space')
+        self.assertRaises(Space.DoesNotExist, cache_helper.get_cached_object,
+                          Space, url='old_url')
+
+    def testEvictedObjectIsInvalidated(self):
+        """
+        Tests that the old url is dropped when the copy stored under the
+        primary key is not in the cache any more.
+        """
+        space = Space(url='evicted_url', name='evicted_space')
+        space.save()
+        cache_helper.get_cached_object(Space, url='evicted_url')
+        pk_key = cache_helper._get_lookup_key(Space, 'pk', space.pk)
+        cache.delete(pk_key)
+        cache_helper.local_cache.delete_many([pk_key])
+
+        space.url = 'moved_url'
+        space.save()
+        self.assertRaises(Space.DoesNotExist, cache_helper.get_cached_object,
+                          Space, url='evicted_url')
+        self.assertEqual(cache_helper.get_cached_object(
+            Space, url='moved_url').pk, space.pk)
+
+    def testInvalidateModel(self):
+        """
+        Tests that bumping the model version drops all its cached objects.
+        """
+        space = Space(url='versioned_space', name='versioned_space')
+        space.save()
+        cache_helper.get_cached_object(Space, url=space.url)
+        Space.objects.filter(pk=space.pk).update(name='updated_space')
+        cache_helper.invalidate_model(Space)
+        cached = cache_helper.get_cached_object(Space, url=space.url)
+        self.assertEqual(cached.name, 'updated_space')
+
+    def testLocalCacheIsBounded(self):
+        """
+        Tests that the local tier drops the least recently used and the
+        expired entries.
+        """
+        local = cache_helper.LocalCache(size=2, timeout=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertEqual(local.get('b'), None)
+        self.assertEqual(local.get('a'), 1)
+        self.assertEqual(len(local), 2)
+
+        local = cache_helper.LocalCache(size=2, timeout=-1)
+        local.set('a', 1)
+        self.assertEqual(local.get('a'), None)
+
+    def testCachedObjectsAreCopies(self):
+        """
+        Tests that changing a returned object doesn't change the cached one
+        and that the second lookup doesn't reach the database.
+        """
+        space = Space(url='copied_space', name='copied_space')
+        space.save()
+        first = cache_helper.get_cached_object(Space, url=space.url)
+        first.name = 'changed'
+        with self.assertNumQueries(0):
+            second = cache_helper.get_cached_object(Space, url=space.url)
+        self.assertEqual(second.name, 'copied_space')
+
+    def testConcurrentMissesFetchOnce(self):
+        """
+        Tests that concurrent misses of the same key in a process run the
+        fetch once.
+        """
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+
+        def worker():
+            results.append(cache_helper._get_or_fetch('stampede_key', fetch))
+
+        threads = [threading.Thread(target=worker) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def testLockedMissServesStaleValue(self):
+        """
+        Tests that a process missing a key that another process is fetching
+        serves the previous value if there is one, and fetches it otherwise.
+        """
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return 'fresh'
+
+        # Another process holds the lock of both keys
+        cache.add('locked_key_lock', 1)
+        cache.add('cold_key_lock', 1)
+        cache.set(cache_helper._get_stale_key('locked_key'), 'stale')
+
+        self.assertEqual(cache_helper._get_or_fetch('locked_key', fetch),
+                         'stale')
+        self.assertEqual(calls, [])
+        self.assertEqual(cache_helper._get_or_fetch('cold_key', fetch),
+                         'fresh')
+        self.assertEqual(calls, [1])
+
+    def testSavedObjectDropsStaleValue(self):
+        """
+        Tests that saving an object drops the value served while it is
+        fetched again, as well as the cached one.
+        """
+        space = Space(url='stale_space', name='stale_space')
+        space.save()
+        cache_helper.get_cached_object(Space, url=space.url)
+        key = cache_helper._get_lookup_key(Space, 'url', space.url)
+        self.assertNotEqual(cache.get(cache_helper._get_stale_key(key)), None)
+
+        space.save()
+        self.assertEqual(cache.get(cache_helper._get_stale_key(key)), None)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from django.contrib.comments.models import Comment
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal
+from helpers import counters
+
+from tests.test_utils import ECDTestCase
+
+
+class CountersTest(ECDTestCase):
+
+    """
+    Tests the denormalized support votes and comments counters.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('counter_user', 'counter_password')
+        self.other_user = self.create_user('other_user', 'other_password')
+        self.space = Space(name='counter_space', url='counter_space')
+        self.space.save()
+        self.proposal = Proposal(title='Counted', description='Counted',
+                                 space=self.space, author=self.user)
+        self.proposal.save()
+
+    def get_proposal(self):
+        return Proposal.objects.get(pk=self.proposal.pk)
+
+    def add_comment(self):
+        comment = Comment(content_object=self.proposal, site_id=1,
+                          user=self.user, comment='A comment')
+        comment.save()
+        return comment
+
+    def testSupportVotes(self):
+        """
+        Tests that the support votes counter follows the relation from both
+        of its sides.
+        """
+        self.proposal.support_votes.add(self.user, self.other_user)
+        # Adding an existing vote again doesn't count
+        self.proposal.support_votes.add(self.user)
+        self.assertEqual(self.get_proposal().support_count, 2)
+
+        self.proposal.support_votes.remove(self.user)
+        self.assertEqual(self.get_proposal().support_count, 1)
+
+        self.user.support_votes.add(self.proposal)
+        self.assertEqual(self.get_proposal().support_count, 2)
+
+        self.other_user.support_votes.clear()
+        self.assertEqual(self.get_proposal().support_count, 1)
+
+        self.proposal.support_votes.clear()
+        self.assertEqual(self.get_proposal().support_count, 0)
+
+    def testComments(self):
+        """
+        Tests that only the shown comments are counted.
+        """
+        comment = self.add_comment()
+        self.add_comment()
+        self.assertEqual(self.get_proposal().comment_count, 2)
+
+        comment.is_removed = True
+        comment.save()
+        self.assertEqual(self.get_proposal().comment_count, 1)
+
+        comment.delete()
+        self.assertEqual(self.get_proposal().comment_count, 1)
+
+    def testRebuildCounters(self):
+        """
+        Tests that the counters changed behind Django's back are fixed.
+        """
+        self.proposal.support_votes.add(self.user, self.other_user)
+        self.add_comment()
+        self.add_comment()
+        self.add_comment()
+        Proposal.objects.update(support_count=5, comment_count=0)
+
+        self.assertEqual(counters.rebuild_counters(), 2)
+        proposal = self.get_proposal()
+        self.assertEqual(proposal.support_count, 2)
+        self.assertEqual(proposal.comment_count, 3)
+        self.assertEqual(counters.rebuild_counters(), 0)
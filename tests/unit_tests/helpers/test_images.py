@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from helpers import images
+from helpers.images import Pipeline, ImageTooBig, process, process_many, \
+    get_image_size, get_compact_formats, inspect_image, validate_image
+
+from tests.test_utils import ECDTestCase
+
+
+class ImagePipelineTest(ECDTestCase):
+
+    """
+    Tests the image pipeline.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = self.path('source.png')
+        Image.new('RGB', (400, 300), (0, 0, 255)).save(self.source, 'PNG')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def testChain(self):
+        """
+        Tests that the operations are chained and the image is saved at
+        every step, without changing the source.
+        """
+        outputs = Pipeline().crop((0, 0, 200, 200)).save(self.path('crop')) \
+            .scale(64, 64).save(self.path('64.jpg'), 'JPEG') \
+            .scale(16).save(self.path('16.png')).run(self.source)
+        self.assertEqual(outputs, [(self.path('crop'), (200, 200)),
+                                   (self.path('64.jpg'), (64, 64)),
+                                   (self.path('16.png'), (16, 16))])
+        self.assertEqual(Image.open(self.path('crop')).format, 'PNG')
+        self.assertEqual(Image.open(self.path('64.jpg')).format, 'JPEG')
+        self.assertEqual(get_image_size(self.source), (400, 300))
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['16.png', '64.jpg', 'crop', 'source.png'])
+
+    def testScale(self):
+        """
+        Tests that scaling keeps the aspect ratio, never enlarges the image
+        and crops it when the size is forced.
+        """
+        base = Pipeline().convert('RGBA')
+        results = process(self.source,
+                          base.scale(100, 100).save(self.path('fit.png')),
+                          base.scale(1000).save(self.path('big.png')),
+                          base.scale(100, 100, True).save(self.path('f.png')),
+                          base.scale(200).save(self.path('width.png')))
+        self.assertEqual([saved[0][1] for saved in results],
+                         [(100, 75), (400, 300), (100, 100), (200, 150)])
+        self.assertEqual(Image.open(self.path('fit.png')).mode, 'RGBA')
+
+    def testWatermark(self):
+        """
+        Tests that the watermark is put in the corner of the image.
+        """
+        mark = self.path('mark.png')
+        Image.new('RGB', (10, 10), (255, 255, 255)).save(mark)
+        Pipeline().watermark(mark, 1.0).save(self.path('marked.png')) \
+            .run(self.source)
+        marked = Image.open(self.path('marked.png'))
+        self.assertEqual(marked.mode, 'RGB')
+        self.assertEqual(marked.getpixel((395, 295)), (255, 255, 255))
+        self.assertEqual(marked.getpixel((385, 285)), (0, 0, 255))
+
+    def testCompact(self):
+        """
+        Tests that the compact versions get the hash of their content in
+        their names.
+        """
+        outputs = Pipeline().save_compact(self.path('logo.png')) \
+            .run(self.source)
+        formats = get_compact_formats()
+        self.assertEqual(len(outputs), len(formats))
+        for (path, size), (format, extension, options) in zip(outputs,
+                                                               formats):
+            name = os.path.basename(path)
+            self.assertEqual(name.split('.')[0], 'logo')
+            self.assertEqual(len(name.split('.')[1]), 12)
+            self.assertTrue(name.endswith(extension))
+            self.assertEqual(Image.open(path).format, format)
+
+        # The same image gets the same names
+        self.assertEqual(Pipeline().save_compact(self.path('logo.png'))
+                         .run(self.source), outputs)
+
+    def testProcessMany(self):
+        """
+        Tests that a batch is processed on a pool of processes, in order,
+        and that broken images don't stop the others.
+        """
+        broken = self.path('broken.png')
+        open(broken, 'w').write('not an image')
+        tasks = [(self.source, [Pipeline().scale(size)
+                                .save(self.path('%d.png' % size))])
+                 for size in (10, 20, 30)]
+        tasks.insert(1, (broken, [Pipeline().save(self.path('x.png'))]))
+        results = process_many(tasks, processes=2)
+        self.assertEqual(results[1], None)
+        self.assertEqual([results[i][0][0][1] for i in (0, 2, 3)],
+                         [(10, 7), (20, 15), (30, 22)])
+        self.assertEqual(get_image_size(self.path('30.png')), (30, 22))
+
+    def testDraft(self):
+        """
+        Tests that JPEGs are decoded at the smallest size the pipelines
+        allow, and whole when a pipeline doesn't start scaling them down.
+        """
+        photo = self.path('photo.jpg')
+        Image.new('RGB', (1600, 1200), (0, 0, 255)).save(photo, 'JPEG')
+        size = (1600, 1200)
+        self.assertEqual(Pipeline().convert('L').scale(100)
+                         .get_draft_size(size), (100, 75))
+        self.assertEqual(Pipeline().scale(100, 100, True)
+                         .get_draft_size(size), (134, 100))
+        self.assertEqual(Pipeline().scale(3000).get_draft_size(size), size)
+        self.assertEqual(Pipeline().crop((0, 0, 10, 10)).scale(5)
+                         .get_draft_size(size), None)
+        self.assertEqual(Pipeline().save(photo).get_draft_size(size), None)
+
+        results = process(photo,
+                          Pipeline().scale(100, 100, True)
+                          .save(self.path('forced.jpg')),
+                          Pipeline().scale(300).save(self.path('300.jpg')))
+        self.assertEqual([saved[0][1] for saved in results],
+                         [(100, 100), (300, 225)])
+        self.assertEqual(Pipeline().crop((0, 0, 1600, 10))
+                         .save(self.path('strip.jpg')).run(photo),
+                         [(self.path('strip.jpg'), (1600, 10))])
+
+    def testPixelBudget(self):
+        """
+        Tests that images with more pixels than IMAGE_MAX_PIXELS are refused
+        from their header, and that the uploads are validated.
+        """
+        content = open(self.source, 'rb').read()
+        upload = SimpleUploadedFile('source.png', content)
+        upload.seek(10)
+        self.assertEqual(inspect_image(upload), ('PNG', (400, 300)))
+        self.assertEqual(upload.tell(), 10)
+        validate_image(upload)
+        self.assertRaises(ValidationError, validate_image,
+                          SimpleUploadedFile('x.png', 'not an image'))
+
+        max_pixels = images.MAX_PIXELS
+        images.MAX_PIXELS = 400 * 300 - 1
+        try:
+            self.assertRaises(ImageTooBig, inspect_image, self.source)
+            self.assertRaises(ImageTooBig, process, self.source,
+                              Pipeline().save(self.path('x.png')))
+            self.assertRaises(ValidationError, validate_image,
+                              SimpleUploadedFile('source.png', content))
+            self.assertEqual(process_many([(self.source, [Pipeline()])]),
+                             [None])
+        finally:
+            images.MAX_PIXELS = max_pixels
+        self.assertFalse(os.path.exists(self.path('x.png')))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Group, User
+from guardian.shortcuts import assign_perm, remove_perm
+
+from apps.ecidadania.proposals.models import Proposal
+from core.spaces.models import Space
+from helpers.permissions import get_permission_checker
+
+from tests.test_utils import ECDTestCase
+
+
+class PermissionCheckerTest(ECDTestCase):
+
+    """
+    Tests the batched object permission checks.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('perm_user', 'perm_password')
+        self.spaces = []
+        for i in range(5):
+            space = Space(name='perm_space_%s' % i, url='perm_space_%s' % i)
+            space.save()
+            self.spaces.append(space)
+
+    def testChecksAreBatched(self):
+        """
+        Tests that checking many prefetched objects costs the same two
+        queries.
+        """
+        assign_perm('view_space', self.user, self.spaces[0])
+        assign_perm('admin_space', self.user, self.spaces[1])
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(2):
+            get_permission_checker(user).prefetch(self.spaces)
+            allowed = [user.has_perm('view_space', space)
+                       for space in self.spaces]
+            user.has_perm('admin_space', self.spaces[1])
+            user.has_perm('mod_space', self.spaces[1])
+        self.assertEqual(allowed, [True, False, False, False, False])
+
+    def testChecksAreScopedToTheObject(self):
+        """
+        Tests that only the permissions on the checked object and its space
+        are loaded, and that every object is loaded once.
+        """
+        proposal = Proposal(title='Perm proposal', description='Scoped',
+                            space=self.spaces[0])
+        proposal.save()
+        assign_perm('view_space', self.user, self.spaces[0])
+        assign_perm('view_space', self.user, self.spaces[1])
+        assign_perm('change_proposal', self.user, proposal)
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm('change_proposal', proposal))
+            self.assertTrue(user.has_perm('view_space', self.spaces[0]))
+        checker = get_permission_checker(user)
+        self.assertEqual(sorted(perms for perms in checker._perms.values()),
+                         [set(['change_proposal']), set(['view_space'])])
+
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm('view_space', self.spaces[1]))
+            self.assertFalse(user.has_perm('mod_space', self.spaces[1]))
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm('view_space', self.spaces[0]))
+
+    def testChangesAreSeen(self):
+        """
+        Tests that assigning or removing a permission discards the loaded
+        permissions.
+        """
+        space = self.spaces[0]
+        self.assertFalse(self.user.has_perm('view_space', space))
+        assign_perm('view_space', self.user, space)
+        self.assertTrue(self.user.has_perm('view_space', space))
+        remove_perm('view_space', self.user, space)
+        self.assertFalse(self.user.has_perm('view_space', space))
+
+    def testGroupAndAnonymousPermissions(self):
+        """
+        Tests the permissions given through groups and to the anonymous user.
+        """
+        group = Group.objects.create(name='perm_group')
+        self.user.groups.add(group)
+        assign_perm('mod_space', group, self.spaces[2])
+        self.assertTrue(self.user.has_perm('mod_space', self.spaces[2]))
+
+        anonymous = User.objects.get(pk=settings.ANONYMOUS_USER_ID)
+        assign_perm('view_space', anonymous, self.spaces[3])
+        self.assertTrue(AnonymousUser().has_perm('view_space',
+                                                 self.spaces[3]))
+        self.assertFalse(AnonymousUser().has_perm('view_space',
+                                                  self.spaces[4]))
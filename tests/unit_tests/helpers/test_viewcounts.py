@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+
+from django.core.cache import cache
+
+from core.spaces import rankings
+from core.spaces.models import Space
+from apps.ecidadania.news.models import Post
+from apps.ecidadania.proposals.models import Proposal
+from helpers.viewcounts import ViewCounter, views_flushed
+from helpers import viewcounts
+
+from tests.test_utils import ECDTestCase
+
+
+class ViewCounterTest(ECDTestCase):
+
+    """
+    Tests the buffered view counters.
+    """
+
+    def setUp(self):
+        cache.clear()
+        viewcounts.flush_views()
+        self.space = Space(name='views_space', url='views_space')
+        self.space.save()
+        self.first = Post(title='First', description='First',
+                          space=self.space)
+        self.first.save()
+        self.second = Post(title='Second', description='Second',
+                           space=self.space)
+        self.second.save()
+        self.counter = ViewCounter(interval=3600, max_pending=10)
+
+    def tearDown(self):
+        self.counter.stop_timer()
+
+    def get_views(self, post):
+        return Post.objects.get(pk=post.pk).views
+
+    def testViewsAreBuffered(self):
+        """
+        Tests that the views are only written when flushed, grouped in one
+        update per number of views.
+        """
+        for i in range(3):
+            self.counter.add(Post, self.first.pk)
+        self.counter.add(Post, self.second.pk)
+        self.assertEqual(self.get_views(self.first), 0)
+        self.assertEqual(self.counter.get_pending(Post, self.first.pk), 3)
+
+        # One update per number of views, and the spaces of the posts for
+        # the rankings
+        with self.assertNumQueries(3):
+            self.counter.flush()
+        self.assertEqual(self.get_views(self.first), 3)
+        self.assertEqual(self.get_views(self.second), 1)
+        self.assertEqual(self.counter.get_pending(Post, self.first.pk), 0)
+
+    def testFlushWhenFull(self):
+        """
+        Tests that the counter flushes itself when too many objects wait.
+        """
+        counter = ViewCounter(interval=3600, max_pending=1)
+        counter.add(Post, self.first.pk)
+        self.assertEqual(self.get_views(self.first), 0)
+        counter.add(Post, self.second.pk)
+        counter.stop_timer()
+        self.assertEqual(self.get_views(self.first), 1)
+        self.assertEqual(self.get_views(self.second), 1)
+
+    def testFlushOnTimer(self):
+        """
+        Tests that the pending views are flushed once the interval is over
+        without waiting for another view, and that the next views start the
+        timer again.
+        """
+        counter = ViewCounter(interval=0.05, max_pending=10)
+        flushed = threading.Event()
+        # The timer thread can't see the test database, record the calls
+        counter.flush = flushed.set
+        counter.add(Post, self.first.pk)
+        timer = counter._timer
+        self.assertTrue(flushed.wait(5))
+
+        timer.join(5)
+        counter._since = None
+        flushed.clear()
+        counter.add(Post, self.first.pk)
+        self.assertTrue(flushed.wait(5))
+        counter.stop_timer()
+
+    def testFlushUpdatesRankings(self):
+        """
+        Tests that the most viewed ranking follows the flushed views.
+        """
+        flushed = []
+
+        def receiver(sender, counts, **kwargs):
+            flushed.append(counts)
+
+        views_flushed.connect(receiver, sender=Post)
+        try:
+            self.assertEqual(rankings.get_ranking(self.space,
+                rankings.POSTS_VIEWED)[0], self.first)
+            self.counter.add(Post, self.second.pk)
+            self.counter.flush()
+        finally:
+            views_flushed.disconnect(receiver, sender=Post)
+
+        self.assertEqual(flushed, [{self.second.pk: 1}])
+        self.assertEqual(rankings.get_ranking(self.space,
+            rankings.POSTS_VIEWED)[0], self.second)
+
+    def testFailedFlush(self):
+        """
+        Tests that a failed update doesn't raise, and that only the views
+        that were not written are flushed again.
+        """
+        proposal = Proposal(title='Viewed', description='Viewed',
+                            space=self.space,
+                            author=self.create_user('viewer', 'viewer'))
+        proposal.save()
+        self.counter.add(Post, self.first.pk, 3)
+        self.counter.add(Proposal, proposal.pk)
+        viewcounts._fields[Post] = 'missing_field'
+        try:
+            self.counter.flush()
+        finally:
+            viewcounts._fields[Post] = 'views'
+        self.assertEqual(self.get_views(self.first), 0)
+        self.assertEqual(self.counter.get_pending(Post, self.first.pk), 3)
+        # Written or pending, depending on which model went first
+        proposal_views = Proposal.objects.get(pk=proposal.pk).views
+        self.assertEqual(proposal_views +
+                         self.counter.get_pending(Proposal, proposal.pk), 1)
+
+        self.counter.flush()
+        self.assertEqual(self.get_views(self.first), 3)
+        self.assertEqual(Proposal.objects.get(pk=proposal.pk).views, 1)
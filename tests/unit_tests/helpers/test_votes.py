@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from django.core.cache import cache
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal
+from helpers.votes import add_vote
+
+from tests.test_utils import ECDTestCase
+
+
+class VoteTest(ECDTestCase):
+
+    """
+    Tests the votes written with a single insert.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('vote_user', 'vote_password')
+        self.other_user = self.create_user('other_user', 'other_password')
+        self.space = Space(name='vote_space', url='vote_space')
+        self.space.save()
+        self.proposal = Proposal(title='Voted', description='Voted',
+                                 space=self.space, author=self.user)
+        self.proposal.save()
+
+    def vote(self, user):
+        return add_vote(self.proposal, 'support_votes', user)
+
+    def get_proposal(self):
+        return Proposal.objects.get(pk=self.proposal.pk)
+
+    def testVotesAreWritten(self):
+        """
+        Tests that the votes are in the database as soon as they are cast,
+        and counted.
+        """
+        self.assertTrue(self.vote(self.user))
+        self.assertTrue(self.vote(self.other_user))
+        self.assertEqual(set(self.proposal.support_votes.all()),
+                         set([self.user, self.other_user]))
+        self.assertEqual(self.get_proposal().support_count, 2)
+
+    def testDuplicatesAreRejected(self):
+        """
+        Tests that a second vote is rejected by the database, also when the
+        first one was added by other means, and that it isn't counted.
+        """
+        self.assertTrue(self.vote(self.user))
+        self.assertFalse(self.vote(self.user))
+        self.proposal.support_votes.add(self.other_user)
+        self.assertFalse(self.vote(self.other_user))
+        self.assertEqual(self.proposal.support_votes.count(), 2)
+        self.assertEqual(self.get_proposal().support_count, 2)
+
+    def testRemovedVoteCanBeCastAgain(self):
+        """
+        Tests that removing a vote releases it.
+        """
+        self.vote(self.user)
+        self.proposal.support_votes.remove(self.user)
+        self.assertTrue(self.vote(self.user))
+        self.assertEqual(self.get_proposal().support_count, 1)
@@ -20,6 +20,10 @@
 from src.core.spaces.models import Space
 from src.apps.ecidadania.proposals.models import Proposal, ProposalSet
 
+from django.core.signals import request_started
+from django.db import connection, reset_queries
+from guardian.shortcuts import assign_perm
+
 from tests.test_utils import ECDTestCase
 
 
@@ -108,4 +112,67 @@ class ListProposalSetViewsTest(ECDTestCase):
         self.assertResponseOK(response)
         self.assertEqual(len(response.context[0].dicts[0]['setlist']), 
                          len(other_proposalsets_list))
-        
+
+
+class ViewProposalTest(ECDTestCase):
+    """
+        Tests the proposal detail view.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('detail_user', 'detail_password')
+        self.space = Space(name='detail_space', url='detail_space')
+        self.space.save()
+        assign_perm('view_space', self.user, self.space)
+        self.proposal = Proposal(title='Detail', description='Detail',
+                                 space=self.space, author=self.user)
+        self.proposal.save()
+        self.url = self.getURL('view-proposal',
+                               kwargs={'space_url': self.space.url,
+                                       'prop_id': self.proposal.id})
+        self.client.login(username='detail_user', password='detail_password')
+
+    def count_queries(self, url):
+        # The queries log is emptied when a request starts
+        request_started.disconnect(reset_queries)
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            response = self.client.get(url)
+            self.assertResponseOK(response)
+            return len(connection.queries) - start
+        finally:
+            connection.use_debug_cursor = None
+            request_started.connect(reset_queries)
+
+    def testQueriesDontDependOnSpaceSize(self):
+        """
+            Tests that the proposal detail runs the same queries no matter
+            how many proposals and votes the space has.
+        """
+        self.count_queries(self.url)
+        queries = self.count_queries(self.url)
+
+        for i in range(20):
+            proposal = Proposal(title='Other %s' % i, description='Other',
+                                space=self.space, author=self.user)
+            proposal.save()
+            proposal.support_votes.add(self.user)
+        self.proposal.support_votes.add(self.user)
+
+        self.assertEqual(self.count_queries(self.url), queries)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['support_votes_count'], 1)
+        self.assertTrue(response.context['has_supported'])
+
+    def testProposalOfOtherSpace(self):
+        """
+            Tests that a proposal can't be shown from another space.
+        """
+        other_space = Space(name='other_detail', url='other_detail')
+        other_space.save()
+        assign_perm('view_space', self.user, other_space)
+        url = self.getURL('view-proposal',
+                          kwargs={'space_url': other_space.url,
+                                  'prop_id': self.proposal.id})
+        self.assertEqual(self.client.get(url).status_code, 404)
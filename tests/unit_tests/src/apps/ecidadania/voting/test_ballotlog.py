@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import datetime
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal, ProposalSet
+from apps.ecidadania.voting import ballotlog
+from apps.ecidadania.voting.models import Voting, Poll, Choice
+
+from tests.test_utils import ECDTestCase
+
+
+class BallotLogTest(ECDTestCase):
+
+    """
+    Tests the append-only log of the votes and the recount.
+    """
+
+    def setUp(self):
+        self.log_root = tempfile.mkdtemp()
+        self.old_log_root = ballotlog.LOG_ROOT
+        ballotlog.LOG_ROOT = self.log_root
+
+        self.users = [self.create_user('voter_%d' % i, 'voter_password')
+                      for i in range(3)]
+        self.space = Space(name='log_space', url='log_space')
+        self.space.save()
+        proposalset = ProposalSet(name='Set', space=self.space)
+        proposalset.save()
+        self.first = Proposal(title='First', description='First',
+                              space=self.space)
+        self.first.save()
+        self.second = Proposal(title='Second', description='Second',
+                               space=self.space, proposalset=proposalset)
+        self.second.save()
+        self.voting = Voting(title='Voting', space=self.space)
+        self.voting.save()
+        self.voting.proposals.add(self.first)
+        self.voting.proposalsets.add(proposalset)
+
+    def tearDown(self):
+        ballotlog.LOG_ROOT = self.old_log_root
+        shutil.rmtree(self.log_root)
+
+    def get_path(self):
+        return ballotlog.get_segment_path(ballotlog.VOTING, self.voting.pk)
+
+    def testLogVotes(self):
+        """
+        Tests that added and removed votes are written, from both sides of
+        the relation, and that the recount matches the database.
+        """
+        self.first.votes.add(*self.users)
+        self.users[0].voting_votes.add(self.second)
+        self.first.votes.remove(self.users[1], self.users[1])
+        self.users[2].voting_votes.clear()
+        # Removing a vote that doesn't exist writes nothing
+        self.second.votes.remove(self.users[2])
+
+        actions = [(object_id, user_id, action) for when, object_id, user_id,
+                   action in ballotlog.iter_records(self.get_path())]
+        first, second = self.first.pk, self.second.pk
+        self.assertEqual(actions[:4], [(first, self.users[0].pk, 1),
+                                       (first, self.users[1].pk, 1),
+                                       (first, self.users[2].pk, 1),
+                                       (second, self.users[0].pk, 1)])
+        self.assertEqual(actions[4:], [(first, self.users[1].pk, -1),
+                                       (first, self.users[2].pk, -1)])
+        self.assertEqual(dict(ballotlog.recount(self.get_path())),
+                         {first: 1, second: 1})
+        self.assertEqual(ballotlog.verify(ballotlog.VOTING, self.voting.pk),
+                         {})
+
+    def testTornRecord(self):
+        """
+        Tests that a record cut at the end of the segment is ignored, and
+        that the recount is the same without NumPy.
+        """
+        self.first.votes.add(*self.users)
+        with open(self.get_path(), 'ab') as segment:
+            segment.write(ballotlog.RECORD.pack(0, self.first.pk, 1, 1)[:7])
+
+        votes = dict(ballotlog.recount(self.get_path()))
+        numpy = ballotlog.numpy
+        ballotlog.numpy = None
+        try:
+            self.assertEqual(dict(ballotlog.recount(self.get_path())), votes)
+        finally:
+            ballotlog.numpy = numpy
+        self.assertEqual(votes, {self.first.pk: 3})
+
+    def testPollVotes(self):
+        """
+        Tests that the poll votes are written to the segment of the poll.
+        """
+        today = datetime.date.today()
+        poll = Poll(question='?', space=self.space, start_date=today,
+                    end_date=today)
+        poll.save()
+        choice = Choice(poll=poll, choice_text='Yes')
+        choice.save()
+        choice.votes.add(self.users[0])
+        self.users[1].choice_set.add(choice)
+        self.assertEqual(dict(ballotlog.recount(ballotlog.get_segment_path(
+            ballotlog.POLL, poll.pk))), {choice.pk: 2})
+
+    def testVerifyCommand(self):
+        """
+        Tests that the command finds the votes changed behind the log.
+        """
+        self.first.votes.add(*self.users)
+        call_command('recount_votes', verify=True, stdout=StringIO())
+
+        Proposal.votes.through.objects.filter(user=self.users[0]).delete()
+        output = StringIO()
+        self.assertRaises(CommandError, call_command, 'recount_votes',
+                          voting=[self.voting.pk], verify=True,
+                          stdout=output)
+        self.assertIn('%d: 3 in the log, 2 in the database' % self.first.pk,
+                      output.getvalue())
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from django.core import mail
+from django.core.cache import cache
+from guardian.shortcuts import assign_perm
+
+from core.jobs import runner
+from core.mailqueue import mail as mailqueue
+from core.mailqueue.mail import send_queued
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal, ProposalSet
+from apps.ecidadania.voting.models import Voting, BallotCounter, ConfirmVote
+
+from tests.test_utils import ECDTestCase
+
+
+class BallotCounterTest(ECDTestCase):
+
+    """
+    Tests the enforcement of the maximum votes per user of a voting.
+    """
+
+    def setUp(self):
+        self.enabled = runner.ENABLED, mailqueue.ENABLED
+        runner.ENABLED = mailqueue.ENABLED = True
+        cache.clear()
+        self.user = self.create_user('ballot_user', 'ballot_password')
+        self.space = Space(name='ballot_space', url='ballot_space')
+        self.space.save()
+        self.voting = Voting(title='Voting', space=self.space, max_votes=2)
+        self.voting.save()
+        self.proposalset = ProposalSet(name='Set', space=self.space)
+        self.proposalset.save()
+        self.proposals = []
+        for i in range(3):
+            proposal = Proposal(title='Proposal %d' % i, description='Vote',
+                                space=self.space,
+                                proposalset=self.proposalset if i else None)
+            proposal.save()
+            self.proposals.append(proposal)
+        self.voting.proposals.add(self.proposals[0])
+        self.voting.proposalsets.add(self.proposalset)
+
+    def tearDown(self):
+        runner.ENABLED, mailqueue.ENABLED = self.enabled
+
+    def testClaim(self):
+        """
+        Tests that no more than max_votes votes can be taken, with one query
+        each once the counter exists.
+        """
+        counters = BallotCounter.objects
+        self.assertEqual(counters.votes_left(self.voting, self.user), 2)
+        self.assertTrue(counters.claim(self.voting, self.user))
+        with self.assertNumQueries(1):
+            self.assertTrue(counters.claim(self.voting, self.user))
+        self.assertFalse(counters.claim(self.voting, self.user))
+        self.assertEqual(counters.votes_left(self.voting, self.user), 0)
+
+        counters.release(self.voting, self.user)
+        self.assertEqual(counters.votes_left(self.voting, self.user), 1)
+
+    def testNoMaximum(self):
+        """
+        Tests that votings without a maximum take every vote but count them.
+        """
+        self.voting.max_votes = None
+        for i in range(5):
+            self.assertTrue(BallotCounter.objects.claim(self.voting,
+                                                        self.user))
+        self.assertEqual(BallotCounter.objects.get().votes, 5)
+        self.assertEqual(BallotCounter.objects.votes_left(self.voting,
+                                                          self.user), None)
+
+    def testRebuild(self):
+        """
+        Tests that the counters can be built again from the votes.
+        """
+        for proposal in self.proposals:
+            proposal.votes.add(self.user)
+        BallotCounter.objects.rebuild()
+        self.assertEqual(BallotCounter.objects.get(user=self.user).votes, 3)
+
+    def testValidateVotes(self):
+        """
+        Tests that the vote validation stops at the maximum votes and that
+        no email is sent once there are none left.
+        """
+        assign_perm('view_space', self.user, self.space)
+        self.login('ballot_user', 'ballot_password')
+        base = '/spaces/ballot_space/voting/vote/'
+
+        for proposal in self.proposals:
+            response = self.client.post(base + 'voting/', {
+                'propid': proposal.pk, 'voting': self.voting.pk})
+            self.assertEqual(response.status_code, 200)
+        send_queued()
+        self.assertEqual(len(mail.outbox), 3)
+
+        statuses = []
+        for vote in ConfirmVote.objects.order_by('pk'):
+            response = self.client.get(base + 'validate/%s/' % vote.token)
+            statuses.append(response.status_code)
+        self.assertEqual(statuses, [200, 200, 400])
+        self.assertEqual(sum(p.votes.count() for p in self.proposals), 2)
+
+        response = self.client.post(base + 'voting/', {
+            'propid': self.proposals[2].pk, 'voting': self.voting.pk})
+        self.assertEqual(response.status_code, 400)
+        send_queued()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def testValidateTwice(self):
+        """
+        Tests that validating a second vote on the same proposal gives back
+        the vote it took.
+        """
+        assign_perm('view_space', self.user, self.space)
+        self.login('ballot_user', 'ballot_password')
+        base = '/spaces/ballot_space/voting/vote/validate/'
+        for token in ('first_token', 'second_token'):
+            ConfirmVote(user=self.user, proposal=self.proposals[0],
+                        voting=self.voting, token=token).save()
+
+        response = self.client.get(base + 'first_token/')
+        self.assertEqual(response.content, 'Your vote has been validated.')
+        response = self.client.get(base + 'second_token/')
+        self.assertTrue(response.content.startswith('Error V01'))
+        self.assertEqual(self.proposals[0].votes.count(), 1)
+        self.assertEqual(BallotCounter.objects.votes_left(self.voting,
+                                                          self.user), 1)
+
+    def testVotingCanNotBeChosen(self):
+        """
+        Tests that the limit of every voting with the proposal is enforced,
+        whatever voting the request names.
+        """
+        assign_perm('view_space', self.user, self.space)
+        self.login('ballot_user', 'ballot_password')
+        base = '/spaces/ballot_space/voting/vote/'
+        other = Voting(title='Other', space=self.space)
+        other.save()
+        unlimited = Voting(title='Unlimited', space=self.space)
+        unlimited.save()
+        unlimited.proposals.add(self.proposals[0])
+        for i in range(2):
+            BallotCounter.objects.claim(self.voting, self.user)
+
+        for voting in (other, unlimited):
+            response = self.client.post(base + 'voting/', {
+                'propid': self.proposals[0].pk, 'voting': voting.pk})
+            self.assertEqual(response.status_code, 400)
+
+        for voting in (other, unlimited):
+            ConfirmVote(user=self.user, proposal=self.proposals[0],
+                        voting=voting, token='token_%s' % voting.pk).save()
+            response = self.client.get(base + 'validate/token_%s/' %
+                                       voting.pk)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.proposals[0].votes.count(), 0)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import random
+
+from django.core.cache import cache
+from guardian.shortcuts import assign_perm
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal
+from apps.ecidadania.voting import budget
+from apps.ecidadania.voting.budget import Item
+from apps.ecidadania.voting.models import Voting
+
+from tests.test_utils import ECDTestCase
+
+
+class BudgetTest(ECDTestCase):
+
+    """
+    Tests the allocation of the budget of a voting.
+    """
+
+    def get_items(self):
+        return [Item(1, 'Big', 6, 10), Item(2, 'Small', 5, 7),
+                Item(3, 'Other small', 5, 7), Item(4, 'No budget', None, 50),
+                Item(5, 'No votes', 1, 0)]
+
+    def funded(self, allocation):
+        return sorted(item.pk for item in allocation.funded)
+
+    def testMethods(self):
+        """
+        Tests that the knapsack finds the best combination where the greedy
+        methods don't.
+        """
+        by_votes = budget.solve(self.get_items(), 10, budget.VOTES)
+        by_ratio = budget.solve(self.get_items(), 10, budget.RATIO)
+        knapsack = budget.solve(self.get_items(), 10, budget.KNAPSACK)
+        self.assertEqual(self.funded(by_votes), [1])
+        self.assertEqual(self.funded(by_ratio), [1])
+        self.assertEqual(self.funded(knapsack), [2, 3])
+        self.assertEqual((knapsack.spent, knapsack.score), (10, 14))
+        self.assertTrue(knapsack.exact)
+
+    def testExplanations(self):
+        """
+        Tests that every proposal says why it was funded or not.
+        """
+        allocation = budget.solve(self.get_items(), 10, budget.VOTES)
+        reasons = dict((item.pk, item.reason) for item in allocation)
+        self.assertTrue(reasons[1].startswith('Funded'))
+        self.assertIn('only 4 were left', reasons[2])
+        self.assertIn('no budget', reasons[4])
+        self.assertIn('no votes', reasons[5])
+
+    def testApproximateKnapsack(self):
+        """
+        Tests that a knapsack too big for the table still fits the budget,
+        and that it is as good as the exact one without NumPy.
+        """
+        rand = random.Random(3)
+        items = lambda: [Item(i, str(i), rand.randint(1, 5000),
+                              rand.randint(1, 100)) for i in range(50)]
+        cells = budget.KNAPSACK_CELLS
+        budget.KNAPSACK_CELLS = 50 * 100
+        try:
+            approximate = budget.solve(items(), 60001)
+        finally:
+            budget.KNAPSACK_CELLS = cells
+        self.assertFalse(approximate.exact)
+        self.assertTrue(approximate.spent <= 60001)
+
+        rand.seed(3)
+        exact = budget.solve(items(), 60001)
+        rand.seed(3)
+        numpy = budget.numpy
+        budget.numpy = None
+        try:
+            python = budget.solve(items(), 60001)
+        finally:
+            budget.numpy = numpy
+        self.assertTrue(exact.exact)
+        self.assertEqual(self.funded(python), self.funded(exact))
+        self.assertTrue(approximate.score >= exact.score * 0.9)
+
+    def testAllocateVoting(self):
+        """
+        Tests the allocation of the budget of a voting from its results.
+        """
+        cache.clear()
+        user = self.create_user('budget_user', 'budget_password')
+        other_user = self.create_user('other_user', 'other_password')
+        space = Space(name='budget_space', url='budget_space')
+        space.save()
+        voting = Voting(title='Budget', space=space, budget=100,
+                        ponderation='users')
+        voting.save()
+        cheap = Proposal(title='Cheap', description='Cheap', space=space,
+                         budget=40)
+        cheap.save()
+        expensive = Proposal(title='Expensive', description='Expensive',
+                             space=space, budget=80)
+        expensive.save()
+        voting.proposals.add(cheap, expensive)
+        cheap.votes.add(user)
+        expensive.votes.add(user, other_user)
+        cheap.support_votes.add(user, other_user)
+
+        self.assertEqual(self.funded(budget.allocate(voting)), [cheap.pk])
+        self.assertEqual(self.funded(budget.allocate(voting, weighted=False)),
+                         [expensive.pk])
+
+        assign_perm('view_space', user, space)
+        self.login('budget_user', 'budget_password')
+        response = self.client.get('/spaces/budget_space/voting/%d/results/'
+                                   % voting.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['allocation'].spent, 40)
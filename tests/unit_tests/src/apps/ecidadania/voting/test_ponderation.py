@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from django.core.cache import cache
+from guardian.shortcuts import assign_perm
+
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal, ProposalSet
+from apps.ecidadania.voting import ponderation
+from apps.ecidadania.voting.models import Voting
+
+from tests.test_utils import ECDTestCase
+
+
+class PonderationTest(ECDTestCase):
+
+    """
+    Tests the weighted results of the voting processes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.users = [self.create_user('voter_%d' % i, 'voter_password')
+                      for i in range(4)]
+        self.space = Space(name='voting_space', url='voting_space')
+        self.space.save()
+        self.proposalset = ProposalSet(name='Set', space=self.space)
+        self.proposalset.save()
+        self.first = Proposal(title='First', description='First',
+                              space=self.space)
+        self.first.save()
+        self.second = Proposal(title='Second', description='Second',
+                               space=self.space,
+                               proposalset=self.proposalset)
+        self.second.save()
+        # Not part of the voting
+        self.other = Proposal(title='Other', description='Other',
+                              space=self.space)
+        self.other.save()
+        self.voting = Voting(title='Voting', space=self.space)
+        self.voting.save()
+        self.voting.proposals.add(self.first)
+        self.voting.proposalsets.add(self.proposalset)
+
+        # First: 3 votes and no support, second: 2 votes and 3 supports
+        self.first.votes.add(*self.users[:3])
+        self.second.votes.add(*self.users[:2])
+        self.second.support_votes.add(*self.users[:3])
+        self.other.votes.add(*self.users)
+        self.other.support_votes.add(*self.users)
+
+    def get_scores(self, ponderation_type, fixed=None):
+        self.voting.ponderation = ponderation_type
+        self.voting.fixed_ponderation = fixed
+        results = ponderation.count_results(self.voting)
+        return [(p.title, p.votes, p.support, p.score) for p in results]
+
+    def testNoPonderation(self):
+        """
+        Tests that only the votes of the proposals of the voting count, and
+        that they are loaded with three queries.
+        """
+        self.voting.ponderation = 'none'
+        with self.assertNumQueries(3):
+            results = ponderation.count_results(self.voting)
+        self.assertEqual([(p.title, p.score) for p in results],
+                         [('First', 3), ('Second', 2)])
+        self.assertEqual(results.total_votes, 5)
+        self.assertEqual(results.total_support, 3)
+
+    def testUsersPonderation(self):
+        """
+        Tests that the support votes are added to the votes.
+        """
+        self.assertEqual(self.get_scores('users'),
+                         [('Second', 2, 3, 5), ('First', 3, 0, 3)])
+
+    def testFixedPonderation(self):
+        """
+        Tests that the fixed percentage of the votes is shared by support.
+        """
+        # 40% of 5 votes, all for the second proposal
+        self.assertEqual(self.get_scores('fixed', 40),
+                         [('Second', 2, 3, 4), ('First', 3, 0, 3)])
+        self.assertEqual(self.get_scores('fixed', 0),
+                         [('First', 3, 0, 3), ('Second', 2, 3, 2)])
+
+    def testPythonFallback(self):
+        """
+        Tests that the results are the same without NumPy.
+        """
+        args = ([3, 1, 2], [1, 2, 2, 3, 9], [2, 2, 3, 3], 'fixed', 50)
+        numpy = ponderation.numpy
+        ponderation.numpy = None
+        try:
+            without = ponderation.weigh(*args)
+        finally:
+            ponderation.numpy = numpy
+        self.assertEqual(without, ([1, 1, 2], [2, 0, 2], [2, 1, 3]))
+        self.assertEqual(ponderation.weigh(*args), without)
+
+    def testResultsView(self):
+        """
+        Tests the results page of the voting.
+        """
+        self.voting.ponderation = 'users'
+        self.voting.save()
+        self.login('voter_0', 'voter_password')
+        assign_perm('view_space', self.users[0], self.space)
+        response = self.client.get('/spaces/voting_space/voting/%d/results/'
+                                   % self.voting.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.title for p in response.context['results']],
+                         ['Second', 'First'])
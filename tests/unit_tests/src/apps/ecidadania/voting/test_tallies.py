@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import datetime
+import json
+
+from django.core.cache import cache
+
+from core.spaces.models import Space
+from apps.ecidadania.voting import tallies
+from apps.ecidadania.voting.models import Poll, Choice, PollSnapshot
+
+from tests.test_utils import ECDTestCase
+
+
+class TallyTest(ECDTestCase):
+
+    """
+    Tests the poll results.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('poll_user', 'poll_password')
+        self.other_user = self.create_user('other_user', 'other_password')
+        self.space = Space(name='poll_space', url='poll_space')
+        self.space.save()
+        today = datetime.date.today()
+        self.poll = Poll(question='Yes or no?', space=self.space,
+                         start_date=today, end_date=today)
+        self.poll.save()
+        self.yes = Choice(poll=self.poll, choice_text='Yes')
+        self.yes.save()
+        self.no = Choice(poll=self.poll, choice_text='No')
+        self.no.save()
+
+    def get_votes(self, tally):
+        return [(choice.choice_text, choice.votes) for choice in tally]
+
+    def testCountVotes(self):
+        """
+        Tests that all the choices are counted with one query.
+        """
+        self.yes.votes.add(self.user, self.other_user)
+        self.no.votes.add(self.user)
+        with self.assertNumQueries(1):
+            tally = tallies.count_votes(self.poll)
+        self.assertEqual(self.get_votes(tally), [('Yes', 2), ('No', 1)])
+        self.assertEqual(tally.total, 3)
+
+    def testLiveTally(self):
+        """
+        Tests that the cached tally of an open poll follows the votes without
+        counting them again.
+        """
+        self.yes.votes.add(self.user)
+        tallies.get_tally(self.poll)
+
+        self.no.votes.add(self.user)
+        self.other_user.choice_set.add(self.no)
+        with self.assertNumQueries(0):
+            tally = tallies.get_tally(self.poll)
+        self.assertEqual(self.get_votes(tally), [('Yes', 1), ('No', 2)])
+
+        self.no.votes.remove(self.user)
+        tally = tallies.get_tally(self.poll)
+        self.assertEqual(self.get_votes(tally), [('Yes', 1), ('No', 1)])
+
+    def testConcurrentCount(self):
+        """
+        Tests that a count stored by another request in the meantime, and
+        the votes added to it since, are not replaced by an older count.
+        """
+        count_votes = tallies.count_votes
+
+        def racing_count_votes(poll):
+            tally = count_votes(poll)
+            tallies.count_votes = count_votes
+            tallies.get_tally(poll)
+            self.yes.votes.add(self.other_user)
+            return tally
+
+        self.yes.votes.add(self.user)
+        tallies.count_votes = racing_count_votes
+        try:
+            tally = tallies.get_tally(self.poll)
+        finally:
+            tallies.count_votes = count_votes
+        self.assertEqual(self.get_votes(tally), [('Yes', 2), ('No', 0)])
+        self.assertEqual(tally.total, 2)
+        with self.assertNumQueries(0):
+            tally = tallies.get_tally(self.poll)
+        self.assertEqual(self.get_votes(tally), [('Yes', 2), ('No', 0)])
+
+    def testVoteWhileCounting(self):
+        """
+        Tests that a vote cast before the count is stored is not lost.
+        """
+        count_votes = tallies.count_votes
+
+        def racing_count_votes(poll):
+            tally = count_votes(poll)
+            self.yes.votes.add(self.other_user)
+            return tally
+
+        self.yes.votes.add(self.user)
+        tallies.count_votes = racing_count_votes
+        try:
+            tallies.get_tally(self.poll)
+        finally:
+            tallies.count_votes = count_votes
+        self.assertEqual(self.get_votes(tallies.get_tally(self.poll)),
+                         [('Yes', 2), ('No', 0)])
+
+    def testSnapshot(self):
+        """
+        Tests that the results of an ended poll are stored and don't change.
+        """
+        self.yes.votes.add(self.user)
+        self.poll.end_date = datetime.date.today() - datetime.timedelta(1)
+        self.poll.save()
+
+        tally = tallies.get_tally(self.poll)
+        self.assertTrue(tally.final)
+        self.assertEqual(PollSnapshot.objects.filter(poll=self.poll).count(),
+                         1)
+
+        self.no.votes.add(self.user)
+        self.assertEqual(self.get_votes(tallies.get_tally(self.poll)),
+                         [('Yes', 1), ('No', 0)])
+
+    def testConcurrentSnapshot(self):
+        """
+        Tests that a snapshot taken by another request in the meantime is
+        returned instead of failing.
+        """
+        count_votes = tallies.count_votes
+
+        def racing_count_votes(poll):
+            tally = count_votes(poll)
+            PollSnapshot(poll=poll, total=5, results=json.dumps(
+                [(self.yes.pk, 'Yes', 5), (self.no.pk, 'No', 0)])).save()
+            return tally
+
+        tallies.count_votes = racing_count_votes
+        try:
+            tally = tallies.take_snapshot(self.poll)
+        finally:
+            tallies.count_votes = count_votes
+        self.assertEqual(self.get_votes(tally), [('Yes', 5), ('No', 0)])
+        self.assertEqual(PollSnapshot.objects.filter(poll=self.poll).count(),
+                         1)
@@ -0,0 +1,151 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+from StringIO import StringIO
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+
+from apps.thirdparty.userprofile import manifest
+from apps.thirdparty.userprofile.jobs import get_size_path, make_sizes
+from apps.thirdparty.userprofile.models import Avatar, AVATAR_SIZES
+from core.jobs import runner
+from core.jobs.models import Job
+
+from tests.test_utils import ECDTestCase
+
+
+class AvatarManifestTest(ECDTestCase):
+
+    """
+    Tests the cached manifest of the avatars.
+    """
+
+    def setUp(self):
+        self.enabled = runner.ENABLED
+        runner.ENABLED = True
+        cache.clear()
+        self.user = User.objects.create_user('manifest_user', 'm@e.com',
+                                             'password')
+        self.paths = []
+
+    def tearDown(self):
+        runner.ENABLED = self.enabled
+        for path in self.paths:
+            for size_path in [path] + [get_size_path(path, size)
+                                       for size in AVATAR_SIZES]:
+                if os.path.exists(size_path):
+                    os.remove(size_path)
+        cache.clear()
+
+    def make_avatar(self):
+        data = StringIO()
+        image = Image.new('RGB', (200, 200), (10, 200, 10))
+        image.save(data, 'JPEG')
+        avatar = Avatar(user=self.user, valid=True)
+        avatar.image.save('manifest_user.jpg',
+                          SimpleUploadedFile('a.jpg', data.getvalue()),
+                          save=False)
+        self.paths.append(avatar.image.path)
+        make_sizes(image, avatar.image.path)
+        avatar.save()
+        return avatar
+
+    def testDefault(self):
+        """
+        Tests that the users without avatar get the default one, and that
+        its sizes are served from the static files without making any.
+        """
+        urls = manifest.get_manifest(self.user)
+        self.assertEqual(sorted(urls), sorted(AVATAR_SIZES))
+        self.assertTrue(all(url.startswith(settings.STATIC_URL)
+                            for url in urls.values()))
+        self.assertEqual(urls[96], settings.STATIC_URL + 'generic.96.jpg')
+        # There's no static file of this size
+        self.assertEqual(urls[128], settings.STATIC_URL + 'generic.jpg')
+        self.assertEqual(Job.objects.count(), 0)
+        self.assertEqual(manifest.get_manifest(None), urls)
+
+    def testCachedManifest(self):
+        """
+        Tests that the manifest gives every size of the avatar without
+        going to the database or the disk once it is cached.
+        """
+        avatar = self.make_avatar()
+        base, extension = os.path.splitext(avatar.image.url)
+        with self.assertNumQueries(1):
+            urls = manifest.get_manifest(self.user)
+        self.assertEqual(urls[96], '%s.96%s' % (base, extension))
+        self.assertEqual(Job.objects.count(), 0)
+
+        os.remove(get_size_path(avatar.image.path, 96))
+        with self.assertNumQueries(0):
+            self.assertEqual(manifest.get_avatar_url(self.user.pk, 96),
+                             urls[96])
+            rendered = Template('{% load avatars %}{% avatar 96 user %}') \
+                .render(Context({'user': self.user}))
+        self.assertEqual(rendered, urls[96])
+
+    def testInvalidation(self):
+        """
+        Tests that changing the avatar drops the manifest.
+        """
+        default = manifest.get_avatar_url(self.user, 32)
+        avatar = self.make_avatar()
+        self.assertNotEqual(manifest.get_avatar_url(self.user, 32), default)
+        avatar.delete()
+        self.assertEqual(manifest.get_avatar_url(self.user, 32), default)
+
+    def testBulk(self):
+        """
+        Tests that the avatars of a list of users are read with one query,
+        and that the avatar tag uses them afterwards.
+        """
+        avatar = self.make_avatar()
+        others = [User.objects.create_user('manifest_%d' % i,
+                                           'm%d@e.com' % i, 'password')
+                  for i in range(3)]
+        users = [self.user] + others
+        with self.assertNumQueries(1):
+            urls = manifest.get_avatar_urls(users, 48)
+        self.assertEqual(urls, dict(
+            [(self.user.pk, manifest.get_avatar_url(avatar.user, 48))] +
+            [(user.pk, manifest.get_avatar_url(None, 48))
+             for user in others]))
+        with self.assertNumQueries(0):
+            manifest.get_manifests([user.pk for user in users])
+
+        cache.clear()
+        template = Template('{% load avatars %}'
+                            '{% avatars users 48 as user_avatars %}'
+                            '{% for u, url in user_avatars %}{{ url }} '
+                            '{% endfor %}|{% for u in users %}'
+                            '{% avatar 48 u %} {% endfor %}')
+        with self.assertNumQueries(1):
+            listed, tagged = template.render(Context({'users': users})) \
+                .split('|')
+        self.assertEqual(listed, tagged)
+        self.assertEqual(listed.split(), [urls[user.pk] for user in users])
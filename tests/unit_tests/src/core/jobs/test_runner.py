@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core import mail
+
+from core.jobs import runner
+from core.jobs.models import Job, QUEUED, RUNNING, DONE, FAILED, HIGH, LOW
+from core.jobs.url_names import JOB_STATUS
+from core.mailqueue import mail as mailqueue
+from core.mailqueue.mail import send_mail
+
+from tests.test_utils import ECDTestCase
+
+calls = []
+
+
+@runner.register('tests.record')
+def record(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+@runner.register('tests.unique', unique=True)
+def unique(value):
+    calls.append(value)
+
+
+@runner.register('tests.fail', max_attempts=3)
+def fail():
+    raise ValueError('Broken job')
+
+
+class JobRunnerTest(ECDTestCase):
+
+    """
+    Tests the background job queue.
+    """
+
+    def setUp(self):
+        del calls[:]
+        self.enabled = runner.ENABLED, mailqueue.ENABLED
+        runner.ENABLED = mailqueue.ENABLED = True
+
+    def tearDown(self):
+        runner.ENABLED, mailqueue.ENABLED = self.enabled
+
+    def testRun(self):
+        """
+        Tests that the jobs only run in the worker, highest priority first,
+        with their arguments.
+        """
+        runner.enqueue('tests.record', ('low',), priority=LOW)
+        record.delay('normal', 2, option={'key': [1, 2]})
+        runner.enqueue('tests.record', ('high',), priority=HIGH)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(runner.run_pending(), (3, 0))
+        self.assertEqual(calls, [(('high',), {}),
+                                 (('normal', 2), {'option': {'key': [1, 2]}}),
+                                 (('low',), {})])
+        self.assertEqual(Job.objects.filter(status=DONE).count(), 3)
+        self.assertEqual(runner.run_pending(), (0, 0))
+
+    def testUnique(self):
+        """
+        Tests that a unique job is queued once while it's waiting.
+        """
+        self.assertNotEqual(unique.delay(1), None)
+        self.assertEqual(unique.delay(1), None)
+        unique.delay(2)
+        runner.run_pending()
+        unique.delay(1)
+        runner.run_pending()
+        self.assertEqual(calls, [1, 2, 1])
+
+    def testRetry(self):
+        """
+        Tests that a failing job waits longer every time and fails after its
+        last attempt.
+        """
+        fail.delay()
+        delays = []
+        for attempt in range(2):
+            start = datetime.datetime.now()
+            self.assertEqual(runner.run_pending(), (0, 1))
+            job = Job.objects.get()
+            self.assertEqual(job.status, QUEUED)
+            self.assertIn('ValueError: Broken job', job.last_error)
+            delays.append((job.next_attempt - start).seconds)
+            # Not due yet
+            self.assertEqual(runner.run_pending(), (0, 0))
+            Job.objects.update(next_attempt=datetime.datetime.now())
+        self.assertTrue(delays[1] > delays[0])
+
+        self.assertEqual(runner.run_pending(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (FAILED, 3))
+
+        self.assertEqual(Job.objects.requeue(), 1)
+        self.assertEqual(Job.objects.get().status, QUEUED)
+
+    def testUnknownJob(self):
+        """
+        Tests that a job that isn't registered fails right away.
+        """
+        Job(name='tests.missing').save()
+        self.assertEqual(runner.run_pending(), (0, 1))
+        self.assertEqual(Job.objects.get().status, FAILED)
+
+    def testLease(self):
+        """
+        Tests that a job taken by a worker isn't taken by another one until
+        its lease expires.
+        """
+        record.delay()
+        self.assertEqual(len(Job.objects.claim(10)), 1)
+        self.assertEqual(Job.objects.claim(10), [])
+
+        Job.objects.update(next_attempt=datetime.datetime.now())
+        job = Job.objects.claim(10)[0]
+        self.assertEqual((job.status, job.attempts), (RUNNING, 2))
+
+    def testAbandoned(self):
+        """
+        Tests that a job whose worker went away during its last attempt is
+        marked as failed once its lease expires.
+        """
+        record.delay()
+        Job.objects.update(max_attempts=1)
+        Job.objects.claim(10)
+        self.assertEqual(runner.run_pending(), (0, 0))
+        self.assertEqual(Job.objects.get().status, RUNNING)
+
+        Job.objects.update(next_attempt=datetime.datetime.now())
+        self.assertEqual(runner.run_pending(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (FAILED, 1))
+        self.assertIn('worker went away', job.last_error)
+        self.assertEqual(calls, [])
+
+    def testDisabled(self):
+        """
+        Tests that the jobs run right away when the queue is off.
+        """
+        runner.ENABLED = False
+        try:
+            record.delay('now')
+        finally:
+            runner.ENABLED = True
+        self.assertEqual(calls, [(('now',), {})])
+        self.assertEqual(Job.objects.count(), 0)
+
+    def testMail(self):
+        """
+        Tests that the queued mail is sent by a job.
+        """
+        send_mail('First', 'Body', None, ['user@example.com'])
+        send_mail('Second', 'Body', None, ['user@example.com'])
+        self.assertEqual(Job.objects.filter(
+            name='mailqueue.send_queued').count(), 1)
+        runner.run_pending()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def testStatusView(self):
+        """
+        Tests that only the staff can see the status page.
+        """
+        fail.delay()
+        Job.objects.update(status=FAILED, last_error='Broken job')
+        url = self.getURL(JOB_STATUS)
+        self.create_user('job_user', 'job_password', logged_in=True)
+        response = self.get(url)
+        self.assertTemplateNotUsed(response, 'jobs/job_status.html')
+
+        User.objects.filter(username='job_user').update(is_staff=True)
+        response = self.get(url)
+        self.assertResponseOK(response)
+        self.assertEqual(response.context['jobs'], [('tests.fail',
+                                                     [0, 0, 0, 1])])
+        self.assertContains(response, 'Broken job')
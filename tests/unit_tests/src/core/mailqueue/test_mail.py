@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import datetime
+from StringIO import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+
+from core.jobs import runner
+from core.mailqueue import mail as mailqueue
+from core.mailqueue.models import QueuedMail, QUEUED, FAILED, HIGH, LOW, \
+    MAX_ATTEMPTS
+from e_cidadania import url_names
+
+from tests.test_utils import ECDTestCase
+
+
+class CountingBackend(EmailBackend):
+
+    """
+    Memory backend that counts the connections opened, and fails to send
+    the messages whose subject starts with "fail".
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CountingBackend, self).__init__(*args, **kwargs)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.subject.startswith('fail'):
+                raise IOError('Connection refused')
+        return super(CountingBackend, self).send_messages(messages)
+
+
+class MailQueueTest(ECDTestCase):
+
+    """
+    Tests the outbound mail queue.
+    """
+
+    def setUp(self):
+        self.enabled = runner.ENABLED, mailqueue.ENABLED
+        runner.ENABLED = mailqueue.ENABLED = True
+
+    def tearDown(self):
+        runner.ENABLED, mailqueue.ENABLED = self.enabled
+
+    def testQueue(self):
+        """
+        Tests that the mail is only sent by the worker, over one connection,
+        highest priority first, and that sent messages are deleted.
+        """
+        mailqueue.send_mail('Low', 'Body', None, ['low@example.com'],
+                            priority=LOW)
+        mailqueue.send_mail('Normal', 'Body', 'from@example.com',
+                            ['a@example.com', 'b@example.com'],
+                            html_message='<p>Body</p>', bcc=['c@example.com'])
+        mailqueue.send_mail('High', 'Body', None, ['high@example.com'],
+                            priority=HIGH)
+        self.assertEqual(mailqueue.send_mail('None', 'Body', None, []), 0)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedMail.objects.count(), 3)
+
+        connection = CountingBackend()
+        get_connection = mailqueue.get_connection
+        mailqueue.get_connection = lambda: connection
+        try:
+            self.assertEqual(mailqueue.send_queued(), (3, 0))
+        finally:
+            mailqueue.get_connection = get_connection
+        self.assertEqual(connection.opened, 1)
+        self.assertEqual([m.subject for m in mail.outbox],
+                         ['High', 'Normal', 'Low'])
+        message = mail.outbox[1]
+        self.assertEqual(message.recipients(),
+                         ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual(message.alternatives, [('<p>Body</p>', 'text/html')])
+        self.assertEqual(QueuedMail.objects.count(), 0)
+
+    def testBatches(self):
+        """
+        Tests that the batches share the connection and that the limit is
+        respected.
+        """
+        batch_size = mailqueue.BATCH_SIZE
+        mailqueue.BATCH_SIZE = 2
+        try:
+            for i in range(5):
+                mailqueue.send_mail('Mail %d' % i, 'Body', None,
+                                    ['user@example.com'])
+            self.assertEqual(mailqueue.send_queued(limit=3), (3, 0))
+            self.assertEqual(mailqueue.send_queued(), (2, 0))
+        finally:
+            mailqueue.BATCH_SIZE = batch_size
+        self.assertEqual(len(mail.outbox), 5)
+
+    def testRetry(self):
+        """
+        Tests that a message that fails waits longer every time, and that it
+        is marked as failed after the last attempt.
+        """
+        mailqueue.send_mail('fail', 'Body', None, ['user@example.com'])
+        mailqueue.send_mail('Mail', 'Body', None, ['user@example.com'])
+        self.assertEqual(mailqueue.send_queued(connection=CountingBackend()),
+                         (1, 1))
+
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.status, QUEUED)
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(queued.last_error, 'IOError: Connection refused')
+        self.assertTrue(queued.next_attempt > datetime.datetime.now())
+        # Not due yet
+        self.assertEqual(mailqueue.send_queued(), (0, 0))
+
+        delays = []
+        for attempt in range(MAX_ATTEMPTS - 1):
+            QueuedMail.objects.update(next_attempt=datetime.datetime.now())
+            start = datetime.datetime.now()
+            mailqueue.send_queued(connection=CountingBackend())
+            delays.append((QueuedMail.objects.get().next_attempt - start)
+                          .seconds)
+        self.assertTrue(all(b > a for a, b in zip(delays[:-2], delays[1:-1])))
+
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.status, FAILED)
+        self.assertEqual(queued.attempts, MAX_ATTEMPTS)
+        QueuedMail.objects.update(next_attempt=datetime.datetime.now())
+        self.assertEqual(mailqueue.send_queued(), (0, 0))
+
+        self.assertEqual(QueuedMail.objects.requeue(), 1)
+        self.assertEqual(QueuedMail.objects.get().status, QUEUED)
+
+    def testClaim(self):
+        """
+        Tests that a message taken by a worker isn't taken by another one.
+        """
+        mailqueue.send_mail('Mail', 'Body', None, ['user@example.com'])
+        self.assertEqual(len(QueuedMail.objects.claim(10)), 1)
+        self.assertEqual(QueuedMail.objects.claim(10), [])
+
+    def testCommand(self):
+        """
+        Tests the worker command.
+        """
+        mailqueue.send_mail('Mail', 'Body', None, ['user@example.com'])
+        output = StringIO()
+        call_command('send_queued_mail', stdout=output)
+        self.assertEqual(output.getvalue(), 'Sent 1 messages, 0 failed.\n')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def testDisabled(self):
+        """
+        Tests that the mail is sent right away when the queue is off.
+        """
+        mailqueue.ENABLED = False
+        try:
+            mailqueue.send_mail('Mail', 'Body', None, ['user@example.com'])
+        finally:
+            mailqueue.ENABLED = True
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(QueuedMail.objects.count(), 0)
+
+    def testInvite(self):
+        """
+        Tests that an invitation is queued as one message with every address
+        hidden.
+        """
+        self.create_user('invite_user', 'invite_password', logged_in=True)
+        addresses = ['user%d@example.com' % i for i in range(200)]
+        response = self.post(self.getURL(url_names.INVITE), data={
+            'email_addr': ', '.join(addresses), 'mail_msg': 'Join us'})
+        self.assertResponseOK(response)
+        self.assertEqual(len(mail.outbox), 0)
+
+        queued = QueuedMail.objects.get()
+        self.assertEqual(queued.to, '')
+        self.assertEqual(queued.bcc.split('\n'), addresses)
+        self.assertEqual(mailqueue.send_queued(), (1, 0))
+        self.assertEqual(mail.outbox[0].recipients(), addresses)
@@ -0,0 +1,201 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+import glob
+import os
+from StringIO import StringIO
+
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save
+from django.template import Context, Template
+
+from core.jobs import runner
+from core.jobs.models import Job
+from core.spaces.fields import ThumbnailField
+from core.spaces.models import Space, ImageVariant
+
+from helpers import images
+from helpers.images import get_compact_formats
+
+from tests.test_utils import ECDTestCase
+
+COMPACT = [ImageVariant.WEBP if format == 'WEBP' else ImageVariant.JPEG
+           for format, extension, options in get_compact_formats()]
+
+
+def make_png(width, height):
+    data = StringIO()
+    Image.new('RGB', (width, height), (200, 10, 10)).save(data, 'PNG')
+    return SimpleUploadedFile('field_logo.png', data.getvalue())
+
+
+class StdImageFieldTest(ECDTestCase):
+
+    """
+    Tests the variants made by the StdImageField in the background.
+    """
+
+    def setUp(self):
+        self.enabled = runner.ENABLED
+        runner.ENABLED = True
+        self.saves = []
+        post_save.connect(self.saved, sender=Space)
+        self.space = Space(name='field_space', url='field_space',
+                           logo=make_png(400, 300))
+        self.space.save()
+        self.path = self.space.logo.path
+        self.original = os.path.splitext(self.path)[0] + '.original.png'
+
+    def tearDown(self):
+        runner.ENABLED = self.enabled
+        post_save.disconnect(self.saved, sender=Space)
+        for path in glob.glob(os.path.splitext(self.path)[0] + '.*'):
+            os.remove(path)
+        cache.clear()
+
+    def saved(self, sender, instance, **kwargs):
+        self.saves.append(instance.pk)
+
+    def testVariants(self):
+        """
+        Tests that the upload is served until the job makes the variants,
+        and that the space isn't saved again.
+        """
+        self.assertEqual(Image.open(self.path).size, (400, 300))
+        self.assertEqual(Job.objects.filter(
+            name='spaces.resize_image').count(), 1)
+        self.assertEqual(ImageVariant.objects.count(), 0)
+        space = Space.objects.get(pk=self.space.pk)
+        self.assertEqual(space.logo.thumbnail.url(), space.logo.url)
+
+        self.assertEqual(runner.run_pending(), (1, 0))
+        self.assertEqual(Image.open(self.path).size, (100, 75))
+        self.assertEqual(Image.open(self.original).size, (400, 300))
+        variants = ImageVariant.objects.get_variants(space.logo.name)
+        self.assertEqual(sorted(variants),
+                         sorted(['original', 'resized'] + COMPACT))
+        self.assertEqual((variants['resized'].width,
+                          variants['resized'].height), (100, 75))
+        self.assertEqual(variants['resized'].size, os.path.getsize(self.path))
+        self.assertEqual(Space.objects.get(pk=self.space.pk).logo.name,
+                         space.logo.name)
+        self.assertEqual(self.saves, [self.space.pk])
+
+        # Making them again starts from the upload
+        runner.enqueue('spaces.resize_image', ('spaces', 'Space',
+                                               self.space.pk, 'logo'))
+        runner.run_pending()
+        self.assertEqual(Image.open(self.original).size, (400, 300))
+        self.assertEqual(ImageVariant.objects.count(), 2 + len(COMPACT))
+
+    def testAllVariants(self):
+        """
+        Tests that the variants of a batch of images are made at once.
+        """
+        field = Space._meta.get_field('logo')
+        spaces = [Space.objects.get(pk=self.space.pk), Space(name='empty')]
+        self.assertEqual(field.make_all_variants(spaces, processes=2), 0)
+        self.assertEqual(Image.open(self.path).size, (100, 75))
+        self.assertEqual(ImageVariant.objects.count(), 2 + len(COMPACT))
+
+    def testCompactVariants(self):
+        """
+        Tests that the compact variants get the hash of their content in
+        their names, that the old ones are deleted when they change and
+        that the picture tag shows them.
+        """
+        template = Template('{% load images %}{% picture space.logo "L" %}')
+        space = Space.objects.get(pk=self.space.pk)
+        self.assertEqual(template.render(Context({'space': space})),
+                         '<img src="%s" alt="L" />' % space.logo.url)
+
+        runner.run_pending()
+        variants = ImageVariant.objects.get_cached_variants(space.logo.name)
+        jpeg = variants[ImageVariant.JPEG]
+        self.assertTrue(jpeg.name.startswith(
+            os.path.splitext(space.logo.name)[0] + '.'))
+        self.assertTrue(jpeg.name.endswith('.jpg'))
+        self.assertEqual(Image.open(space.logo.storage.path(jpeg.name))
+                         .format, 'JPEG')
+        self.assertEqual((jpeg.width, jpeg.height), (100, 75))
+        with self.assertNumQueries(0):
+            rendered = template.render(Context({'space': space}))
+        self.assertTrue('src="%s"' % space.logo.storage.url(jpeg.name)
+                        in rendered)
+        if ImageVariant.WEBP in COMPACT:
+            self.assertTrue(rendered.startswith('<picture><source srcset="%s"'
+                % space.logo.storage.url(variants['webp'].name)))
+
+        # A new image in the same file gets new names
+        Image.new('RGB', (400, 300), (10, 10, 200)).save(self.original)
+        space.logo.field.make_variants(space)
+        new = ImageVariant.objects.get_cached_variants(space.logo.name)
+        self.assertNotEqual(new[ImageVariant.JPEG].name, jpeg.name)
+        self.assertFalse(space.logo.storage.exists(jpeg.name))
+        stored = ImageVariant.objects.get_variants(space.logo.name)
+        self.assertEqual(dict((v, new[v].name) for v in new),
+                         dict((v, stored[v].name) for v in stored))
+
+    def testNoUpload(self):
+        """
+        Tests that saving without a new upload doesn't queue anything.
+        """
+        Job.objects.all().delete()
+        space = Space.objects.get(pk=self.space.pk)
+        space.name = 'Renamed'
+        space.save()
+        self.assertEqual(Job.objects.count(), 0)
+
+    def testLazyThumbnail(self):
+        """
+        Tests that loading a space doesn't build the thumbnail until it is
+        used, and that it is built only once.
+        """
+        space = Space.objects.get(pk=self.space.pk)
+        self.assertTrue(isinstance(space.__dict__['logo'], basestring))
+
+        thumbnail = space.logo.thumbnail
+        self.assertTrue(isinstance(thumbnail, ThumbnailField))
+        self.assertTrue(space.logo.thumbnail is thumbnail)
+        self.assertEqual(thumbnail.name,
+                         space.logo.name.replace('.png', '.thumbnail.png'))
+        self.assertEqual(Space.objects.get(pk=self.space.pk).banner.thumbnail,
+                         None)
+
+    def testPixelBudget(self):
+        """
+        Tests that uploads over IMAGE_MAX_PIXELS are refused, and that the
+        stored images are not checked again.
+        """
+        field = Space._meta.get_field('logo')
+        space = Space(name='big_space', url='big_space')
+        space.logo = make_png(400, 300)
+        max_pixels = images.MAX_PIXELS
+        images.MAX_PIXELS = 400 * 300 - 1
+        try:
+            self.assertRaises(ValidationError, field.clean, space.logo, space)
+            field.clean(self.space.logo, self.space)
+        finally:
+            images.MAX_PIXELS = max_pixels
+        field.clean(space.logo, space)
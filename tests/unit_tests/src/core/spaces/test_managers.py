@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.contrib.auth.models import AnonymousUser, User
+from guardian.shortcuts import assign_perm
+
+from core.spaces.models import Space
+
+from tests.test_utils import ECDTestCase
+
+
+class SpaceManagerTest(ECDTestCase):
+
+    """
+    Tests the spaces visible to a user.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('visible_user', 'visible_password')
+        self.public = Space(name='public', url='public', public=True)
+        self.public.save()
+        self.private = Space(name='private', url='private')
+        self.private.save()
+        self.member = Space(name='member', url='member')
+        self.member.save()
+        assign_perm('view_space', self.user, self.member)
+
+    def testVisibleSpaces(self):
+        """
+        Tests that users see the public spaces plus their own ones.
+        """
+        self.assertEqual(list(Space.objects.visible_to(AnonymousUser())),
+                         [self.public])
+        self.assertEqual(list(Space.objects.visible_to(self.user)),
+                         [self.member, self.public])
+
+        admin = self.create_super_user()
+        self.assertEqual(Space.objects.visible_to(admin).count(), 3)
+
+        # Other members of a public space don't repeat it
+        other = self.create_user('visible_other', 'visible_password')
+        assign_perm('view_space', other, self.public)
+        assign_perm('admin_space', self.user, self.public)
+        self.assertEqual(list(Space.objects.visible_to(self.user)),
+                         [self.member, self.public])
+
+    def testVisibleSpacesQueries(self):
+        """
+        Tests that the number of queries doesn't depend on the spaces.
+        """
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            list(Space.objects.visible_to(user))
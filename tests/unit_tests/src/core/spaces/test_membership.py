@@ -0,0 +1,149 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+
+from django.contrib.auth.models import Group
+from guardian.shortcuts import assign_perm, remove_perm
+
+from core.spaces import url_names
+from core.spaces.models import Space, SpaceMembership
+
+from tests.test_utils import ECDTestCase
+
+
+class SpaceMembershipTest(ECDTestCase):
+
+    """
+    Tests that the space memberships follow the space permissions.
+    """
+
+    def setUp(self):
+        self.user = self.create_user('member_user', 'member_password')
+        self.space = Space(name='member_space', url='member_space')
+        self.space.save()
+
+    def get_role(self):
+        return SpaceMembership.objects.get(space=self.space,
+                                           user=self.user).role
+
+    def testAssignedPermissionsGiveRole(self):
+        """
+        Tests that the role follows the highest permission of the user.
+        """
+        assign_perm('view_space', self.user, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.USER)
+
+        assign_perm('admin_space', self.user, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.ADMIN)
+
+        remove_perm('admin_space', self.user, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.USER)
+
+    def testRemovedPermissionsDropMembership(self):
+        """
+        Tests that the membership is removed with the last permission.
+        """
+        assign_perm('view_space', self.user, self.space)
+        remove_perm('view_space', self.user, self.space)
+        self.assertFalse(SpaceMembership.objects.filter(
+            space=self.space, user=self.user).exists())
+        self.assertEqual(list(Space.objects.joined_by(self.user)), [])
+
+    def testRebuild(self):
+        """
+        Tests that the memberships can be built again from the permissions.
+        """
+        assign_perm('view_space', self.user, self.space)
+        assign_perm('mod_space', self.user, self.space)
+        SpaceMembership.objects.all().delete()
+
+        self.assertEqual(SpaceMembership.objects.rebuild(), 1)
+        self.assertEqual(self.get_role(), SpaceMembership.MOD)
+        self.assertEqual(list(Space.objects.joined_by(self.user)),
+                         [self.space])
+
+    def testGroupPermissionsGiveRole(self):
+        """
+        Tests that the permissions of the groups of the user give it a role,
+        following the users that join and leave the group.
+        """
+        group = Group.objects.create(name='member_group')
+        self.user.groups.add(group)
+        assign_perm('mod_space', group, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.MOD)
+        self.assertEqual(list(Space.objects.visible_to(self.user)),
+                         [self.space])
+
+        # The highest role given to the user or its groups wins
+        assign_perm('admin_space', self.user, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.ADMIN)
+        remove_perm('admin_space', self.user, self.space)
+        self.assertEqual(self.get_role(), SpaceMembership.MOD)
+
+        self.user.groups.remove(group)
+        self.assertFalse(SpaceMembership.objects.filter(
+            space=self.space, user=self.user).exists())
+        group.user_set.add(self.user)
+        self.assertEqual(self.get_role(), SpaceMembership.MOD)
+        group.user_set.clear()
+        self.assertFalse(SpaceMembership.objects.filter(
+            space=self.space, user=self.user).exists())
+
+        group.user_set.add(self.user)
+        remove_perm('mod_space', group, self.space)
+        self.assertFalse(SpaceMembership.objects.filter(
+            space=self.space, user=self.user).exists())
+
+    def testRebuildWithGroups(self):
+        """
+        Tests that the memberships built again include the group members.
+        """
+        group = Group.objects.create(name='member_group')
+        self.user.groups.add(group)
+        assign_perm('view_space', group, self.space)
+        SpaceMembership.objects.all().delete()
+
+        self.assertEqual(SpaceMembership.objects.rebuild(self.space), 1)
+        self.assertEqual(self.get_role(), SpaceMembership.USER)
+
+    def testGroupMembersAreListed(self):
+        """
+        Tests that the users given a role through a group are listed in the
+        participants of the space and in its roles page.
+        """
+        group = Group.objects.create(name='member_group')
+        self.user.groups.add(group)
+        assign_perm('mod_space', group, self.space)
+        self.space.public = True
+        self.space.save()
+
+        response = self.get(self.getURL(url_names.SPACE_INDEX,
+            kwargs={'space_url': self.space.url}))
+        self.assertResponseOK(response)
+        self.assertEqual(list(response.context['participants']), [self.user])
+
+        admin = self.create_user('member_admin', 'member_password')
+        assign_perm('admin_space', admin, self.space)
+        self.login('member_admin', 'member_password')
+        response = self.get(self.getURL(url_names.EDIT_ROLES,
+            kwargs={'space_url': self.space.url}))
+        self.assertResponseOK(response)
+        self.assertEqual(response.context['user_mods'], set([self.user]))
+        self.assertEqual(response.context['user_admins'], set([admin]))
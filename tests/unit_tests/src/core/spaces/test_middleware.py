@@ -0,0 +1,92 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.test.client import RequestFactory
+from django.views.generic import View
+from guardian.shortcuts import assign_perm
+
+from core.spaces.middleware import SpaceMiddleware, get_request_space
+from core.spaces.mixins import SpaceMixin
+from core.spaces.models import Space
+from helpers.cache import clear_local_cache
+
+from tests.test_utils import ECDTestCase
+
+
+class SpaceView(SpaceMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(self.space.url)
+
+
+class SpaceMiddlewareTest(ECDTestCase):
+
+    """
+    Tests the request-scoped space resolution.
+    """
+
+    def setUp(self):
+        cache.clear()
+        clear_local_cache()
+        self.factory = RequestFactory()
+        self.space = Space(name='middleware_space', url='middleware_space',
+                           public=False)
+        self.space.save()
+
+    def testMiddlewareSetsSpace(self):
+        """
+        Tests that the space is attached to the request and reused.
+        """
+        request = self.factory.get('/')
+        SpaceMiddleware().process_view(request, SpaceView.as_view(), (),
+                                       {'space_url': self.space.url})
+        self.assertEqual(request.space, self.space)
+        with self.assertNumQueries(0):
+            space = get_request_space(request, self.space.url)
+        self.assertTrue(space is request.space)
+
+    def testMiddlewareRaises404(self):
+        """
+        Tests that an unknown space url gives a 404 before the view runs.
+        """
+        request = self.factory.get('/')
+        self.assertRaises(Http404, SpaceMiddleware().process_view, request,
+                          SpaceView.as_view(), (), {'space_url': 'missing'})
+
+    def testMixinChecksPermissions(self):
+        """
+        Tests that the mixin only lets users with the permission in.
+        """
+        view = SpaceView.as_view()
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        self.assertRaises(PermissionDenied, view, request,
+                          space_url=self.space.url)
+
+        user = self.create_user('middleware_user', 'middleware_password')
+        assign_perm('view_space', user, self.space)
+        request = self.factory.get('/')
+        request.user = user
+        response = view(request, space_url=self.space.url)
+        self.assertEqual(response.content, self.space.url)
@@ -0,0 +1,71 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2010-2012 Cidadania S. Coop. Galega
+#
+# This file is part of e-cidadania.
+#
+# e-cidadania is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# e-cidadania is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with e-cidadania. If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.cache import cache
+
+from core.spaces import rankings
+from core.spaces.models import Space
+from apps.ecidadania.proposals.models import Proposal
+
+from tests.test_utils import ECDTestCase
+
+
+class RankingsTest(ECDTestCase):
+
+    """
+    Tests the per-space rankings of the space index.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('ranking_user', 'ranking_password')
+        self.other_user = self.create_user('other_user', 'other_password')
+        self.space = Space(name='ranking_space', url='ranking_space')
+        self.space.save()
+        self.first = Proposal(title='First', description='First',
+                              space=self.space, author=self.user)
+        self.first.save()
+        self.second = Proposal(title='Second', description='Second',
+                               space=self.space, author=self.user)
+        self.second.save()
+
+    def testHighlightedProposalsOrder(self):
+        """
+        Tests that the proposals are ordered by support votes and that the
+        ranking follows the new votes.
+        """
+        self.second.support_votes.add(self.user)
+        ranking = rankings.get_ranking(self.space,
+                                       rankings.PROPOSALS_SUPPORTED)
+        self.assertEqual(ranking, [self.second])
+
+        self.first.support_votes.add(self.user, self.other_user)
+        ranking = rankings.get_ranking(self.space,
+                                       rankings.PROPOSALS_SUPPORTED)
+        self.assertEqual(ranking, [self.first, self.second])
+
+    def testCachedRankingCostsOneQuery(self):
+        """
+        Tests that reading a ranking already in the cache runs one query.
+        """
+        self.first.support_votes.add(self.user)
+        rankings.rebuild_rankings(self.space.pk)
+        with self.assertNumQueries(1):
+            rankings.get_ranking(self.space, rankings.PROPOSALS_SUPPORTED)